@@ -0,0 +1,137 @@
+"""Generate a synthetic media corpus for the benchmarks.
+
+Usage: python -m benchmarks.corpus DIRECTORY [--pictures N] [--videos N]
+
+Pictures are small JPEGs with random EXIF dates, some of them without EXIF.
+Videos are short ffmpeg lavfi testsrc clips in several codecs and bitrates.
+The same seed always gives the same corpus.
+"""
+
+import argparse
+import os
+import random
+import subprocess
+from datetime import datetime, timedelta
+
+from PIL import Image
+
+TAG_DATE_TIME = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_DATE_TIME_ORIGINAL = 0x9003
+
+EXIF_DATE_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+# share of pictures written without EXIF data
+NO_EXIF_RATIO = 0.1
+PICTURES_PER_DIRECTORY = 500
+
+# (codec, bitrate), hevc videos are skipped by classify as already encoded
+VIDEO_FORMATS = [
+    ("libx264", "2M"),
+    ("libx264", "8M"),
+    ("mpeg4", "4M"),
+    ("libx265", "1M"),
+]
+VIDEO_SECONDS = 2
+VIDEO_SIZE = "320x240"
+
+START_DATE = datetime(2010, 1, 1)
+DATE_RANGE_SECONDS = 15 * 365 * 24 * 3600
+
+
+def random_date(rand: random.Random) -> datetime:
+    """Return a random date taken."""
+    return START_DATE + timedelta(seconds=rand.randrange(DATE_RANGE_SECONDS))
+
+
+def write_picture(path: str, rand: random.Random) -> None:
+    """Write a small JPEG with a random EXIF date taken."""
+    image = Image.new(
+        "RGB",
+        (rand.randint(64, 160), rand.randint(48, 120)),
+        tuple(rand.randrange(256) for _ in range(3)),
+    )
+    exif = Image.Exif()
+    if rand.random() >= NO_EXIF_RATIO:
+        date_taken = random_date(rand).strftime(EXIF_DATE_FORMAT)
+        exif[TAG_DATE_TIME] = date_taken
+        exif.get_ifd(TAG_EXIF_IFD)[TAG_DATE_TIME_ORIGINAL] = date_taken
+    image.save(path, "JPEG", exif=exif, quality=85)
+
+
+def write_video(
+    path: str, codec: str, bitrate: str, rand: random.Random, ffmpeg_path: str
+) -> None:
+    """Write a short test video with a random creation date."""
+    subprocess.run(
+        [
+            ffmpeg_path,
+            "-y",
+            "-loglevel",
+            "error",
+            "-f",
+            "lavfi",
+            "-i",
+            f"testsrc=size={VIDEO_SIZE}:rate=25:duration={VIDEO_SECONDS}",
+            "-c:v",
+            codec,
+            "-b:v",
+            bitrate,
+            *(["-x265-params", "log-level=error"] if codec == "libx265" else []),
+            "-pix_fmt",
+            "yuv420p",
+            "-metadata",
+            f"creation_time={random_date(rand).isoformat()}",
+            path,
+        ],
+        check=True,
+    )
+
+
+def generate_corpus(
+    directory: str,
+    pictures: int,
+    videos: int,
+    seed: int = 0,
+    ffmpeg_path: str = "ffmpeg",
+) -> None:
+    """Write the corpus, pictures are split in subdirectories."""
+    rand = random.Random(seed)
+    for idx in range(pictures):
+        subdirectory = os.path.join(
+            directory, "pictures", f"{idx // PICTURES_PER_DIRECTORY:03d}"
+        )
+        os.makedirs(subdirectory, exist_ok=True)
+        write_picture(os.path.join(subdirectory, f"IMG_{idx:06d}.jpg"), rand)
+
+    if videos:
+        os.makedirs(os.path.join(directory, "videos"), exist_ok=True)
+    for idx in range(videos):
+        codec, bitrate = VIDEO_FORMATS[idx % len(VIDEO_FORMATS)]
+        write_video(
+            os.path.join(directory, "videos", f"VID_{idx:04d}_{codec}.mp4"),
+            codec,
+            bitrate,
+            rand,
+            ffmpeg_path,
+        )
+
+
+def main() -> None:
+    """Generate the corpus."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("directory")
+    parser.add_argument("--pictures", type=int, default=2000)
+    parser.add_argument("--videos", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ffmpeg-path", default="ffmpeg")
+    args = parser.parse_args()
+
+    generate_corpus(
+        args.directory, args.pictures, args.videos, args.seed, args.ffmpeg_path
+    )
+    print(f"Wrote {args.pictures} pictures and {args.videos} videos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Compare the header-only EXIF reader with the Pillow reader.
+
+Usage: python -m benchmarks.exif [DIRECTORY] [--repeat N]
+"""
+
+import argparse
+import glob
+import os
+import time
+from collections.abc import Callable
+
+from classify.processors.exif import read_date_taken
+from classify.processors.files import FileProcessor
+from classify.processors.image import ImageProcessor
+from classify.settings import ClassifySettings, parse_args
+
+
+def measure(
+    reader: Callable[[str], str | None], paths: list[str], repeat: int
+) -> float:
+    """Return the mean time in milliseconds to read the date of one picture."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for path in paths:
+            reader(path)
+    return (time.perf_counter() - start) * 1000 / (repeat * len(paths))
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("directory", nargs="?", default="tests/photos")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    paths = [
+        path
+        for path in glob.glob(os.path.join(args.directory, "**/*"), recursive=True)
+        if os.path.splitext(path)[1].lower() in (".jpg", ".jpeg", ".tif", ".tiff")
+    ]
+    if not paths:
+        parser.error(f"No JPEG or TIFF pictures found in {args.directory}")
+
+    settings = ClassifySettings(
+        args=parse_args(["--directory", args.directory, "--dry-run"])
+    )
+    image_processor = ImageProcessor(
+        settings=settings, file_processor=FileProcessor(settings)
+    )
+    pillow_ms = measure(image_processor.get_pillow_date_taken, paths, args.repeat)
+    header_ms = measure(read_date_taken, paths, args.repeat)
+
+    print(f"{len(paths)} pictures, {args.repeat} rounds")
+    print(f"Pillow:      {pillow_ms:.3f} ms/picture")
+    print(f"Header-only: {header_ms:.3f} ms/picture")
+    print(f"Speedup:     {pillow_ms / header_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Measure Classify throughput on a media corpus.
+
+Usage: python -m benchmarks.suite CORPUS [--output FILE] [--baseline FILE]
+
+Generate the corpus first with `python -m benchmarks.corpus CORPUS`. Each
+benchmark runs `--repeat` times and keeps its fastest run. Results are
+written as JSON; with `--baseline`, rates are compared to a previous result
+file and the exit code is 1 when one regressed more than `--threshold`.
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+
+from classify.classify import Classify
+from classify.processors.files import FileProcessor
+from classify.processors.image import ImageProcessor
+from classify.processors.video import VideoProcessor
+from classify.settings import ClassifySettings, parse_args
+
+BENCHMARKS = ["scan", "exif", "probe", "dry_run", "real"]
+
+
+def get_settings(directory: str, *args: str) -> ClassifySettings:
+    """Return the settings of a run on a directory."""
+    return ClassifySettings(
+        args=parse_args(["--directory", directory, "--timezone", "UTC", *args])
+    )
+
+
+def timed(
+    run: Callable[[], int], repeat: int, setup: Callable[[], None] | None = None
+) -> dict[str, float]:
+    """Run a benchmark, return its fastest time and rate of items per second.
+
+    `setup` runs before each run, outside of the measured time.
+    """
+    best = None
+    items = 0
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with (
+            open(os.devnull, "w", encoding="utf-8") as devnull,
+            contextlib.redirect_stdout(devnull),
+        ):
+            start = time.perf_counter()
+            items = run()
+            seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    assert best is not None
+    return {"seconds": round(best, 4), "items": items, "rate": round(items / best, 2)}
+
+
+def bench_scan(corpus: str) -> int:
+    """Scan the corpus."""
+    file_processor = FileProcessor(get_settings(corpus, "--dry-run"))
+    file_processor.reload()
+    return len(file_processor.pictures) + len(file_processor.videos)
+
+
+def bench_exif(corpus: str, pictures: list[str]) -> int:
+    """Read the date taken of every picture."""
+    settings = get_settings(corpus, "--dry-run")
+    image_processor = ImageProcessor(settings, FileProcessor(settings))
+    for path in pictures:
+        image_processor.get_date_taken(path)
+    return len(pictures)
+
+
+def bench_probe(corpus: str, videos: list[str]) -> int:
+    """Probe every video, with a cold probe cache."""
+    settings = get_settings(corpus, "--dry-run")
+    video_processor = VideoProcessor(settings, FileProcessor(settings))
+    try:
+        for path in videos:
+            video_processor.is_already_reencoded(path)
+    finally:
+        video_processor.close()
+    return len(videos)
+
+
+def bench_classify(directory: str, count: int, *args: str) -> int:
+    """Run Classify on a directory."""
+    Classify(get_settings(directory, *args)).run()
+    return count
+
+
+def run_suite(
+    corpus: str, benchmarks: list[str], repeat: int
+) -> dict[str, dict[str, float]]:
+    """Run the selected benchmarks on a corpus."""
+    file_processor = FileProcessor(get_settings(corpus, "--dry-run"))
+    file_processor.reload()
+    pictures, videos = file_processor.pictures, file_processor.videos
+    count = len(pictures) + len(videos)
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="classify-bench-") as directory:
+        copy = os.path.join(directory, "corpus")
+
+        def copy_corpus() -> None:
+            shutil.rmtree(copy, ignore_errors=True)
+            shutil.copytree(corpus, copy)
+
+        runs: dict[str, Callable[[], int]] = {
+            "scan": lambda: bench_scan(corpus),
+            "exif": lambda: bench_exif(corpus, pictures),
+            "probe": lambda: bench_probe(corpus, videos),
+            # a dry run changes no file, it runs on the corpus itself
+            "dry_run": lambda: bench_classify(corpus, count, "--dry-run"),
+            # the corpus copy is processed in place, as a real run would
+            "real": lambda: bench_classify(copy, count),
+        }
+        # copies are made before the measured time
+        setups = {"real": copy_corpus}
+        for name in benchmarks:
+            results[name] = timed(
+                runs[name], 1 if name == "real" else repeat, setups.get(name)
+            )
+            print(
+                f"{name:8} {results[name]['rate']:>12.2f} items/s "
+                f"({results[name]['items']} in {results[name]['seconds']:.3f}s)",
+                file=sys.stderr,
+            )
+    return results
+
+
+def compare(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    threshold: float,
+) -> list[str]:
+    """Print the change of each rate against a baseline, return the regressions."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline or not baseline[name]["rate"]:
+            continue
+        change = result["rate"] / baseline[name]["rate"] - 1
+        print(f"{name:8} {change:+8.1%} vs baseline", file=sys.stderr)
+        if change < -threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> None:
+    """Run the benchmark suite."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("corpus")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    args = parser.parse_args()
+    if not os.path.isdir(args.corpus):
+        parser.error(f"Corpus {args.corpus} not found, see benchmarks.corpus")
+
+    # keep the benchmark output to the results
+    logging.getLogger("classify").setLevel(logging.ERROR)
+
+    report = {
+        "meta": {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "corpus": os.path.abspath(args.corpus),
+        },
+        "results": run_suite(args.corpus, args.only, args.repeat),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+        if regressions := compare(report["results"], baseline, args.threshold):
+            print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,29 @@
 """Main function to classify pictures and videos."""
 
+from __future__ import annotations
+
 import logging
 import os
+from collections.abc import Iterable, Iterator
+from functools import cached_property
+from typing import TYPE_CHECKING
 
-from classify.logger import print_progress_bar
-
+from .const import DEFAULT_VIDEO_ORDER, PROFILE_STATS_LINES, WATCH_QUEUED_VIDEOS
+from .plan import ACTION_DELETE, ACTION_SKIP, Plan
 from .processors.files import FileProcessor
 from .processors.image import ImageProcessor
 from .processors.video import VideoProcessor
+from .profiling import TIMER
+from .scheduler import Pipeline, WorkerScheduler
 from .settings import ClassifySettings
 
+if TYPE_CHECKING:
+    import cProfile
+
+    from .processors.duplicates import DuplicateProcessor
+    from .processors.organizer import OrganizeProcessor
+    from .processors.similar import SimilarProcessor
+
 _LOGGER = logging.getLogger("classify")
 
 classify_settings: ClassifySettings
@@ -25,75 +39,228 @@ class Classify:
         self.ip = ImageProcessor(settings=settings, file_processor=self.fp)
         self.vp = VideoProcessor(settings=settings, file_processor=self.fp)
 
+    # processors of options are only imported by the runs using them, so
+    # small runs start fast
+
+    @cached_property
+    def dp(self) -> DuplicateProcessor:
+        """Get the duplicate processor."""
+        from .processors.duplicates import DuplicateProcessor
+
+        return DuplicateProcessor(settings=self.settings, file_processor=self.fp)
+
+    @cached_property
+    def sp(self) -> SimilarProcessor:
+        """Get the similar pictures processor."""
+        from .processors.similar import SimilarProcessor
+
+        return SimilarProcessor(settings=self.settings, file_processor=self.fp)
+
+    @cached_property
+    def op(self) -> OrganizeProcessor:
+        """Get the event organizer."""
+        from .processors.organizer import OrganizeProcessor
+
+        return OrganizeProcessor(
+            settings=self.settings,
+            file_processor=self.fp,
+            image_processor=self.ip,
+            video_processor=self.vp,
+        )
+
     def run(self) -> None:
         """Classify pictures and videos."""
+        TIMER.reset(trace=bool(self.settings.profile))
+        profiler = None
+        if self.settings.profile:
+            import cProfile
+
+            profiler = cProfile.Profile()
+            # since Python 3.12 the profiler also sees the worker threads
+            profiler.enable()
+        try:
+            self.vp.recover()
+            if self.settings.apply:
+                self._apply()
+            elif self.settings.worker:
+                self._work()
+            elif self.settings.watch:
+                self._watch()
+            else:
+                self._run()
+            if self.fp.plan is not None:
+                assert self.settings.plan is not None
+                self.fp.plan.write(self.settings.plan, self.settings.directory)
+                _LOGGER.info(
+                    "Plan of %d files written to %s",
+                    len(self.fp.plan.entries),
+                    self.settings.plan,
+                )
+            if not self.settings.dry_run:
+                # the run completed, nothing is left to resume
+                self.vp.journal.reset()
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            self.vp.close()
+            self.fp.close()
+        _LOGGER.info("##### Timings #####")
+        TIMER.log_summary()
+        self.fp.copier.log_summary()
+        if profiler is not None:
+            self.write_profile(profiler)
+        _LOGGER.info("")
 
-        if not self.fp.pictures and not self.fp.videos:
+    def _run(self) -> None:
+        """Run each processing stage."""
+        _LOGGER.info("")
+        _LOGGER.info("##### Pictures and videos #####")
+        # trash files are gone before duplicates are looked for, so a trashed
+        # copy is never kept as the original of the picture it was taken from
+        paths: Iterable[str] = self._delete_android_trash(
+            TIMER.iterate("scan", self.fp.scan())
+        )
+        if self.settings.duplicates != "ignore":
+            # duplicates are only known once every file was found
+            paths = self.dp.process(list(paths))
+        if self.settings.similar is not None:
+            # pictures are compared before they get renamed
+            paths = list(paths)
+            self.sp.report([path for path in paths if self.fp.is_picture(path)])
+        pictures_count, videos_count = self._process(paths)
+
+        if not pictures_count and not videos_count:
             _LOGGER.info("No pictures or videos found")
-            return
+        elif self.settings.organize and not self.settings.plan:
+            # planned files are not in place yet, events are split on apply
+            self._organize()
+
+        _LOGGER.info("")
 
+    def _apply(self) -> None:
+        """Execute the actions of a plan, without reading metadata again."""
+        assert self.settings.apply is not None
+        paths: list[str] = []
+        for entry in Plan.read(self.settings.apply):
+            if entry.action == ACTION_SKIP:
+                continue
+            if entry.is_stale():
+                _LOGGER.warning(
+                    "Skip %s, changed since the plan was made", entry.source
+                )
+                continue
+            if entry.action == ACTION_DELETE:
+                _LOGGER.info("Delete %s", entry.source)
+                if not self.settings.dry_run:
+                    os.remove(entry.source)
+                continue
+            self.fp.planned[entry.source] = entry
+            paths.append(entry.source)
+
+        _LOGGER.info("")
+        _LOGGER.info("##### Pictures and videos #####")
+        self._process(paths)
+        if self.settings.organize:
+            self._organize()
+        _LOGGER.info("")
+
+    def _work(self) -> None:
+        """Encode the videos of a queue shared with other workers."""
+        work_queue = self.fp.queue
+        assert work_queue is not None
+        self.vp.tools.check()
+        _LOGGER.info("")
+        _LOGGER.info("##### Videos #####")
+        videos = [
+            path
+            for path in TIMER.iterate("scan", self.fp.scan())
+            if not self.fp.is_picture(path) and not self.fp.is_android_trash_file(path)
+        ]
+        scheduler = WorkerScheduler(
+            settings=self.settings, video_processor=self.vp, work_queue=work_queue
+        )
+        # jobs are leased in the order they were queued
+        videos = list(scheduler.order(videos))
+        _LOGGER.info("Queued %d new videos", work_queue.add(videos))
+        count = scheduler.work()
+        if count:
+            self.vp.log_prediction_accuracy()
         _LOGGER.info(
-            "##### Clean Android Google Photo trashed and pending pictures uploaded #####"
+            "Worker %s processed %d videos, queue: %s",
+            work_queue.worker,
+            count,
+            ", ".join(f"{state} {n}" for state, n in work_queue.summary().items()),
         )
-        self.fp.delete_android_trash_files()
-
-        if self.fp.pictures:
-            _LOGGER.info("")
-            _LOGGER.info("##### Pictures #####")
-            print_progress_bar(
-                0,
-                len(self.fp.pictures),
-                prefix="Processed ",
-                suffix=f"of total pictures ({len(self.fp.pictures)})",
-                length=50,
-            )
-            for idx, picture_path in enumerate(self.fp.pictures):
-                _LOGGER.debug(
-                    "Process picture %s",
-                    picture_path,
-                )
+        _LOGGER.info("")
 
-                try:
-                    self.ip.process(picture_path)
-                except Exception as exc:  # pylint: disable=broad-except
-                    _LOGGER.error("Error processing picture %s: %s", picture_path, exc)
-
-                print_progress_bar(
-                    idx + 1,
-                    len(self.fp.pictures),
-                    prefix="Processed ",
-                    suffix=f"of total pictures ({len(self.fp.pictures)})",
-                    length=50,
-                )
+    def _watch(self) -> None:
+        """Process the directory, then new files as they settle, until stopped."""
+        from .watcher import Watcher
 
-        if self.fp.videos:
-            _LOGGER.info("")
-            _LOGGER.info("##### Videos #####")
-            print_progress_bar(
-                0,
-                len(self.fp.videos),
-                prefix="Processed ",
-                suffix=f"of total videos ({len(self.fp.videos)})",
-                length=50,
+        # watches are set first, so files arriving meanwhile are not missed
+        watcher = Watcher(self.settings, self.fp)
+        try:
+            self._run()
+            _LOGGER.info("##### Watching %s #####", self.settings.directory)
+            pipeline = Pipeline(
+                settings=self.settings,
+                file_processor=self.fp,
+                image_processor=self.ip,
+                video_processor=self.vp,
+                max_queued_videos=WATCH_QUEUED_VIDEOS,
             )
-            for idx, video_path in enumerate(self.fp.videos):
-                _LOGGER.debug(
-                    "Process video %s (%s GB)",
-                    video_path,
-                    round(os.path.getsize(video_path) / 1e9, 3),
-                )
-
-                try:
-                    self.vp.process(video_path)
-                except Exception as exc:  # pylint: disable=broad-except
-                    _LOGGER.error("Error processing video %s: %s", video_path, exc)
-
-                print_progress_bar(
-                    idx + 1,
-                    len(self.fp.videos),
-                    prefix="Processed ",
-                    suffix=f"of total videos ({len(self.fp.videos)})",
-                    length=50,
-                )
+            # files come one by one, their processing is logged instead
+            pipeline.videos.show_progress = False
+            pipeline.videos.video_order = DEFAULT_VIDEO_ORDER
+            pipeline.run(self._delete_android_trash(watcher.watch()))
+        finally:
+            watcher.close()
+            # watching ends with an interruption, the journal is only kept
+            # for the encodes it cut
+            if not self.settings.dry_run:
+                self.vp.journal.reset_if_settled()
 
+    def _organize(self) -> None:
+        """Move processed files into event folders."""
         _LOGGER.info("")
+        _LOGGER.info("##### Events #####")
+        self.op.process()
+
+    def _process(self, paths: Iterable[str]) -> tuple[int, int]:
+        """Process pictures and videos at the same time, return their counts."""
+        pictures_count, videos_count = Pipeline(
+            settings=self.settings,
+            file_processor=self.fp,
+            image_processor=self.ip,
+            video_processor=self.vp,
+        ).run(paths)
+        if videos_count:
+            self.vp.log_prediction_accuracy()
+        return pictures_count, videos_count
+
+    def _delete_android_trash(self, paths: Iterable[str]) -> Iterator[str]:
+        """Yield files while scanning, once trash files are deleted.
+
+        Android Google Photo trashed and pending pictures uploaded are deleted
+        as soon as they are found, before anything else is done with them.
+        """
+        for path in paths:
+            if not self.fp.delete_android_trash_file(path):
+                yield path
+
+    def write_profile(self, profiler: cProfile.Profile) -> None:
+        """Write the profiler stats and the per-file trace."""
+        import pstats
+
+        directory = self.settings.profile
+        assert directory is not None
+        os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(directory, "classify.pstats"))
+        with open(
+            os.path.join(directory, "classify-stats.txt"), "w", encoding="utf-8"
+        ) as file:
+            pstats.Stats(profiler, stream=file).sort_stats("cumulative").print_stats(
+                PROFILE_STATS_LINES
+            )
+        TIMER.write_trace(os.path.join(directory, "trace.csv"))
+        _LOGGER.info("Profile written to %s", directory)
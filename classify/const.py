@@ -4,12 +4,82 @@ PICTURE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff"]
 VIDEO_EXTENSIONS = [".mp4", ".mov", ".avi", ".mkv", ".webm"]
 
 VIDEO_CODEC = "hevc"
+VIDEO_PRESET = "medium"
+# encoded videos above this share of the original size are not worth keeping
+VIDEO_SIZE_RATIO_LIMIT = 0.90
 
 DEFAULT_NAME_FORMAT = "%Y-%m-%d-%Hh%Mm%S"
 
 DEFAULT_VIDEO_BITRATE_MBPS_LIMIT = 30
 
+DEFAULT_VIDEO_JOBS = 1
+DEFAULT_VIDEO_ORDER = "scan"
+VIDEO_ORDERS = ["scan", "savings", "shortest"]
+# x265 medium throughput of a core, refined by the encodes of the run
+ESTIMATE_PIXELS_PER_CORE_SECOND = 5e6
+# size of the encoded videos, in bits per pixel of each frame
+ESTIMATE_ENCODED_BITS_PER_PIXEL = 0.04
+# kinds of external tool runs, each with its own concurrency limit
+KIND_PROBE = "probe"
+KIND_ENCODE = "encode"
+KIND_CHUNK = "chunk"
+# threads of each chunk encode of --chunk-seconds, chunks share all the cores
+CHUNK_THREADS = 4
+# encodes are written under a temporary name, then renamed once verified
+PARTIAL_SUFFIX = ".partial"
+JOURNAL_FILE_NAME = ".classify-journal.jsonl"
+# leases of the jobs of --worker are renewed three times per lease
+DEFAULT_WORKER_LEASE_SECONDS = 120.0
+WORKER_MAX_ATTEMPTS = 3
+WORKER_POLL_SECONDS = 5.0
+# time without change after which a new file is processed in watch mode
+DEFAULT_WATCH_SETTLE_SECONDS = 10.0
+# videos waiting for an encoder in watch mode, before new files wait on disk
+WATCH_QUEUED_VIDEOS = 16
+# format version of the plan files written by --plan
+PLAN_VERSION = 1
+DEFAULT_PROBE_JOBS = 4
+DEFAULT_TRIAL_SEGMENTS = 3
+DEFAULT_VERIFY_MODE = "full"
+VERIFY_MODES = ["full", "fused", "sampled"]
+VERIFY_SAMPLES = 5
+VERIFY_SAMPLE_SECONDS = 2
+# accepted duration gap between an encoded video and its source
+VERIFY_DURATION_TOLERANCE = 0.02
+DEFAULT_TRIAL_SEGMENT_SECONDS = 4
+DEFAULT_PICTURE_WORKERS = 1
+
+DEFAULT_COPY_MODE = "auto"
+COPY_MODES = ["auto", "reflink", "hardlink", "copy"]
+# ioctl cloning a file on filesystems sharing data blocks (btrfs, XFS)
+FICLONE = 0x40049409
+# bytes asked per copy_file_range or sendfile call
+COPY_CHUNK_SIZE = 64 * 1024 * 1024
+
+DEFAULT_DUPLICATES_MODE = "ignore"
+DUPLICATES_MODES = ["ignore", "report", "skip", "remove"]
+# bytes hashed at each end of a file before hashing it in full
+DUPLICATE_PARTIAL_HASH_SIZE = 64 * 1024
+DUPLICATE_HASH_WORKERS = 4
+
+# difference hash of DHASH_SIZE x DHASH_SIZE bits
+DHASH_SIZE = 8
+SIMILAR_HASH_CHUNK_SIZE = 64
+# blocks of the similar pictures index, dividing the DHASH_SIZE**2 hash bits
+SIMILAR_INDEX_BLOCKS = 4
+# functions listed in the text report of --profile
+PROFILE_STATS_LINES = 50
+
+# events are split after this time gap or this distance between files
+DEFAULT_ORGANIZE_GAP_HOURS = 8.0
+DEFAULT_ORGANIZE_DISTANCE_KM = 50.0
+ORGANIZE_EVENT_FORMAT = "%Y-%m-%d"
+EARTH_RADIUS_KM = 6371.0
+
 DEFAULT_FFMPEG_PATH = "ffmpeg"
+# ffmpeg and ffprobe capabilities, in the user cache directory
+TOOLS_CACHE_FILE_NAME = "tools.json"
+TOOLS_CACHE_VERSION = 1
 DEFAULT_FFMPEG_INPUT_EXTRA_ARGS = ""
 DEFAULT_FFMPEG_OUTPUT_EXTRA_ARGS = ""
 DEFAULT_FFPROBE_PATH = "ffprobe"
@@ -7,3 +7,7 @@ class ClassifyException(Exception):
 
 class ClassifyEncodingException(Exception):
     """Exception raised when encoding fails."""
+
+
+class ClassifyExifException(Exception):
+    """Exception raised when EXIF data cannot be read from the file header."""
@@ -0,0 +1,231 @@
+"""Persistent state index of the files already processed."""
+
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Self
+
+from .exception import ClassifyException
+from .processors.probe import VideoProbe
+
+_LOGGER = logging.getLogger("classify")
+
+COMMIT_INTERVAL = 500
+
+DECISION_SKIP = "skip"
+DECISION_COPY = "copy"
+DECISION_ENCODE = "encode"
+
+
+@dataclass(frozen=True)
+class IndexEntry:
+    """State of a file at the time it was last processed."""
+
+    path: str
+    size: int
+    mtime_ns: int
+    inode: int
+    date_taken: str | None = None
+    probe: VideoProbe | None = None
+    decision: str | None = None
+    target: str | None = None
+
+    def is_done(self) -> bool:
+        """Check if nothing is left to do for this file."""
+        if self.decision == DECISION_SKIP:
+            return True
+        if self.decision in (DECISION_COPY, DECISION_ENCODE) and self.target:
+            return os.path.exists(self.target)
+        return False
+
+
+class StateIndex:
+    """SQLite index keyed by path, size, mtime and inode."""
+
+    def __init__(self, path: str) -> None:
+        """Open or create the index."""
+        # only runs with --index need sqlite
+        import sqlite3
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending_writes = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                date_taken TEXT,
+                probe TEXT,
+                decision TEXT,
+                target TEXT,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+
+    def __enter__(self) -> Self:
+        """Enter the context manager."""
+        return self
+
+    def __exit__(self, *_) -> None:
+        """Close the index when leaving the context manager."""
+        self.close()
+
+    def get(self, path: str, stat: os.stat_result | None = None) -> IndexEntry | None:
+        """Get the entry of a file, if the file did not change since."""
+        path = os.path.abspath(path)
+        try:
+            stat = stat or os.stat(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT path, size, mtime_ns, inode, date_taken, probe, decision, "
+                "target FROM files WHERE path = ?",
+                (path,),
+            ).fetchone()
+        if row is None:
+            return None
+        entry = self._to_entry(row)
+        if (entry.size, entry.mtime_ns, entry.inode) != (
+            stat.st_size,
+            stat.st_mtime_ns,
+            stat.st_ino,
+        ):
+            return None
+        return entry
+
+    def record(
+        self,
+        path: str,
+        date_taken: str | None = None,
+        probe: VideoProbe | None = None,
+        decision: str | None = None,
+        target: str | None = None,
+    ) -> None:
+        """Record what is known about a file in its current state.
+
+        Values already recorded for the same state of the file are kept when
+        not given. A changed file starts from a blank entry.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        previous = self.get(path, stat)
+        if previous is not None:
+            date_taken = date_taken or previous.date_taken
+            probe = probe or previous.probe
+            decision = decision or previous.decision
+            target = target or previous.target
+
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    path,
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    stat.st_ino,
+                    date_taken,
+                    json.dumps(probe.to_dict()) if probe else None,
+                    decision,
+                    os.path.abspath(target) if target else None,
+                    time.time(),
+                ),
+            )
+            self._pending_writes += 1
+            if self._pending_writes >= COMMIT_INTERVAL:
+                self._connection.commit()
+                self._pending_writes = 0
+
+    def summary(self) -> dict[str, int]:
+        """Count entries by decision."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT COALESCE(decision, 'none'), COUNT(*) FROM files "
+                "GROUP BY decision ORDER BY decision"
+            ).fetchall()
+        return dict(rows)
+
+    def prune(self) -> int:
+        """Remove entries of files deleted or changed since they were recorded."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT path, size, mtime_ns, inode FROM files"
+            ).fetchall()
+        stale_paths = []
+        for path, size, mtime_ns, inode in rows:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                stale_paths.append((path,))
+                continue
+            if (size, mtime_ns, inode) != (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+                stale_paths.append((path,))
+        with self._lock:
+            self._connection.executemany(
+                "DELETE FROM files WHERE path = ?", stale_paths
+            )
+            self._connection.commit()
+        return len(stale_paths)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._connection.execute("DELETE FROM files")
+            self._connection.commit()
+
+    def close(self) -> None:
+        """Commit pending writes and close the index."""
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
+
+    @staticmethod
+    def _to_entry(row: tuple) -> IndexEntry:
+        """Convert a database row to an entry."""
+        path, size, mtime_ns, inode, date_taken, probe, decision, target = row
+        return IndexEntry(
+            path=path,
+            size=size,
+            mtime_ns=mtime_ns,
+            inode=inode,
+            date_taken=date_taken,
+            probe=VideoProbe.from_dict(json.loads(probe)) if probe else None,
+            decision=decision,
+            target=target,
+        )
+
+
+def run_index_command(index_path: str, command: str) -> bool:
+    """Run an index maintenance command, return True if the run should go on."""
+    with StateIndex(index_path) as index:
+        if command == "inspect":
+            summary = index.summary()
+            _LOGGER.info(
+                "Index %s: %d files (%s)",
+                index_path,
+                sum(summary.values()),
+                ", ".join(f"{decision}: {count}" for decision, count in summary.items())
+                or "empty",
+            )
+            return False
+        if command == "prune":
+            _LOGGER.info("Pruned %d stale entries from %s", index.prune(), index_path)
+            return False
+        if command == "rebuild":
+            _LOGGER.info("Clear index %s, it will be rebuilt by this run", index_path)
+            index.clear()
+            return True
+    raise ClassifyException(f"Unknown index command {command}")
@@ -0,0 +1,89 @@
+"""Write-ahead journal of video operations."""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any
+
+_LOGGER = logging.getLogger("classify")
+
+# a video encode goes through these states, each one written before moving on
+STATE_STARTED = "started"
+STATE_ENCODED = "encoded"
+STATE_DONE = "done"
+
+
+class Journal:
+    """Append-only JSON lines journal, synced to disk at each write.
+
+    Each line holds the new state of the operation on a source file, the last
+    line of a source wins. The journal is removed once a run completes, so a
+    journal found at start means the previous run was interrupted.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Init."""
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def read(self) -> dict[str, dict[str, Any]]:
+        """Return the last state of each operation of the journal."""
+        operations: dict[str, dict[str, Any]] = {}
+        if not os.path.exists(self.path):
+            return operations
+        with open(self.path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # last line cut by the interruption
+                    _LOGGER.debug("Skip truncated journal line %r", line)
+                    continue
+                operations[entry["source"]] = entry
+        return operations
+
+    def write(self, state: str, source: str, **fields: Any) -> None:
+        """Append the new state of an operation and sync it to disk."""
+        line = json.dumps(
+            {"state": state, "source": source, "time": time.time(), **fields}
+        )
+        with self._lock:
+            if self._file is None:
+                if os.path.dirname(self.path):
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                # kept open between writes, closed by reset() and close()
+                self._file = open(self.path, "a", encoding="utf-8")  # noqa: SIM115
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def reset(self) -> None:
+        """Start over with an empty journal."""
+        with self._lock:
+            self._remove()
+
+    def reset_if_settled(self) -> None:
+        """Start over if every operation is done, none is left to recover."""
+        with self._lock:
+            if all(
+                operation["state"] == STATE_DONE for operation in self.read().values()
+            ):
+                self._remove()
+
+    def _remove(self) -> None:
+        """Close and remove the journal file, under the lock."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def close(self) -> None:
+        """Close the journal, keeping it for a later resume."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
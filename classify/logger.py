@@ -1,6 +1,11 @@
 """Custom logger module"""
 
 import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
 
 
 class CustomFormatter(logging.Formatter):
@@ -46,3 +51,138 @@ def print_progress_bar(
     print(f"\r{prefix} |{progess_bar}| {percent}% {suffix}", end=print_end)
     if iteration == total:
         print()
+
+
+@dataclass
+class EncodeJob:
+    """Progress of a running encode, as reported by ffmpeg -progress."""
+
+    name: str
+    duration: float | None = None
+    out_time: float = 0.0
+    fps: float = 0.0
+    speed: float = 0.0
+
+    def render(self) -> str:
+        """Render the job progress."""
+        percent = (
+            f"{min(self.out_time / self.duration, 1) * 100:.0f}%"
+            if self.duration
+            else "?%"
+        )
+        return f"{self.name[:24]} {percent} {self.fps:.0f}fps {self.speed:.2f}x"
+
+
+class EncodeProgress:
+    """Live progress of running encodes, with the ETA of the queued videos.
+
+    The ETA weighs each remaining video by its duration and uses the
+    throughput of the encodes since the first one started.
+    """
+
+    def __init__(self, refresh_interval: float = 1.0) -> None:
+        """Init."""
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._jobs: dict[str, EncodeJob] = {}
+        self._queued: dict[str, float | None] = {}
+        self._encoded_seconds = 0.0
+        self._started: float | None = None
+        self._printed_at = 0.0
+        self._line_length = 0
+
+    def queue(self, path: str, duration: float | None = None) -> None:
+        """Add a video waiting to be encoded, or set its duration."""
+        with self._lock:
+            if path not in self._jobs:
+                self._queued[path] = duration
+
+    def dequeue(self, path: str) -> None:
+        """Remove a video that will not be encoded."""
+        with self._lock:
+            self._queued.pop(path, None)
+
+    def start(self, path: str, duration: float | None) -> None:
+        """Start tracking an encode."""
+        with self._lock:
+            self._queued.pop(path, None)
+            self._jobs[path] = EncodeJob(os.path.basename(path), duration)
+            if self._started is None:
+                self._started = time.monotonic()
+
+    def update(self, path: str, line: str) -> None:
+        """Update an encode from a `key=value` line of ffmpeg -progress."""
+        key, _, value = line.partition("=")
+        with self._lock:
+            if (job := self._jobs.get(path)) is None:
+                return
+            try:
+                if key == "out_time_us":
+                    # negative until the first frames are muxed
+                    job.out_time = max(int(value) / 1e6, 0)
+                elif key == "fps":
+                    job.fps = float(value)
+                elif key == "speed":
+                    job.speed = float(value.rstrip("x"))
+            except ValueError:
+                # ffmpeg reports N/A until the first frames are encoded
+                return
+        if key == "progress":
+            self.print()
+
+    def finish(self, path: str) -> None:
+        """Stop tracking an encode."""
+        with self._lock:
+            if (job := self._jobs.pop(path, None)) is None:
+                return
+            self._encoded_seconds += job.duration or job.out_time
+            line_length, self._line_length = self._line_length, 0
+        if line_length:
+            # clear the line for the logs of the finished job
+            print("\r" + " " * line_length + "\r", end="")
+
+    def eta(self) -> float | None:
+        """Estimate the seconds left to encode the running and queued videos."""
+        with self._lock:
+            if self._started is None:
+                return None
+            encoded = self._encoded_seconds + sum(
+                job.out_time for job in self._jobs.values()
+            )
+            elapsed = time.monotonic() - self._started
+            if not encoded or not elapsed:
+                return None
+            known = [
+                duration
+                for duration in (
+                    *(job.duration for job in self._jobs.values()),
+                    *self._queued.values(),
+                )
+                if duration
+            ]
+            average = sum(known) / len(known) if known else 0
+            remaining = sum(
+                max((job.duration or average) - job.out_time, 0)
+                for job in self._jobs.values()
+            ) + sum(duration or average for duration in self._queued.values())
+        return remaining / (encoded / elapsed)
+
+    def render(self) -> str:
+        """Render the progress of all running encodes."""
+        eta = self.eta()
+        with self._lock:
+            jobs = " | ".join(job.render() for job in self._jobs.values())
+        eta_text = str(timedelta(seconds=round(eta))) if eta is not None else "?"
+        return f"Encoding {jobs} | ETA {eta_text}"
+
+    def print(self, force: bool = False) -> None:
+        """Print the progress line, at most once per refresh interval."""
+        now = time.monotonic()
+        if not force and now - self._printed_at < self.refresh_interval:
+            return
+        self._printed_at = now
+        line = self.render()
+        with self._lock:
+            padding = max(self._line_length - len(line), 0)
+            self._line_length = len(line)
+        print("\r" + line + " " * padding, end="", flush=True)
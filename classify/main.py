@@ -3,10 +3,10 @@
 import logging
 import os
 import sys
-from subprocess import DEVNULL, STDOUT, CalledProcessError, check_call
 
 from .classify import Classify
 from .exception import ClassifyException
+from .index import run_index_command
 from .logger import CustomFormatter
 from .settings import ClassifySettings, parse_args
 
@@ -36,16 +36,14 @@ def main(arg_list: list[str] | None = None):
         _LOGGER.error("Directory %s does not exist", settings.directory)
         sys.exit(1)
 
-    _LOGGER.info("Process directory: %s", settings.directory)
+    if (
+        settings.index_path
+        and settings.index_command
+        and not run_index_command(settings.index_path, settings.index_command)
+    ):
+        return
 
-    # check if ffmpeg is installed
-    try:
-        check_call([args.ffmpeg_path, "-version"], stdout=DEVNULL, stderr=STDOUT)
-    except CalledProcessError:
-        _LOGGER.error(
-            "ffmpeg not found (install ffmpeg or set path with --ffmpeg-path)"
-        )
-        sys.exit(1)
+    _LOGGER.info("Process directory: %s", settings.directory)
 
     try:
         Classify(settings).run()
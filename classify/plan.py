@@ -0,0 +1,104 @@
+"""Execution plan of a run, written once and applied later."""
+
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict, dataclass
+from datetime import datetime
+
+from .const import PLAN_VERSION
+from .exception import ClassifyException
+
+_LOGGER = logging.getLogger("classify")
+
+ACTION_RENAME = "rename"
+ACTION_COPY = "copy"
+ACTION_ENCODE = "encode"
+ACTION_DELETE = "delete"
+ACTION_SKIP = "skip"
+
+
+@dataclass(frozen=True)
+class PlanEntry:
+    """Action planned for a file, with the state of the file at planning time."""
+
+    source: str
+    action: str
+    size: int
+    mtime_ns: int
+    target: str | None = None
+    date: str | None = None
+    duration: float | None = None
+    # pixels to encode and space saved, to estimate encodes without probing
+    pixels: float | None = None
+    saved_bytes: int | None = None
+
+    def is_stale(self) -> bool:
+        """Check if the file changed or disappeared since it was planned."""
+        try:
+            stat = os.stat(self.source)
+        except FileNotFoundError:
+            return True
+        return (stat.st_size, stat.st_mtime_ns) != (self.size, self.mtime_ns)
+
+
+class Plan:
+    """Actions of a run, written as JSON lines after a header line."""
+
+    def __init__(self) -> None:
+        """Init."""
+        self._lock = threading.Lock()
+        self.entries: list[PlanEntry] = []
+
+    def add(
+        self,
+        action: str,
+        source: str,
+        target: str | None = None,
+        date: datetime | None = None,
+        duration: float | None = None,
+        pixels: float | None = None,
+        saved_bytes: int | None = None,
+    ) -> None:
+        """Add the action planned for a file."""
+        stat = os.stat(source)
+        entry = PlanEntry(
+            source=os.path.abspath(source),
+            action=action,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            target=os.path.abspath(target) if target else None,
+            date=date.isoformat() if date else None,
+            duration=duration,
+            pixels=pixels,
+            saved_bytes=saved_bytes,
+        )
+        with self._lock:
+            self.entries.append(entry)
+
+    def write(self, path: str, directory: str) -> None:
+        """Write the plan to a file."""
+        with open(path, "w", encoding="utf-8") as file:
+            header = {"version": PLAN_VERSION, "directory": os.path.abspath(directory)}
+            file.write(json.dumps(header) + "\n")
+            for entry in self.entries:
+                fields = {
+                    key: value
+                    for key, value in asdict(entry).items()
+                    if value is not None
+                }
+                file.write(json.dumps(fields) + "\n")
+
+    @staticmethod
+    def read(path: str) -> list[PlanEntry]:
+        """Read the entries of a plan file."""
+        try:
+            with open(path, encoding="utf-8") as file:
+                header = json.loads(file.readline() or "{}")
+                if header.get("version") != PLAN_VERSION:
+                    raise ClassifyException(f"Unsupported plan file {path}")
+                _LOGGER.info("Apply plan of directory %s", header["directory"])
+                return [PlanEntry(**json.loads(line)) for line in file]
+        except (OSError, ValueError, TypeError) as exc:
+            raise ClassifyException(f"Cannot read plan file {path}: {exc}") from exc
@@ -0,0 +1,171 @@
+"""File copies and moves with the cheapest method the filesystem supports."""
+
+import errno
+import fcntl
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+
+from ..const import COPY_CHUNK_SIZE, FICLONE
+from ..exception import ClassifyException
+from ..profiling import timed
+from ..settings import ClassifySettings
+
+_LOGGER = logging.getLogger("classify")
+
+METHOD_REFLINK = "reflink"
+METHOD_HARDLINK = "hardlink"
+METHOD_COPY_FILE_RANGE = "copy_file_range"
+METHOD_SENDFILE = "sendfile"
+METHOD_COPY = "copy"
+
+# errors of a method the filesystem or the kernel does not support
+UNSUPPORTED_ERRNOS = {
+    errno.EXDEV,
+    errno.EOPNOTSUPP,
+    errno.ENOTTY,
+    errno.EINVAL,
+    errno.ENOSYS,
+    errno.EPERM,
+}
+
+
+def reflink(source: str, dest: str) -> None:
+    """Clone a file sharing its data blocks, on btrfs, XFS or similar."""
+    with open(source, "rb") as src, open(dest, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(dest)
+            raise
+
+
+def copy_in_kernel(source: str, dest: str, method: str) -> None:
+    """Copy a file without going through userspace buffers."""
+    with open(source, "rb") as src, open(dest, "wb") as dst:
+        size = os.fstat(src.fileno()).st_size
+        copied = 0
+        try:
+            while copied < size:
+                if method == METHOD_COPY_FILE_RANGE:
+                    count = os.copy_file_range(
+                        src.fileno(), dst.fileno(), COPY_CHUNK_SIZE
+                    )
+                else:
+                    count = os.sendfile(
+                        dst.fileno(), src.fileno(), copied, COPY_CHUNK_SIZE
+                    )
+                if not count:
+                    # some filesystems report no data instead of an error
+                    raise OSError(errno.EINVAL, "Short in-kernel copy")
+                copied += count
+        except OSError:
+            dst.close()
+            os.remove(dest)
+            raise
+
+
+class FileCopier:
+    """Copy and move files as set by the copy mode, and measure throughput.
+
+    The auto mode tries a reflink first, then an in-kernel copy, and only then
+    a plain copy. A method that fails as unsupported is not tried again
+    between the same filesystems.
+    """
+
+    def __init__(self, settings: ClassifySettings) -> None:
+        """Init."""
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._unsupported: set[tuple[str, int, int]] = set()
+        self.methods: Counter[str] = Counter()
+        self.bytes_copied = 0
+        self.seconds = 0.0
+
+    def _methods(self) -> list[str]:
+        """Get the methods to try, in order."""
+        if self.settings.copy_mode == METHOD_REFLINK:
+            return [METHOD_REFLINK]
+        if self.settings.copy_mode == METHOD_HARDLINK:
+            return [METHOD_HARDLINK]
+        if self.settings.copy_mode == METHOD_COPY:
+            return [METHOD_COPY]
+        methods = [METHOD_REFLINK, METHOD_COPY_FILE_RANGE, METHOD_SENDFILE, METHOD_COPY]
+        # Python is built without the calls the C library lacks
+        return [
+            method
+            for method in methods
+            if method not in (METHOD_COPY_FILE_RANGE, METHOD_SENDFILE)
+            or hasattr(os, method)
+        ]
+
+    def _copy_with(self, method: str, source: str, dest: str) -> None:
+        """Copy a file with a method."""
+        if method == METHOD_REFLINK:
+            reflink(source, dest)
+        elif method == METHOD_HARDLINK:
+            os.link(source, dest)
+        elif method in (METHOD_COPY_FILE_RANGE, METHOD_SENDFILE):
+            copy_in_kernel(source, dest, method)
+        else:
+            shutil.copyfile(source, dest)
+
+    @timed("copy")
+    def copy(self, source: str, dest: str) -> str:
+        """Copy a file, return the method used."""
+        devices = (
+            os.stat(source).st_dev,
+            os.stat(os.path.dirname(os.path.abspath(dest))).st_dev,
+        )
+        started = time.perf_counter()
+        for method in self._methods():
+            if (method, *devices) in self._unsupported:
+                continue
+            try:
+                self._copy_with(method, source, dest)
+            except OSError as exc:
+                if exc.errno not in UNSUPPORTED_ERRNOS or method == METHOD_COPY:
+                    raise
+                if self.settings.copy_mode != "auto":
+                    raise ClassifyException(
+                        f"Cannot {method} {source} to {dest}: {exc}"
+                    ) from exc
+                _LOGGER.debug("No %s from %s to %s: %s", method, source, dest, exc)
+                with self._lock:
+                    self._unsupported.add((method, *devices))
+                continue
+            with self._lock:
+                self.methods[method] += 1
+                self.bytes_copied += os.path.getsize(dest)
+                self.seconds += time.perf_counter() - started
+            return method
+        raise ClassifyException(f"Cannot copy {source} to {dest}")
+
+    def move(self, source: str, dest: str) -> None:
+        """Rename a file, copying it when it moves to another filesystem."""
+        try:
+            os.rename(source, dest)
+        except OSError as exc:
+            if exc.errno != errno.EXDEV:
+                raise
+            _LOGGER.debug("Move %s across filesystems", source)
+            self.copy(source, dest)
+            shutil.copystat(source, dest)
+            os.remove(source)
+
+    def log_summary(self) -> None:
+        """Log the copies made and their throughput."""
+        if not self.methods:
+            return
+        _LOGGER.info(
+            "Copied %d files (%s GB) in %.1fs, %s MB/s (%s)",
+            sum(self.methods.values()),
+            round(self.bytes_copied / 1e9, 3),
+            self.seconds,
+            round(self.bytes_copied / 1e6 / self.seconds) if self.seconds else "-",
+            ", ".join(f"{method}: {count}" for method, count in self.methods.items()),
+        )
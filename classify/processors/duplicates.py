@@ -0,0 +1,132 @@
+"""Exact duplicate detection."""
+
+import hashlib
+import logging
+import os
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+
+from ..const import DUPLICATE_HASH_WORKERS, DUPLICATE_PARTIAL_HASH_SIZE
+from ..plan import ACTION_DELETE
+from ..profiling import timed
+from ..settings import ClassifySettings
+from .files import FileProcessor
+
+_LOGGER = logging.getLogger("classify")
+
+
+class DuplicateProcessor:
+    """Find files with the same content, reading as few bytes as possible.
+
+    Files are grouped by size, then by a hash of their head and tail, and only
+    the files still sharing a group are hashed in full.
+    """
+
+    def __init__(
+        self, settings: ClassifySettings, file_processor: FileProcessor
+    ) -> None:
+        """Initialize the class"""
+        self.settings = settings
+        self.fp = file_processor
+        self.bytes_read = 0
+
+    def get_partial_hash(self, path: str) -> bytes:
+        """Hash the size, head and tail of a file."""
+        size = os.path.getsize(path)
+        digest = hashlib.blake2b(size.to_bytes(8, "little"))
+        with open(path, "rb") as file:
+            if size <= 2 * DUPLICATE_PARTIAL_HASH_SIZE:
+                digest.update(file.read())
+            else:
+                digest.update(file.read(DUPLICATE_PARTIAL_HASH_SIZE))
+                file.seek(-DUPLICATE_PARTIAL_HASH_SIZE, os.SEEK_END)
+                digest.update(file.read(DUPLICATE_PARTIAL_HASH_SIZE))
+        return digest.digest()
+
+    def get_full_hash(self, path: str) -> bytes:
+        """Hash the whole content of a file, streamed in chunks."""
+        with open(path, "rb") as file:
+            return hashlib.file_digest(file, "blake2b").digest()
+
+    @staticmethod
+    def _split(
+        groups: Iterable[list[str]], key: Callable[[str], bytes]
+    ) -> list[list[str]]:
+        """Split groups by a key, keep the groups of two files or more."""
+        groups = list(groups)
+        paths = [path for group in groups for path in group]
+        with ThreadPoolExecutor(max_workers=DUPLICATE_HASH_WORKERS) as executor:
+            keys = dict(zip(paths, executor.map(key, paths)))
+        split: list[list[str]] = []
+        for group in groups:
+            by_key: dict[bytes, list[str]] = defaultdict(list)
+            for path in group:
+                by_key[keys[path]].append(path)
+            split.extend(same for same in by_key.values() if len(same) > 1)
+        return split
+
+    @timed("duplicates")
+    def find_duplicates(self, paths: Iterable[str]) -> list[list[str]]:
+        """Return groups of files with the same content, in the order given.
+
+        Android trash files are left out, as they are deleted and must never
+        be kept as the original of a group.
+        """
+        by_size: dict[int, list[str]] = defaultdict(list)
+        for path in paths:
+            if self.fp.is_android_trash_file(path):
+                continue
+            size = os.path.getsize(path)
+            if size:
+                by_size[size].append(path)
+        groups = [group for group in by_size.values() if len(group) > 1]
+        self.bytes_read = sum(
+            min(size, 2 * DUPLICATE_PARTIAL_HASH_SIZE) * len(group)
+            for size, group in by_size.items()
+            if len(group) > 1
+        )
+        groups = self._split(groups, self.get_partial_hash)
+
+        # files smaller than their head and tail were already read in full
+        duplicates: list[list[str]] = []
+        candidates: list[list[str]] = []
+        for group in groups:
+            size = os.path.getsize(group[0])
+            if size <= 2 * DUPLICATE_PARTIAL_HASH_SIZE:
+                duplicates.append(group)
+            else:
+                candidates.append(group)
+                self.bytes_read += size * len(group)
+        return duplicates + self._split(candidates, self.get_full_hash)
+
+    def process(self, paths: list[str]) -> list[str]:
+        """Handle duplicates as set by the duplicates mode, return paths to process.
+
+        The first file of each group is kept as the original, other copies
+        are reported, left out of processing or removed.
+        """
+        groups = self.find_duplicates(paths)
+        duplicates = {path for group in groups for path in group[1:]}
+        _LOGGER.info(
+            "Found %d duplicates of %d files (%s GB), %s GB read to find them",
+            len(duplicates),
+            len(groups),
+            round(sum(os.path.getsize(path) for path in duplicates) / 1e9, 3),
+            round(self.bytes_read / 1e9, 3),
+        )
+
+        for original, *copies in groups:
+            for path in copies:
+                if self.settings.duplicates == "remove":
+                    _LOGGER.info("Remove %s, duplicate of %s", path, original)
+                    self.fp.add_to_plan(ACTION_DELETE, path)
+                    if not self.settings.dry_run:
+                        os.remove(path)
+                    self.fp.names.release(path)
+                else:
+                    _LOGGER.info("%s is a duplicate of %s", path, original)
+
+        if self.settings.duplicates == "report":
+            return paths
+        return [path for path in paths if path not in duplicates]
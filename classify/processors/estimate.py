@@ -0,0 +1,82 @@
+"""Estimates of the cost and gain of video encodes."""
+
+import threading
+from dataclasses import dataclass
+
+from ..const import (
+    ESTIMATE_ENCODED_BITS_PER_PIXEL,
+    ESTIMATE_PIXELS_PER_CORE_SECOND,
+    VIDEO_CODEC,
+    VIDEO_SIZE_RATIO_LIMIT,
+)
+from .probe import VideoProbe
+
+
+@dataclass(frozen=True)
+class EncodeEstimate:
+    """Estimated duration and space saved of a video encode."""
+
+    seconds: float
+    saved_bytes: int
+
+    @property
+    def savings_rate(self) -> float:
+        """Bytes saved per second of encode."""
+        return self.saved_bytes / self.seconds if self.seconds else 0.0
+
+
+class EncodeEstimator:
+    """Estimate encodes from the number of pixels to encode.
+
+    The encode time is proportional to the pixels of all frames, at a rate
+    guessed from the threads of a job until encodes of the run measure it.
+    The encoded size is a number of bits per pixel of the target codec,
+    a video already in the target codec is expected to barely shrink.
+    """
+
+    def __init__(self, threads: int) -> None:
+        """Init."""
+        self._lock = threading.Lock()
+        self._default_rate = ESTIMATE_PIXELS_PER_CORE_SECOND * threads
+        self._pixels = 0.0
+        self._seconds = 0.0
+
+    @staticmethod
+    def get_pixels(probe: VideoProbe) -> float | None:
+        """Get the pixels of all the frames of a video."""
+        if not (probe.width and probe.height and probe.frame_rate and probe.duration):
+            return None
+        return probe.width * probe.height * probe.frame_rate * probe.duration
+
+    def get_rate(self) -> float:
+        """Get the pixels encoded per second by a job."""
+        with self._lock:
+            if self._seconds:
+                return self._pixels / self._seconds
+        return self._default_rate
+
+    def estimate(self, probe: VideoProbe, size: int) -> EncodeEstimate | None:
+        """Estimate the encode of a video, None without enough probe data."""
+        if (pixels := self.get_pixels(probe)) is None:
+            return None
+        encoded_size = pixels * ESTIMATE_ENCODED_BITS_PER_PIXEL / 8
+        if probe.codec == VIDEO_CODEC:
+            encoded_size = max(encoded_size, size * VIDEO_SIZE_RATIO_LIMIT)
+        return self.estimate_pixels(pixels, max(0, round(size - encoded_size)))
+
+    def estimate_pixels(self, pixels: float, saved_bytes: int) -> EncodeEstimate:
+        """Estimate the encode of a number of pixels, at the current rate."""
+        return EncodeEstimate(seconds=pixels / self.get_rate(), saved_bytes=saved_bytes)
+
+    def observe(self, probe: VideoProbe, seconds: float) -> None:
+        """Refine the encode rate with a finished encode."""
+        if (pixels := self.get_pixels(probe)) is not None:
+            self.observe_pixels(pixels, seconds)
+
+    def observe_pixels(self, pixels: float, seconds: float) -> None:
+        """Refine the encode rate with the pixels of a finished encode."""
+        if seconds <= 0:
+            return
+        with self._lock:
+            self._pixels += pixels
+            self._seconds += seconds
@@ -0,0 +1,209 @@
+"""Header-only EXIF reader.
+
+Read the date a picture was taken straight from the JPEG APP1 segment or the
+TIFF header, without letting Pillow open and decode the file.
+"""
+
+import struct
+from typing import BinaryIO
+
+from ..exception import ClassifyExifException
+
+EXIF_HEADER = b"Exif\x00\x00"
+TIFF_HEADER_SIZE = 64 * 1024
+
+TAG_DATE_TIME = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_DATE_TIME_ORIGINAL = 0x9003
+TAG_GPS_IFD = 0x8825
+TAG_GPS_LATITUDE_REF = 0x0001
+TAG_GPS_LATITUDE = 0x0002
+TAG_GPS_LONGITUDE_REF = 0x0003
+TAG_GPS_LONGITUDE = 0x0004
+
+TYPE_ASCII = 2
+TYPE_RATIONAL = 5
+
+JPEG_SOI = b"\xff\xd8"
+JPEG_APP1 = 0xE1
+JPEG_SOS = 0xDA
+JPEG_EOI = 0xD9
+JPEG_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD8)}
+
+
+def read_date_taken(path: str) -> str | None:
+    """Read the raw EXIF date a picture was taken.
+
+    Return DateTimeOriginal from the EXIF IFD, falling back to DateTime from
+    IFD0, or None when the file has no such tag. Raise ClassifyExifException
+    when the file format is not supported by this reader.
+    """
+    tiff = _read_tiff(path)
+    if tiff is None:
+        return None
+
+    try:
+        return _read_tiff_date_taken(tiff)
+    except (struct.error, IndexError) as exc:
+        raise ClassifyExifException(f"Truncated EXIF data: {exc}") from exc
+
+
+def read_location(path: str) -> tuple[float, float] | None:
+    """Read the GPS latitude and longitude a picture was taken at.
+
+    Return None when the file has no GPS position. Raise
+    ClassifyExifException when the file format is not supported by this
+    reader.
+    """
+    tiff = _read_tiff(path)
+    if tiff is None:
+        return None
+
+    try:
+        return _read_tiff_location(tiff)
+    except (struct.error, IndexError) as exc:
+        raise ClassifyExifException(f"Truncated EXIF data: {exc}") from exc
+
+
+def _read_tiff(path: str) -> bytes | None:
+    """Return the TIFF structure holding the EXIF data of a picture."""
+    with open(path, "rb") as file:
+        head = file.read(4)
+        if head[:2] == JPEG_SOI:
+            file.seek(2)
+            return _read_jpeg_exif(file)
+        if head in (b"II*\x00", b"MM\x00*"):
+            file.seek(0)
+            return file.read(TIFF_HEADER_SIZE)
+    raise ClassifyExifException("Unsupported picture format")
+
+
+def _read_jpeg_exif(file: BinaryIO) -> bytes | None:
+    """Return the TIFF structure of the JPEG Exif APP1 segment, if any."""
+    while True:
+        marker = file.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            raise ClassifyExifException("Invalid JPEG marker")
+        if marker[1] in JPEG_STANDALONE_MARKERS or marker[1] == 0xFF:
+            if marker[1] == 0xFF:
+                file.seek(-1, 1)  # fill byte
+            continue
+        if marker[1] in (JPEG_SOS, JPEG_EOI):
+            # image data starts, there is no EXIF segment
+            return None
+
+        length_bytes = file.read(2)
+        if len(length_bytes) < 2:
+            raise ClassifyExifException("Truncated JPEG segment")
+        length = struct.unpack(">H", length_bytes)[0] - 2
+
+        if marker[1] == JPEG_APP1:
+            segment = file.read(length)
+            if segment.startswith(EXIF_HEADER):
+                return segment[len(EXIF_HEADER) :]
+        else:
+            file.seek(length, 1)
+
+
+def _read_ifd0(tiff: bytes) -> tuple[dict[int, bytes], str]:
+    """Return the entries of the first IFD of a TIFF structure and its endian."""
+    if tiff[:2] == b"II":
+        endian = "<"
+    elif tiff[:2] == b"MM":
+        endian = ">"
+    else:
+        raise ClassifyExifException("Invalid TIFF byte order")
+    if struct.unpack_from(endian + "H", tiff, 2)[0] != 42:
+        raise ClassifyExifException("Invalid TIFF magic number")
+
+    return _read_ifd(tiff, struct.unpack_from(endian + "I", tiff, 4)[0], endian), endian
+
+
+def _read_tiff_date_taken(tiff: bytes) -> str | None:
+    """Return the date taken stored in a TIFF structure."""
+    ifd0, endian = _read_ifd0(tiff)
+
+    date_taken = None
+    if (exif_ifd_offset := ifd0.get(TAG_EXIF_IFD)) is not None:
+        exif_ifd = _read_ifd(tiff, _read_long(exif_ifd_offset, endian), endian)
+        date_taken = _read_ascii(tiff, exif_ifd.get(TAG_DATE_TIME_ORIGINAL), endian)
+
+    if not date_taken:
+        date_taken = _read_ascii(tiff, ifd0.get(TAG_DATE_TIME), endian)
+
+    return date_taken or None
+
+
+def _read_tiff_location(tiff: bytes) -> tuple[float, float] | None:
+    """Return the GPS latitude and longitude stored in a TIFF structure."""
+    ifd0, endian = _read_ifd0(tiff)
+    if (gps_ifd_offset := ifd0.get(TAG_GPS_IFD)) is None:
+        return None
+    gps_ifd = _read_ifd(tiff, _read_long(gps_ifd_offset, endian), endian)
+
+    coordinates = []
+    for ref_tag, tag, negative_ref in (
+        (TAG_GPS_LATITUDE_REF, TAG_GPS_LATITUDE, "S"),
+        (TAG_GPS_LONGITUDE_REF, TAG_GPS_LONGITUDE, "W"),
+    ):
+        values = _read_rationals(tiff, gps_ifd.get(tag), endian)
+        if len(values) != 3:
+            return None
+        degrees = values[0] + values[1] / 60 + values[2] / 3600
+        if _read_ascii(tiff, gps_ifd.get(ref_tag), endian) == negative_ref:
+            degrees = -degrees
+        coordinates.append(degrees)
+    return coordinates[0], coordinates[1]
+
+
+def _read_ifd(tiff: bytes, offset: int, endian: str) -> dict[int, bytes]:
+    """Return the raw 12 bytes entries of an IFD by tag."""
+    if offset + 2 > len(tiff):
+        raise ClassifyExifException("IFD outside of the read header")
+    count = struct.unpack_from(endian + "H", tiff, offset)[0]
+    entries = {}
+    for idx in range(count):
+        entry = tiff[offset + 2 + idx * 12 : offset + 14 + idx * 12]
+        if len(entry) < 12:
+            raise ClassifyExifException("IFD outside of the read header")
+        entries[struct.unpack_from(endian + "H", entry)[0]] = entry
+    return entries
+
+
+def _read_long(entry: bytes, endian: str) -> int:
+    """Return the value of a LONG IFD entry."""
+    return struct.unpack_from(endian + "I", entry, 8)[0]
+
+
+def _read_ascii(tiff: bytes, entry: bytes | None, endian: str) -> str | None:
+    """Return the value of an ASCII IFD entry."""
+    if entry is None:
+        return None
+    value_type, count = struct.unpack_from(endian + "HI", entry, 2)
+    if value_type != TYPE_ASCII:
+        return None
+    if count <= 4:
+        value = entry[8 : 8 + count]
+    else:
+        offset = _read_long(entry, endian)
+        if offset + count > len(tiff):
+            raise ClassifyExifException("Tag value outside of the read header")
+        value = tiff[offset : offset + count]
+    return value.split(b"\x00", 1)[0].decode("ascii", errors="replace").strip()
+
+
+def _read_rationals(tiff: bytes, entry: bytes | None, endian: str) -> list[float]:
+    """Return the values of a RATIONAL IFD entry."""
+    if entry is None:
+        return []
+    value_type, count = struct.unpack_from(endian + "HI", entry, 2)
+    if value_type != TYPE_RATIONAL:
+        return []
+    offset = _read_long(entry, endian)
+    if offset + count * 8 > len(tiff):
+        raise ClassifyExifException("Tag value outside of the read header")
+    values = struct.unpack_from(f"{endian}{count * 2}I", tiff, offset)
+    return [
+        numerator / denominator if denominator else 0.0
+        for numerator, denominator in zip(values[::2], values[1::2])
+    ]
@@ -3,16 +3,89 @@
 import logging
 import os
 import re
+import threading
+from collections.abc import Callable, Iterable, Iterator
 from datetime import datetime
+from itertools import count
+from typing import TYPE_CHECKING
 
 from classify.settings import ClassifySettings
 
 from ..const import PICTURE_EXTENSIONS, VIDEO_EXTENSIONS
 from ..exception import ClassifyException
+from ..index import IndexEntry, StateIndex
+from ..plan import ACTION_DELETE, Plan, PlanEntry
+from ..profiling import timed
+from .copy import FileCopier
+
+if TYPE_CHECKING:
+    from ..workqueue import WorkQueue
 
 _LOGGER = logging.getLogger("classify")
 
 
+class NameReservations:
+    """Names taken in destination directories during a run.
+
+    Each directory is listed once, then free names are handed out from
+    memory. Names handed out are reserved until released, so concurrent
+    jobs never get the same name and files written during the run are
+    accounted for without probing the filesystem again. With `claim`, free
+    names must also be claimed from the other processes of a shared queue.
+    """
+
+    def __init__(self, claim: Callable[[str], bool] | None = None) -> None:
+        """Init."""
+        self._lock = threading.Lock()
+        self._names: dict[str, set[str]] = {}
+        # paths handed out, the files the run writes
+        self._reserved: set[str] = set()
+        self._claim = claim
+
+    def _get_names(self, directory: str) -> set[str]:
+        """Get the names taken in a directory, listing it on first use."""
+        if directory not in self._names:
+            try:
+                self._names[directory] = set(os.listdir(directory))
+            except FileNotFoundError:
+                self._names[directory] = set()
+        return self._names[directory]
+
+    def reserve(
+        self, directory: str, names: Iterable[str], own_name: str | None = None
+    ) -> str | None:
+        """Reserve the first free name, `own_name` is free for its owner."""
+        directory = os.path.normpath(directory)
+        with self._lock:
+            taken_names = self._get_names(directory)
+            for name in names:
+                if name == own_name:
+                    taken_names.add(name)
+                    self._reserved.add(os.path.join(directory, name))
+                    return name
+                if name in taken_names:
+                    continue
+                taken_names.add(name)
+                if self._claim is None or self._claim(os.path.join(directory, name)):
+                    self._reserved.add(os.path.join(directory, name))
+                    return name
+        return None
+
+    def release(self, path: str) -> None:
+        """Release the name of a file moved away or deleted."""
+        path = os.path.normpath(path)
+        directory, name = os.path.split(path)
+        with self._lock:
+            self._reserved.discard(path)
+            if directory in self._names:
+                self._names[directory].discard(name)
+
+    def is_reserved(self, path: str) -> bool:
+        """Check if a path was handed out during the run."""
+        with self._lock:
+            return os.path.normpath(path) in self._reserved
+
+
 class FileProcessor:
     """Files processor for Classify."""
 
@@ -22,13 +95,93 @@ class FileProcessor:
     def __init__(self, settings: ClassifySettings) -> None:
         """Init."""
         self.settings = settings
+        self.pictures = []
+        self.videos = []
+        # videos of a shared queue, their names are claimed in the queue
+        self.queue: WorkQueue | None = None
+        if self.settings.worker:
+            from ..workqueue import WorkQueue
+
+            self.queue = WorkQueue(self.settings.worker, self.settings.worker_lease)
+        self.names = NameReservations(
+            claim=self.queue.claim_name if self.queue else None
+        )
+        self.copier = FileCopier(settings)
+        self._exclude_patterns = [re.compile(pattern) for pattern in settings.exclude]
+        self.index = (
+            StateIndex(self.settings.index_path) if self.settings.index_path else None
+        )
+        # actions planned by --plan, and the ones of the plan to --apply
+        self.plan = Plan() if self.settings.plan else None
+        self.planned: dict[str, PlanEntry] = {}
 
         if not os.path.exists(self.settings.output):
             _LOGGER.info("Create missing output directory %s", self.settings.output)
             if not self.settings.dry_run:
                 os.makedirs(self.settings.output)
 
-        self.reload()
+    def reload(self) -> None:
+        """Reload files from a directory."""
+        for _ in self.scan():
+            pass
+
+    def is_excluded(self, relpath: str) -> bool:
+        """Check if a relative path matches an exclude pattern."""
+        return any(pattern.match(relpath) for pattern in self._exclude_patterns)
+
+    def scan(self, root: str | None = None) -> Iterator[str]:
+        """Yield pictures and videos of the directory as they are found.
+
+        Excluded directories are pruned as a whole: a directory is skipped
+        when an exclude pattern matches its relative path with a trailing
+        separator, like it would match every file under it.
+        """
+        root = root or self.settings.directory
+        self.pictures = []
+        self.videos = []
+        # files written to an output directory nested in the input directory
+        # while scanning must not be picked up again
+        output_path = os.path.abspath(self.settings.output)
+        if output_path == os.path.abspath(root):
+            output_path = None
+        directories = [root]
+        while directories:
+            directory = directories.pop()
+            try:
+                with os.scandir(directory) as scan_iterator:
+                    entries = sorted(scan_iterator, key=lambda entry: entry.name)
+            except OSError as exc:
+                _LOGGER.error("Cannot scan %s: %s", directory, exc)
+                continue
+
+            subdirectories = []
+            for entry in entries:
+                relpath = os.path.relpath(entry.path, root)
+                # DirEntry caches the file type, no stat call is needed here
+                if entry.is_dir(follow_symlinks=False):
+                    if os.path.abspath(entry.path) == output_path:
+                        _LOGGER.debug("Skip output directory %s", relpath)
+                    elif self.is_excluded(relpath + os.sep):
+                        _LOGGER.info("Exclude %s because of exclude pattern", relpath)
+                    else:
+                        subdirectories.append(entry.path)
+                    continue
+                if not entry.is_file():
+                    continue
+                file_extension = os.path.splitext(entry.name)[1].lower()
+                if file_extension not in PICTURE_EXTENSIONS + VIDEO_EXTENSIONS:
+                    continue
+                if self.is_excluded(relpath):
+                    _LOGGER.info("Exclude %s because of exclude pattern", relpath)
+                    continue
+                if file_extension in PICTURE_EXTENSIONS:
+                    self.pictures.append(entry.path)
+                else:
+                    self.videos.append(entry.path)
+                yield entry.path
+
+            # depth first, subdirectories in name order
+            directories.extend(reversed(subdirectories))
 
         _LOGGER.info(
             "Found %d pictures and %d videos",
@@ -36,22 +189,52 @@ class FileProcessor:
             len(self.videos),
         )
 
-    def reload(self) -> None:
-        """Reload files from a directory."""
-        for root, _, files in os.walk(self.settings.directory):
-            for file in files:
-                file_path = os.path.join(root, file)
-                file_relpath = os.path.relpath(file_path, self.settings.directory)
-                if any(
-                    re.match(pattern, file_relpath) for pattern in self.settings.exclude
-                ):
-                    _LOGGER.info("Exclude %s because of exclude pattern", file_relpath)
-                    continue
-                file_extension = os.path.splitext(file)[1].lower()
-                if file_extension in PICTURE_EXTENSIONS:
-                    self.pictures.append(file_path)
-                elif file_extension in VIDEO_EXTENSIONS:
-                    self.videos.append(file_path)
+    def is_picture(self, path: str) -> bool:
+        """Check if a file is a picture from its extension."""
+        return os.path.splitext(path)[1].lower() in PICTURE_EXTENSIONS
+
+    @timed("index")
+    def get_index_entry(self, path: str) -> IndexEntry | None:
+        """Get the state index entry of a file unchanged since it was recorded."""
+        if self.index is None:
+            return None
+        return self.index.get(path)
+
+    def is_done(self, path: str) -> bool:
+        """Check if the state index says an unchanged file needs no work."""
+        entry = self.get_index_entry(path)
+        if entry is not None and entry.is_done():
+            _LOGGER.debug("%s unchanged since last run (%s)", path, entry.decision)
+            return True
+        return False
+
+    @timed("index")
+    def record(self, path: str, **fields) -> None:
+        """Record what is known about a file in the state index."""
+        if self.index is None or self.settings.dry_run:
+            return
+        self.index.record(path, **fields)
+
+    def add_to_plan(
+        self,
+        action: str,
+        source: str,
+        target: str | None = None,
+        date: datetime | None = None,
+        duration: float | None = None,
+        pixels: float | None = None,
+        saved_bytes: int | None = None,
+    ) -> None:
+        """Add the action decided for a file to the plan, when planning."""
+        if self.plan is not None:
+            self.plan.add(action, source, target, date, duration, pixels, saved_bytes)
+
+    def close(self) -> None:
+        """Close the state index and the work queue."""
+        if self.index is not None:
+            self.index.close()
+        if self.queue is not None:
+            self.queue.close()
 
     def remove_file(self, file: str) -> None:
         """Remove a file from the list."""
@@ -73,33 +256,44 @@ class FileProcessor:
         relpath = os.path.dirname(os.path.relpath(file, self.settings.directory))
         return os.path.join(self.settings.output, relpath)
 
+    @timed("naming")
+    def reserve_filepath(
+        self, dest_dir: str, names: Iterable[str], source_file: str | None = None
+    ) -> str:
+        """Reserve the first available file path in a directory.
+
+        The source file may keep its own name when it is already in the
+        destination directory.
+        """
+        own_name = None
+        if source_file is not None and os.path.normpath(
+            os.path.dirname(source_file)
+        ) == os.path.normpath(dest_dir):
+            own_name = os.path.basename(source_file)
+        name = self.names.reserve(dest_dir, names, own_name=own_name)
+        if name is None:
+            raise ClassifyException(f"No available file name in {dest_dir}")
+        if name == own_name and source_file is not None:
+            return source_file
+        return os.path.join(dest_dir, name)
+
     def get_available_filepath_from_date(
         self, source_file: str, dest_dir: str, date_taken: datetime
     ) -> str:
-        """Get an available  filename from a date."""
+        """Get an available filename from a date and reserve it for the run."""
         extension = os.path.splitext(source_file)[1].lower()
         if extension == ".jpeg":
             extension = ".jpg"
+        base_name = date_taken.strftime(self.settings.name_format)
+
+        def candidate_names() -> Iterator[str]:
+            yield f"{base_name}{extension}"
+            for counter in count(97):  # ASCII code for 'a'
+                yield f"{base_name}{chr(counter)}{extension}"
 
-        new_file_name = "".join(
-            [
-                date_taken.strftime(self.settings.name_format),
-                extension,
-            ]
+        return self.reserve_filepath(
+            dest_dir, candidate_names(), source_file=source_file
         )
-        new_file_path = os.path.join(dest_dir, new_file_name)
-        counter = 97  # ASCII code for 'a'
-        while os.path.exists(new_file_path) and new_file_path != source_file:
-            new_file_name = "".join(
-                [
-                    date_taken.strftime(self.settings.name_format),
-                    chr(counter),
-                    extension,
-                ]
-            )
-            new_file_path = os.path.join(dest_dir, new_file_name)
-            counter += 1
-        return new_file_path
 
     def get_date_from_file_name(self, file_path: str) -> datetime | None:
         """Adjust creation and modification date of a file based on its name."""
@@ -108,12 +302,26 @@ class FileProcessor:
             return datetime.strptime(base_name[:19], self.settings.name_format)
         return None
 
+    def is_android_trash_file(self, file_path: str) -> bool:
+        """Check if a file is an Android trashed or pending file."""
+        return os.path.basename(file_path).startswith((".trashed", ".pending"))
+
+    @timed("trash")
+    def delete_android_trash_file(self, file_path: str) -> bool:
+        """Delete a file if it is an Android trash file, return True if it was."""
+        if self.is_android_trash_file(file_path):
+            _LOGGER.info("Delete %s", os.path.basename(file_path))
+            self.add_to_plan(ACTION_DELETE, file_path)
+            if not self.settings.dry_run:
+                os.remove(file_path)
+            # files found by the watcher are not in the scanned lists
+            for files in (self.pictures, self.videos):
+                if file_path in files:
+                    files.remove(file_path)
+            return True
+        return False
+
     def delete_android_trash_files(self) -> None:
         """Delete Android trash files."""
         for file_path in self.pictures + self.videos:
-            file_name = os.path.basename(file_path)
-            if file_name.startswith(".trashed") or file_name.startswith(".pending"):
-                _LOGGER.info("Delete %s", file_name)
-                if not self.settings.dry_run:
-                    os.remove(file_path)
-                self.remove_file(file_path)
+            self.delete_android_trash_file(file_path)
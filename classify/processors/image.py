@@ -3,12 +3,13 @@
 import logging
 import os
 from datetime import datetime
-from shutil import copyfile
-
-from PIL import Image
-from PIL.ExifTags import Base as ExifBase
 
+from ..exception import ClassifyExifException
+from ..index import DECISION_COPY, DECISION_SKIP
+from ..plan import ACTION_COPY, ACTION_RENAME, ACTION_SKIP, PlanEntry
+from ..profiling import timed
 from ..settings import ClassifySettings
+from .exif import read_date_taken, read_location
 from .files import FileProcessor
 
 _LOGGER = logging.getLogger("classify")
@@ -24,8 +25,31 @@ class ImageProcessor:
         self.settings = settings
         self.fp = file_processor
 
+    @timed("exif")
     def get_date_taken(self, path: str) -> datetime | None:
         """Get the date taken from the exif of a picture"""
+        if (entry := self.fp.get_index_entry(path)) and entry.date_taken:
+            return datetime.fromisoformat(entry.date_taken)
+
+        try:
+            date_taken = read_date_taken(path)
+        except ClassifyExifException as exc:
+            _LOGGER.debug("Read EXIF of %s with Pillow: %s", path, exc)
+            date_taken = self.get_pillow_date_taken(path)
+
+        if not date_taken:
+            return None
+
+        date = datetime.strptime(date_taken, "%Y:%m:%d %H:%M:%S")
+        self.fp.record(path, date_taken=date.isoformat())
+        return date
+
+    def get_pillow_date_taken(self, path: str) -> str | None:
+        """Get the raw date taken from the exif of a picture opened with Pillow"""
+        # Pillow is slow to import and only needed for unusual pictures
+        from PIL import Image
+        from PIL.ExifTags import Base as ExifBase
+
         with Image.open(path) as img:
             exif = img.getexif()
         if not exif:
@@ -46,11 +70,17 @@ class ImageProcessor:
             if int(ExifBase.DateTime) in exif:
                 date_taken = exif[int(ExifBase.DateTime)]
 
-        if not date_taken:
-            return None
+        return date_taken or None
 
-        return datetime.strptime(date_taken, "%Y:%m:%d %H:%M:%S")
+    def get_location(self, path: str) -> tuple[float, float] | None:
+        """Get the GPS latitude and longitude from the exif of a picture"""
+        try:
+            return read_location(path)
+        except ClassifyExifException as exc:
+            _LOGGER.debug("Cannot read location of %s: %s", path, exc)
+            return None
 
+    @timed("rename")
     def rename_from_date_taken(self, path: str) -> None:
         """Rename a picture from date taken"""
         picture_file_name = os.path.basename(path)
@@ -66,29 +96,78 @@ class ImageProcessor:
                 date_taken=picture_date_taken,
             )
             if new_picture_path != path:
-                os.makedirs(dest_dir_path, exist_ok=True)
-                if self.settings.keep_original:
-                    _LOGGER.info(
-                        "Copy picture %s to %s",
-                        path,
-                        new_picture_path,
-                    )
-                    if not self.settings.dry_run:
-                        copyfile(path, new_picture_path)
-                else:
-                    _LOGGER.info(
-                        "Rename picture %s to %s",
-                        path,
-                        new_picture_path,
-                    )
-                    if not self.settings.dry_run:
-                        os.rename(path, new_picture_path)
+                self.move(
+                    path,
+                    new_picture_path,
+                    picture_date_taken,
+                    copy=self.settings.keep_original,
+                )
             else:
                 _LOGGER.debug("Already named correctly")
+                self.fp.add_to_plan(ACTION_SKIP, path, date=picture_date_taken)
+                self.fp.record(path, decision=DECISION_SKIP)
 
         else:
             _LOGGER.warning("Cannot get date from picture %s", path)
+            self.fp.add_to_plan(ACTION_SKIP, path)
+            self.fp.record(path, decision=DECISION_SKIP)
+
+    def move(
+        self, path: str, new_picture_path: str, date_taken: datetime, copy: bool
+    ) -> None:
+        """Copy or rename a picture to its new path."""
+        if not self.settings.dry_run:
+            os.makedirs(os.path.dirname(new_picture_path), exist_ok=True)
+        if copy:
+            _LOGGER.info(
+                "Copy picture %s to %s",
+                path,
+                new_picture_path,
+            )
+            self.fp.add_to_plan(ACTION_COPY, path, new_picture_path, date_taken)
+            if not self.settings.dry_run:
+                self.fp.copier.copy(path, new_picture_path)
+            self.fp.record(path, decision=DECISION_COPY, target=new_picture_path)
+        else:
+            _LOGGER.info(
+                "Rename picture %s to %s",
+                path,
+                new_picture_path,
+            )
+            self.fp.add_to_plan(ACTION_RENAME, path, new_picture_path, date_taken)
+            if not self.settings.dry_run:
+                self.fp.copier.move(path, new_picture_path)
+            self.fp.names.release(path)
+        self.fp.record(
+            new_picture_path,
+            date_taken=date_taken.isoformat(),
+            decision=DECISION_SKIP,
+        )
+
+    @timed("rename")
+    def apply(self, entry: PlanEntry) -> None:
+        """Copy or rename a picture as planned, without reading it again."""
+        assert entry.target is not None and entry.date is not None
+        if os.path.exists(entry.target):
+            _LOGGER.error(
+                "Cannot %s %s, %s already exists",
+                entry.action,
+                entry.source,
+                entry.target,
+            )
+            return
+        self.move(
+            entry.source,
+            entry.target,
+            datetime.fromisoformat(entry.date),
+            copy=entry.action == ACTION_COPY,
+        )
 
     def process(self, path: str) -> None:
         """Process a picture"""
+        if (entry := self.fp.planned.get(path)) is not None:
+            self.apply(entry)
+            return
+        if self.fp.is_done(path):
+            return
         self.rename_from_date_taken(path)
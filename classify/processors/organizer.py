@@ -0,0 +1,170 @@
+"""Event organizer."""
+
+import logging
+import math
+import os
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from operator import attrgetter
+
+from ..const import EARTH_RADIUS_KM, ORGANIZE_EVENT_FORMAT
+from ..index import DECISION_SKIP
+from ..profiling import timed
+from ..settings import ClassifySettings
+from .files import FileProcessor
+from .image import ImageProcessor
+from .video import VideoProcessor
+
+_LOGGER = logging.getLogger("classify")
+
+
+@dataclass(frozen=True)
+class MediaItem:
+    """Picture or video with the date and place it was taken."""
+
+    path: str
+    date: datetime
+    location: tuple[float, float] | None = None
+
+
+def get_distance_km(start: tuple[float, float], end: tuple[float, float]) -> float:
+    """Return the great-circle distance between two GPS positions."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (*start, *end))
+    haversine = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(haversine))
+
+
+def split_events(
+    items: list[MediaItem], max_gap: timedelta, max_distance_km: float
+) -> list[list[MediaItem]]:
+    """Sort items by date and split them into events in a single pass.
+
+    A new event starts after a time gap longer than `max_gap`, or when an
+    item was taken farther than `max_distance_km` from the last known
+    position of the current event.
+    """
+    events: list[list[MediaItem]] = []
+    last_location = None
+    for item in sorted(items, key=attrgetter("date")):
+        if (
+            not events
+            or item.date - events[-1][-1].date > max_gap
+            or (
+                item.location is not None
+                and last_location is not None
+                and get_distance_km(last_location, item.location) > max_distance_km
+            )
+        ):
+            events.append([])
+            last_location = None
+        events[-1].append(item)
+        if item.location is not None:
+            last_location = item.location
+    return events
+
+
+class OrganizeProcessor:
+    """Move processed pictures and videos into one folder per event."""
+
+    def __init__(
+        self,
+        settings: ClassifySettings,
+        file_processor: FileProcessor,
+        image_processor: ImageProcessor,
+        video_processor: VideoProcessor,
+    ) -> None:
+        """Initialize the class"""
+        self.settings = settings
+        self.fp = file_processor
+        self.ip = image_processor
+        self.vp = video_processor
+
+    def get_item(self, path: str) -> MediaItem | None:
+        """Get the date and place a file was taken, None without a date."""
+        if self.fp.is_picture(path):
+            date = self.ip.get_date_taken(path)
+            location = self.ip.get_location(path) if date else None
+        else:
+            date = self.vp.get_date_taken(path)
+            location = self.vp.get_location(path)
+        if date is None:
+            _LOGGER.debug("No date for %s, it is left in place", path)
+            return None
+        # video dates are aware, picture dates are naive local times
+        if date.tzinfo is not None:
+            date = date.astimezone(self.settings.user_timezone).replace(tzinfo=None)
+        return MediaItem(path, date, location)
+
+    @timed("organize")
+    def plan(self, paths: list[str]) -> list[tuple[str, str]]:
+        """Return the moves of files into their event folder."""
+        with ThreadPoolExecutor(max_workers=self.settings.picture_workers) as executor:
+            items = [item for item in executor.map(self.get_item, paths) if item]
+
+        events = split_events(
+            items,
+            timedelta(hours=self.settings.organize_gap),
+            self.settings.organize_distance,
+        )
+        _LOGGER.info("Found %d events in %d files", len(events), len(items))
+
+        moves = []
+        used_names: dict[str, int] = {}
+        for event in events:
+            name = event[0].date.strftime(ORGANIZE_EVENT_FORMAT)
+            if event[-1].date.date() != event[0].date.date():
+                name += f" - {event[-1].date.strftime(ORGANIZE_EVENT_FORMAT)}"
+            # events of the same day get their own folder
+            used_names[name] = used_names.get(name, 0) + 1
+            if used_names[name] > 1:
+                name += f" ({used_names[name]})"
+            dest_dir = os.path.join(self.settings.output, name)
+            for item in event:
+                target = self.fp.reserve_filepath(
+                    dest_dir, self._candidate_names(item.path), source_file=item.path
+                )
+                if target != item.path:
+                    moves.append((item.path, target))
+        return moves
+
+    @staticmethod
+    def _candidate_names(path: str) -> Iterator[str]:
+        """Yield the name of a file, then numbered variants."""
+        name = os.path.basename(path)
+        yield name
+        stem, extension = os.path.splitext(name)
+        counter = 1
+        while True:
+            yield f"{stem}-{counter}{extension}"
+            counter += 1
+
+    def process(self) -> None:
+        """Organize the files of the output directory into event folders."""
+        paths = list(self.fp.scan(self.settings.output))
+        left_directories = set()
+        for path, target in self.plan(paths):
+            _LOGGER.info("Move %s to %s", path, target)
+            if not self.settings.dry_run:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                self.fp.copier.move(path, target)
+            self.fp.names.release(path)
+            self.fp.record(target, decision=DECISION_SKIP)
+            left_directories.add(os.path.dirname(path))
+
+        if self.settings.dry_run:
+            return
+        # deepest first, so emptied parents are removed too
+        for directory in sorted(left_directories, key=len, reverse=True):
+            while (
+                os.path.normpath(directory) != os.path.normpath(self.settings.output)
+                and os.path.isdir(directory)
+                and not os.listdir(directory)
+            ):
+                _LOGGER.debug("Remove empty directory %s", directory)
+                os.rmdir(directory)
+                directory = os.path.dirname(directory)
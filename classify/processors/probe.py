@@ -0,0 +1,78 @@
+"""Video probe record."""
+
+import json
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+
+@dataclass(frozen=True)
+class VideoProbe:
+    """Result of a single ffprobe call on a video."""
+
+    codec: str = ""
+    bitrate: int | None = None
+    duration: float | None = None
+    width: int | None = None
+    height: int | None = None
+    frame_rate: float | None = None
+    tags: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_ffprobe(cls, output: str) -> "VideoProbe":
+        """Build a probe record from ffprobe JSON output."""
+        data = json.loads(output or "{}")
+        video_format: dict[str, Any] = data.get("format", {})
+        video_streams = [
+            stream
+            for stream in data.get("streams", [])
+            if stream.get("codec_type", "video") == "video"
+        ]
+        stream: dict[str, Any] = video_streams[0] if video_streams else {}
+
+        return cls(
+            codec=str(stream.get("codec_name", "")).lower(),
+            bitrate=_to_int(video_format.get("bit_rate")),
+            duration=_to_float(video_format.get("duration")),
+            width=_to_int(stream.get("width")),
+            height=_to_int(stream.get("height")),
+            frame_rate=_to_frame_rate(stream.get("avg_frame_rate")),
+            tags={
+                str(key).lower(): str(value)
+                for key, value in video_format.get("tags", {}).items()
+            },
+        )
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "VideoProbe":
+        """Build a probe record from its dict representation."""
+        return cls(**data)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the dict representation of the probe record."""
+        return asdict(self)
+
+
+def _to_int(value: Any) -> int | None:
+    """Convert an ffprobe value to int."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value: Any) -> float | None:
+    """Convert an ffprobe value to float."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_frame_rate(value: Any) -> float | None:
+    """Convert an ffprobe rational frame rate (e.g. 30000/1001) to float."""
+    if not value or "/" not in str(value):
+        return _to_float(value)
+    numerator, denominator = (_to_float(part) for part in str(value).split("/", 1))
+    if numerator is None or not denominator:
+        return None
+    return round(numerator / denominator, 3)
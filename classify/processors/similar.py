@@ -0,0 +1,157 @@
+"""Near-duplicate picture detection with perceptual hashes."""
+
+import json
+import logging
+from collections import defaultdict
+from collections.abc import Iterator
+from itertools import combinations
+
+from ..const import DHASH_SIZE, SIMILAR_HASH_CHUNK_SIZE, SIMILAR_INDEX_BLOCKS
+from ..profiling import timed
+from ..settings import ClassifySettings
+from .files import FileProcessor
+
+_LOGGER = logging.getLogger("classify")
+
+
+def get_dhash(path: str) -> int | None:
+    """Return the difference hash of a picture, or None if it cannot be read.
+
+    The picture is reduced while decoding with `draft()`, so a JPEG is never
+    decoded at full size.
+    """
+    # imported by the worker processes, not by runs without --similar
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(path) as img:
+            img.draft("L", (DHASH_SIZE * 8, DHASH_SIZE * 8))
+            # one byte per pixel in grayscale
+            pixels = (
+                img.convert("L")
+                .resize((DHASH_SIZE + 1, DHASH_SIZE), Image.Resampling.BILINEAR)
+                .tobytes()
+            )
+    except (OSError, UnidentifiedImageError) as exc:
+        _LOGGER.debug("Cannot hash picture %s: %s", path, exc)
+        return None
+
+    dhash = 0
+    for row in range(DHASH_SIZE):
+        for col in range(DHASH_SIZE):
+            left = pixels[row * (DHASH_SIZE + 1) + col]
+            right = pixels[row * (DHASH_SIZE + 1) + col + 1]
+            dhash = (dhash << 1) | (left > right)
+    return dhash
+
+
+class HashIndex:
+    """Multi-index hashing of perceptual hashes under the Hamming distance.
+
+    Hashes are split in blocks. Two hashes at most `max_distance` bits apart
+    have at least one block at most `max_distance // blocks` bits apart, so a
+    search only compares the hashes sharing such a block, instead of all of
+    them.
+    """
+
+    def __init__(
+        self,
+        max_distance: int,
+        bits: int = DHASH_SIZE**2,
+        blocks: int = SIMILAR_INDEX_BLOCKS,
+    ) -> None:
+        """Init."""
+        self.max_distance = max_distance
+        self._block_bits = bits // blocks
+        self._block_mask = (1 << self._block_bits) - 1
+        self._tables: list[dict[int, list[tuple[int, str]]]] = [
+            defaultdict(list) for _ in range(blocks)
+        ]
+        # block values to look up around the block of a searched hash
+        radius = max_distance // blocks
+        self._variants = [
+            sum(1 << bit for bit in flipped)
+            for count in range(radius + 1)
+            for flipped in combinations(range(self._block_bits), count)
+        ]
+
+    def _blocks(self, value: int) -> Iterator[tuple[dict, int]]:
+        """Yield each table with the block of a hash it is keyed by."""
+        for idx, table in enumerate(self._tables):
+            yield table, (value >> (idx * self._block_bits)) & self._block_mask
+
+    def add(self, value: int, path: str) -> None:
+        """Add the hash of a picture."""
+        for table, block in self._blocks(value):
+            table[block].append((value, path))
+
+    def search(self, value: int) -> Iterator[tuple[int, str]]:
+        """Yield the distance and path of pictures close to a hash."""
+        seen = set()
+        for table, block in self._blocks(value):
+            for variant in self._variants:
+                for other, path in table.get(block ^ variant, ()):
+                    if path in seen:
+                        continue
+                    seen.add(path)
+                    distance = (other ^ value).bit_count()
+                    if distance <= self.max_distance:
+                        yield distance, path
+
+
+class SimilarProcessor:
+    """Find pictures that look the same, e.g. burst shots or re-saved copies."""
+
+    def __init__(
+        self, settings: ClassifySettings, file_processor: FileProcessor
+    ) -> None:
+        """Initialize the class"""
+        self.settings = settings
+        self.fp = file_processor
+
+    @timed("similar")
+    def find_similar(self, paths: list[str], max_distance: int) -> list[list[str]]:
+        """Return groups of pictures within a hash distance of each other."""
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor() as executor:
+            hashes = list(
+                executor.map(get_dhash, paths, chunksize=SIMILAR_HASH_CHUNK_SIZE)
+            )
+
+        # union-find, so chains of close pictures end up in one group
+        parents = {path: path for path in paths}
+
+        def find(path: str) -> str:
+            while parents[path] != path:
+                parents[path] = parents[parents[path]]
+                path = parents[path]
+            return path
+
+        index = HashIndex(max_distance)
+        for path, dhash in zip(paths, hashes):
+            if dhash is None:
+                continue
+            for _, match in index.search(dhash):
+                parents[find(match)] = find(path)
+            index.add(dhash, path)
+
+        groups: dict[str, list[str]] = {}
+        for path in paths:
+            groups.setdefault(find(path), []).append(path)
+        return [group for group in groups.values() if len(group) > 1]
+
+    def report(self, paths: list[str]) -> None:
+        """Log groups of similar pictures, and write them to the report file."""
+        assert self.settings.similar is not None
+        groups = self.find_similar(paths, self.settings.similar)
+        _LOGGER.info(
+            "Found %d groups of similar pictures among %d pictures",
+            len(groups),
+            len(paths),
+        )
+        for group in groups:
+            _LOGGER.info("Similar pictures: %s", ", ".join(group))
+        if self.settings.similar_report:
+            with open(self.settings.similar_report, "w", encoding="utf-8") as file:
+                json.dump(groups, file, indent=2)
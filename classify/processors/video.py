@@ -1,17 +1,50 @@
 """Video processor."""
 
+from __future__ import annotations
+
+import functools
 import logging
+import math
 import os
 import re
-import subprocess
-import sys
-from datetime import datetime, timezone
-from typing import Tuple
+import shlex
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Tuple
 
-from classify.const import VIDEO_CODEC
-from classify.exception import ClassifyEncodingException
+from classify.const import (
+    CHUNK_THREADS,
+    DEFAULT_PROBE_JOBS,
+    DEFAULT_TRIAL_SEGMENT_SECONDS,
+    DEFAULT_TRIAL_SEGMENTS,
+    JOURNAL_FILE_NAME,
+    KIND_CHUNK,
+    KIND_ENCODE,
+    PARTIAL_SUFFIX,
+    VERIFY_DURATION_TOLERANCE,
+    VERIFY_SAMPLE_SECONDS,
+    VERIFY_SAMPLES,
+    VIDEO_CODEC,
+    VIDEO_PRESET,
+    VIDEO_SIZE_RATIO_LIMIT,
+)
+from classify.exception import ClassifyEncodingException, ClassifyException
+from classify.index import DECISION_ENCODE, DECISION_SKIP
+from classify.journal import STATE_DONE, STATE_ENCODED, STATE_STARTED, Journal
+from classify.logger import EncodeProgress
+from classify.plan import ACTION_ENCODE, ACTION_SKIP
+from classify.processors.estimate import EncodeEstimate, EncodeEstimator
 from classify.processors.files import FileProcessor
+from classify.processors.probe import VideoProbe
+from classify.profiling import timed
 from classify.settings import ClassifySettings
+from classify.tools import ToolsChecker
+
+if TYPE_CHECKING:
+    from classify.runner import ProcessResult, ProcessRunner
+    from classify.workqueue import WorkQueue
 
 _LOGGER = logging.getLogger("classify")
 
@@ -31,14 +64,52 @@ class VideoProcessor:
         """Initialize the class"""
         self.settings = settings
         self.fp = file_processor
+        self._probes: dict[str, tuple[tuple[int, int], VideoProbe]] = {}
+        self._lock = threading.Lock()
+        self._probe_futures: dict[str, Future[ProcessResult]] = {}
+        # the runner and its asyncio loop are started for the first video
+        self._runner: ProcessRunner | None = None
+        self._runner_lock = threading.Lock()
+        self._predictions: list[tuple[float, float]] = []
+        self._predicted_skips = 0
+        self.progress = EncodeProgress()
+        # workers of a shared queue record their steps in the queue
+        self.journal: Journal | WorkQueue = self.fp.queue or Journal(
+            os.path.join(settings.output, JOURNAL_FILE_NAME)
+        )
+        self._resumed: set[str] = set()
+        # ffmpeg and ffprobe are only checked once a video is found
+        self.tools = ToolsChecker(settings)
+        self.estimator = EncodeEstimator(self.get_threads())
+        # end of the time budget, videos that do not fit are left for later
+        self.deadline = (
+            time.monotonic() + settings.time_budget * 60
+            if settings.time_budget
+            else None
+        )
+        self.over_budget: set[str] = set()
 
+    @timed("date")
     def get_date_taken(self, path: str) -> datetime:
         """Get the date taken from the exif of a video."""
+        if (entry := self.fp.get_index_entry(path)) and entry.date_taken:
+            return datetime.fromisoformat(entry.date_taken)
+
+        date_taken = self._get_date_taken(path)
+        self.fp.record(path, date_taken=date_taken.isoformat())
+        return date_taken
+
+    def _get_date_taken(self, path: str) -> datetime:
+        """Get the date taken from metadata, filename or file date."""
         if creation_time_metadata := self.get_metadata(path, "creation_time"):
             _LOGGER.debug("Date taken from metadata: %s", creation_time_metadata)
-            date_metadata = datetime.strptime(
-                creation_time_metadata, "%Y-%m-%dT%H:%M:%S.%fZ"
-            ).replace(tzinfo=timezone.utc)
+            try:
+                date_metadata = datetime.strptime(
+                    creation_time_metadata, "%Y-%m-%dT%H:%M:%S.%fZ"
+                ).replace(tzinfo=timezone.utc)
+            except ValueError:
+                # local time written by the encoder of a previous run
+                return datetime.strptime(creation_time_metadata, "%Y-%m-%d %H:%M:%S")
             local_time = date_metadata.astimezone(self.settings.user_timezone)
             return local_time
 
@@ -55,91 +126,149 @@ class VideoProcessor:
         _LOGGER.debug("Date taken from file date")
         return datetime.fromtimestamp(os.path.getctime(path))
 
-    def get_bitrate(self, path: str) -> float:
-        """Get the bitrate of a video in Mbps."""
-        command = os.popen(
-            " ".join(
-                [
-                    self.settings.ffprobe_path,
-                    "-v",
-                    "error",
-                    "-select_streams",
-                    "v:0",
-                    "-show_entries",
-                    "format=bit_rate",
-                    "-of",
-                    "default=noprint_wrappers=1:nokey=1",
-                    f'"{path}"',
-                ]
+    @timed("probe")
+    def probe(self, path: str) -> VideoProbe:
+        """Probe a video once with ffprobe and memoize the result."""
+        stat = os.stat(path)
+        cache_key = (stat.st_size, stat.st_mtime_ns)
+        if (cached := self._probes.get(path)) and cached[0] == cache_key:
+            return cached[1]
+
+        if (entry := self.fp.get_index_entry(path)) and entry.probe:
+            self._probes[path] = (cache_key, entry.probe)
+            return entry.probe
+
+        with self._lock:
+            probe_future = self._probe_futures.pop(path, None)
+        self.tools.check()
+        probe_process = (
+            probe_future or self.runner.submit(self.get_probe_args(path))
+        ).result()
+        if probe_process.returncode != 0:
+            _LOGGER.warning(
+                "Cannot probe video %s: %s",
+                path,
+                probe_process.stderr.decode(errors="replace").strip(),
             )
+            video_probe = VideoProbe()
+        else:
+            video_probe = VideoProbe.from_ffprobe(probe_process.stdout.decode())
+            # encodes are recorded under their final name once committed
+            if not path.endswith(PARTIAL_SUFFIX):
+                self.fp.record(path, probe=video_probe)
+
+        self._probes[path] = (cache_key, video_probe)
+        return video_probe
+
+    def get_probe_args(self, path: str) -> list[str]:
+        """Get the ffprobe arguments to probe a video."""
+        return [
+            self.settings.ffprobe_path,
+            "-v",
+            "error",
+            "-select_streams",
+            "v:0",
+            "-print_format",
+            "json",
+            "-show_format",
+            "-show_streams",
+            path,
+        ]
+
+    def prefetch(self, path: str) -> None:
+        """Start probing a video in the background, ahead of its processing."""
+        if (planned := self.fp.planned.get(path)) is not None:
+            self.progress.queue(path, planned.duration)
+            return
+        entry = self.fp.get_index_entry(path)
+        if entry is not None and entry.is_done():
+            return
+        if entry is not None and entry.probe:
+            self.progress.queue(path, entry.probe.duration)
+            return
+        if (cached := self._probes.get(path)) is not None:
+            self.progress.queue(path, cached[1].duration)
+            return
+        self.progress.queue(path)
+        with self._lock:
+            if path in self._probe_futures:
+                return
+            future = self.runner.submit(self.get_probe_args(path))
+            self._probe_futures[path] = future
+        future.add_done_callback(lambda _: self._queue_probed(path, future))
+
+    def _queue_probed(self, path: str, future: Future[ProcessResult]) -> None:
+        """Set the duration of a queued video once its probe is done."""
+        if future.cancelled() or future.exception() or future.result().returncode:
+            return
+        try:
+            probe = VideoProbe.from_ffprobe(future.result().stdout.decode())
+        except ValueError:
+            return
+        self.progress.queue(path, probe.duration)
+
+    def get_duration(self, path: str) -> float | None:
+        """Get the duration of a video, from the plan when applying one."""
+        if (planned := self.fp.planned.get(path)) is not None and planned.duration:
+            return planned.duration
+        return self.probe(path).duration
+
+    def estimate(self, path: str) -> EncodeEstimate | None:
+        """Estimate the encode duration and space saved of a video.
+
+        When applying a plan, the estimate comes from the plan.
+        """
+        if (planned := self.fp.planned.get(path)) is not None:
+            if planned.pixels is None or planned.saved_bytes is None:
+                return None
+            return self.estimator.estimate_pixels(planned.pixels, planned.saved_bytes)
+        return self.estimator.estimate(self.probe(path), os.path.getsize(path))
+
+    def fits_time_budget(self, path: str) -> bool:
+        """Check if a video would be encoded before the end of the time budget."""
+        if self.deadline is None or self.fp.plan is not None:
+            return True
+        left = self.deadline - time.monotonic()
+        estimate = self.estimate(path)
+        needed = estimate.seconds if estimate is not None else 0.0
+        if needed <= left:
+            return True
+        _LOGGER.info(
+            "Leave %s for a later run, its encode takes about %s and %s is left",
+            path,
+            timedelta(seconds=round(needed)),
+            timedelta(seconds=round(max(left, 0))),
         )
-        bitrate = command.read().strip()
-        return round(int(bitrate) / 1000 / 1000, 2)
+        with self._lock:
+            self.over_budget.add(path)
+        return False
+
+    def get_bitrate(self, path: str) -> float:
+        """Get the bitrate of a video in Mbps."""
+        bitrate = self.probe(path).bitrate
+        if bitrate is None:
+            raise ClassifyException(f"Cannot get bitrate of video {path}")
+        return round(bitrate / 1000 / 1000, 2)
 
     def get_codec(self, path: str) -> str:
         """Get the codec of a video."""
-        command = os.popen(
-            " ".join(
-                [
-                    self.settings.ffprobe_path,
-                    "-v",
-                    "error",
-                    "-select_streams",
-                    "v:0",
-                    "-show_entries",
-                    "stream=codec_name",
-                    "-of",
-                    "default=noprint_wrappers=1:nokey=1",
-                    f'"{path}"',
-                ]
-            )
-        )
-        codec = command.read().strip()
-        return codec.lower()
+        return self.probe(path).codec
 
     def get_metadata(self, path: str, metadata: str) -> str:
         """Get the comment metadata of a video."""
-        command = os.popen(
-            " ".join(
-                [
-                    self.settings.ffprobe_path,
-                    "-v",
-                    "error",
-                    "-show_entries",
-                    f"format_tags={metadata}",
-                    "-of",
-                    "default=noprint_wrappers=1:nokey=1",
-                    f'"{path}"',
-                ]
-            )
-        )
-        return command.read().strip()
+        return self.probe(path).tags.get(metadata.lower(), "")
 
     def get_location(self, path: str) -> Tuple[float, float] | None:
         """Get the location of a video."""
-        command = os.popen(
-            " ".join(
-                [
-                    self.settings.ffprobe_path,
-                    "-v",
-                    "error",
-                    "-select_streams",
-                    "v:0",
-                    "-show_entries",
-                    "format_tags=location",
-                    "-of",
-                    "default=noprint_wrappers=1:nokey=1",
-                    f'"{path}"',
-                ]
-            )
+        match = re.match(
+            r"([+-]?\d+\.\d+)([+-]\d+\.\d+)", self.get_metadata(path, "location")
         )
-        match = re.match(r"([+-]?\d+\.\d+)([+-]\d+\.\d+)", command.read().strip())
 
         if match:
             latitude = float(match.group(1))
             longitude = float(match.group(2))
             return (latitude, longitude)
-        _LOGGER.error("Location not found in video")
+        _LOGGER.debug("Location not found in video %s", path)
         return None
 
     def is_already_reencoded(self, path: str) -> bool:
@@ -177,22 +306,27 @@ class VideoProcessor:
             and video_bitrate <= self.settings.video_bitrate_limit
         )
 
+    @timed("replace")
     def choose_between_original_and_reencoded(
-        self, video_path: str, encoded_file_path: str
+        self, video_path: str, encoded_file_path: str, temp_file_path: str
     ) -> None:
-        """Choose between the original and the encoded video."""
+        """Choose between the original and the encoded video.
+
+        The kept video gets its final name with an atomic rename, the original
+        is only removed once the encoded video is in place.
+        """
         original_size = os.path.getsize(video_path)
 
         if self.settings.dry_run:
             encoded_size = original_size * 0.8  # fake encoded size
-        elif not os.path.exists(encoded_file_path):
+        elif not os.path.exists(temp_file_path):
             _LOGGER.error(
                 "Encoded file %s does not exist.",
-                os.path.basename(encoded_file_path),
+                os.path.basename(temp_file_path),
             )
             return
         else:
-            encoded_size = os.path.getsize(encoded_file_path)
+            encoded_size = os.path.getsize(temp_file_path)
 
         size_ratio = encoded_size / original_size
 
@@ -202,16 +336,17 @@ class VideoProcessor:
             round(encoded_size / 1e9, 3),
         )
 
-        if size_ratio > 0.90:
+        if size_ratio > VIDEO_SIZE_RATIO_LIMIT:
             if not self.settings.dry_run:
-                os.remove(encoded_file_path)
+                os.remove(temp_file_path)
             _LOGGER.warning(
                 "Encoding file %s deleted because space too close from original file.",
                 os.path.basename(encoded_file_path),
             )
 
             if not self.settings.dry_run:
-                os.rename(video_path, encoded_file_path)
+                self.fp.copier.move(video_path, encoded_file_path)
+            self.fp.names.release(video_path)
             _LOGGER.info(
                 "Original file %s renamed to %s.",
                 os.path.basename(video_path),
@@ -219,18 +354,260 @@ class VideoProcessor:
             )
         else:
             if not self.settings.dry_run:
+                os.replace(temp_file_path, encoded_file_path)
                 os.remove(video_path)
+            self.fp.names.release(video_path)
             _LOGGER.info("Original file %s deleted.", os.path.basename(video_path))
 
+    def commit(
+        self, video_path: str, temp_file_path: str, encoded_file_path: str
+    ) -> None:
+        """Give a verified encode its final name and mark the video done."""
+        if self.settings.keep_original:
             if not self.settings.dry_run:
-                os.utime(
-                    encoded_file_path,
-                    (
-                        os.path.getatime(encoded_file_path),
-                        os.path.getmtime(encoded_file_path),
-                    ),
+                os.replace(temp_file_path, encoded_file_path)
+            self.fp.record(
+                video_path, decision=DECISION_ENCODE, target=encoded_file_path
+            )
+        else:
+            self.choose_between_original_and_reencoded(
+                video_path=video_path,
+                encoded_file_path=encoded_file_path,
+                temp_file_path=temp_file_path,
+            )
+        cached = self._probes.pop(temp_file_path, None)
+        if os.path.exists(encoded_file_path):
+            # a rename keeps the size and mtime, a kept encode keeps its probe
+            stat = os.stat(encoded_file_path)
+            probe = None
+            if cached is not None and cached[0] == (stat.st_size, stat.st_mtime_ns):
+                probe = cached[1]
+            self.fp.record(encoded_file_path, probe=probe, decision=DECISION_SKIP)
+        self.write_journal(STATE_DONE, video_path)
+
+    def write_journal(self, state: str, video_path: str, **fields: str) -> None:
+        """Write the new state of a video to the journal."""
+        if not self.settings.dry_run:
+            self.journal.write(state, os.path.abspath(video_path), **fields)
+
+    def recover(self) -> None:
+        """Handle the journal left by an interrupted run.
+
+        Partial encodes are removed. With resume, encodes verified before the
+        interruption are committed and finished videos are not processed
+        again, otherwise everything starts over.
+        """
+        operations = self.journal.read()
+        if not operations or self.settings.dry_run:
+            return
+        if not self.settings.resume:
+            _LOGGER.warning(
+                "Previous run was interrupted, start over "
+                "(use --resume to keep its finished encodes)"
+            )
+
+        for source, operation in operations.items():
+            temp = operation.get("temp", "")
+            target = operation.get("target", "")
+            if operation["state"] == STATE_DONE:
+                if self.settings.resume:
+                    self._resumed.add(source)
+                continue
+            if (
+                self.settings.resume
+                and operation["state"] == STATE_ENCODED
+                and os.path.exists(temp)
+                and os.path.exists(source)
+                and self.fp.names.reserve(
+                    os.path.dirname(target), [os.path.basename(target)]
+                )
+            ):
+                _LOGGER.info("Resume encoded video %s", source)
+                self.commit(source, temp, target)
+                self._resumed.add(source)
+                continue
+            if os.path.exists(temp):
+                _LOGGER.info("Remove partial encode %s", temp)
+                os.remove(temp)
+
+        if not self.settings.resume:
+            self.journal.reset()
+
+    @timed("trial")
+    def predict_size_ratio(self, path: str) -> float | None:
+        """Predict the encoded size ratio of a video from short sample encodes.
+
+        Samples are spread over the video and encoded with the same settings
+        as the full encode. Return None when the video is too short to sample
+        or a sample fails.
+        """
+        video_probe = self.probe(path)
+        segments = DEFAULT_TRIAL_SEGMENTS
+        segment_seconds = DEFAULT_TRIAL_SEGMENT_SECONDS
+        if (
+            not video_probe.duration
+            or not video_probe.bitrate
+            or video_probe.duration < 2 * segments * segment_seconds
+        ):
+            return None
+
+        import tempfile
+
+        encoded_size = 0
+        with tempfile.TemporaryDirectory(prefix="classify-trial-") as trial_dir:
+            for idx in range(segments):
+                start = video_probe.duration * (idx + 1) / (segments + 1)
+                sample_path = os.path.join(trial_dir, f"sample-{idx}.mp4")
+                sample_process = self.runner.run(
+                    [
+                        self.settings.ffmpeg_path,
+                        "-y",
+                        "-v",
+                        "error",
+                        "-ss",
+                        str(round(start - segment_seconds / 2, 3)),
+                        "-t",
+                        str(segment_seconds),
+                        "-i",
+                        path,
+                        "-c:v",
+                        self.settings.ffmpeg_lib,
+                        "-crf",
+                        str(self.settings.ffmpeg_crf),
+                        "-preset",
+                        VIDEO_PRESET,
+                        *self.get_thread_args(),
+                        "-acodec",
+                        "copy",
+                        sample_path,
+                    ],
+                    KIND_ENCODE,
+                )
+                if sample_process.returncode != 0:
+                    _LOGGER.warning(
+                        "Trial encode of %s failed: %s",
+                        path,
+                        sample_process.stderr.decode().strip(),
+                    )
+                    return None
+                encoded_size += os.path.getsize(sample_path)
+
+        original_size = video_probe.bitrate / 8 * segment_seconds * segments
+        return encoded_size / original_size
+
+    def log_prediction_accuracy(self) -> None:
+        """Log how close trial encode predictions were to the full encodes."""
+        if not self._predictions and not self._predicted_skips:
+            return
+        _LOGGER.info(
+            "Trial encodes skipped %d videos",
+            self._predicted_skips,
+        )
+        if self._predictions:
+            errors = [
+                abs(predicted - actual) for predicted, actual in self._predictions
+            ]
+            _LOGGER.info(
+                "Trial encode size ratio error on %d encoded videos: "
+                "mean %.1f%%, max %.1f%%",
+                len(errors),
+                sum(errors) / len(errors) * 100,
+                max(errors) * 100,
+            )
+
+    def get_threads(self) -> int:
+        """Get the threads of an encode job."""
+        return max(1, (os.process_cpu_count() or 1) // self.settings.jobs)
+
+    def get_thread_args(self, threads: int | None = None) -> list[str]:
+        """Get ffmpeg arguments limiting an encode to threads, or its job budget."""
+        if threads is None:
+            if self.settings.jobs <= 1:
+                return []
+            threads = self.get_threads()
+        thread_args = ["-threads", str(threads)]
+        if self.settings.ffmpeg_lib == "libx265":
+            # same frame threads scale as x265 auto-detection, on the thread budget
+            frame_threads = next(
+                count
+                for cores, count in ((32, 6), (16, 5), (8, 3), (4, 2), (0, 1))
+                if threads >= cores
+            )
+            thread_args += [
+                "-x265-params",
+                f"pools={threads}:frame-threads={frame_threads}",
+            ]
+        return thread_args
+
+    @property
+    def runner(self) -> ProcessRunner:
+        """Get the subprocess runner, starting it on first use."""
+        with self._runner_lock:
+            if self._runner is None:
+                from classify.runner import ProcessRunner
+
+                self._runner = ProcessRunner(
+                    probe_limit=DEFAULT_PROBE_JOBS,
+                    encode_limit=self.settings.jobs,
+                    chunk_limit=max(1, (os.process_cpu_count() or 1) // CHUNK_THREADS),
                 )
+            return self._runner
+
+    def kill_running(self) -> None:
+        """Kill all running ffprobe and ffmpeg processes."""
+        if self._runner is not None:
+            self._runner.cancel_all()
+
+    def close(self) -> None:
+        """Stop the subprocess runner and close the journal."""
+        if self._runner is not None:
+            self._runner.close()
+        self.journal.close()
+
+    def get_codec_args(self, threads: int | None = None) -> list[str]:
+        """Get the ffmpeg arguments of the video codec and its settings."""
+        return [
+            "-c:v",
+            self.settings.ffmpeg_lib,
+            "-crf",
+            str(self.settings.ffmpeg_crf),
+            "-preset",
+            VIDEO_PRESET,
+            *self.get_thread_args(threads),
+        ]
+
+    def get_metadata_args(self, recorded_date: datetime) -> list[str]:
+        """Get the ffmpeg arguments of the metadata marking an encoded video."""
+        return [
+            "-movflags",
+            "use_metadata_tags",
+            "-metadata",
+            f"creation_time={recorded_date.strftime('%Y-%m-%d %H:%M:%S')}",
+            "-metadata",
+            f"comment={self.settings.comment_message}",
+        ]
 
+    def get_output_args(self) -> list[str]:
+        """Get the ffmpeg arguments of progress, checks and extra input settings."""
+        return [
+            "-loglevel",
+            "warning",
+            "-nostats",
+            "-progress",
+            "pipe:1",
+            # fused verification: stop on the first decoding error
+            *(["-xerror"] if self.settings.verify == "fused" else []),
+            *shlex.split(self.settings.ffmpeg_input_extra_args),
+        ]
+
+    def is_chunked(self, path: str) -> bool:
+        """Check if a video is long enough to be encoded in chunks."""
+        if self.settings.chunk_seconds is None:
+            return False
+        duration = self.get_duration(path)
+        return bool(duration and duration >= 2 * self.settings.chunk_seconds)
+
+    @timed("encode")
     def encode(
         self,
         input_path: str,
@@ -238,77 +615,313 @@ class VideoProcessor:
         recorded_date: datetime,
     ) -> None:
         """Encode a video."""
-        command = " ".join(
-            [
-                self.settings.ffmpeg_path,
-                "-y",
-                "-i",
-                f'"{os.path.abspath(input_path)}"',
-                "-movflags",
-                "use_metadata_tags",
-                "-c:v",
-                self.settings.ffmpeg_lib,
-                "-crf",
-                str(self.settings.ffmpeg_crf),
-                "-preset",
-                "medium",
-                "-acodec",
-                "copy",
-                "-metadata",
-                f'creation_time="{recorded_date.strftime("%Y-%m-%d %H:%M:%S")}"',
-                "-metadata",
-                f'comment="{self.settings.comment_message}"',
-                "-loglevel",
-                "warning",
-                "-stats",
-                self.settings.ffmpeg_input_extra_args,
-                f'"{os.path.abspath(output_path)}"',
-                self.settings.ffmpeg_output_extra_args,
-            ]
-        )
-        _LOGGER.debug(command)
+        command = [
+            self.settings.ffmpeg_path,
+            "-y",
+            "-i",
+            os.path.abspath(input_path),
+            *self.get_codec_args(),
+            "-acodec",
+            "copy",
+            *self.get_metadata_args(recorded_date),
+            *self.get_output_args(),
+            # the output may be a temporary name without the mp4 extension
+            "-f",
+            "mp4",
+            os.path.abspath(output_path),
+            *shlex.split(self.settings.ffmpeg_output_extra_args),
+        ]
+        chunked = self.is_chunked(input_path)
+        if not chunked:
+            _LOGGER.debug(shlex.join(command))
         if self.settings.dry_run:
             return
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        _LOGGER.debug("Encoding started")
+        self.progress.start(input_path, self.get_duration(input_path))
+        started = time.monotonic()
         try:
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            with subprocess.Popen(
-                args=command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                shell=True,
-            ) as encode_process:
-                _LOGGER.debug("Encoding started")
-                stdout, stderr = encode_process.communicate()
+            if chunked:
+                self.encode_chunks(input_path, output_path, recorded_date)
+            else:
+                encode_process = self.runner.run(
+                    command,
+                    KIND_ENCODE,
+                    on_line=lambda line: self.progress.update(input_path, line),
+                )
+                # with fused verification, -xerror fails on decoding errors
                 if encode_process.returncode != 0:
                     raise ClassifyEncodingException(
-                        stderr.decode() + " " + stdout.decode()
+                        encode_process.stderr.decode(errors="replace")
                     )
-        except KeyboardInterrupt:
-            encode_process.kill()
-            sys.exit(1)
+        except CancelledError as exc:
+            raise ClassifyEncodingException("Encoding cancelled") from exc
+        finally:
+            self.progress.finish(input_path)
+        # estimates are only needed for probed or planned videos
+        if (cached := self._probes.get(input_path)) is not None:
+            self.estimator.observe(cached[1], time.monotonic() - started)
+        elif (planned := self.fp.planned.get(input_path)) and planned.pixels:
+            self.estimator.observe_pixels(planned.pixels, time.monotonic() - started)
 
-    def test(self, path: str) -> bool:
-        """Test if a file is a correct video."""
+    def encode_chunks(
+        self, input_path: str, output_path: str, recorded_date: datetime
+    ) -> None:
+        """Encode a long video in chunks at the same time.
+
+        The video stream is split at keyframes without encoding, the chunks
+        are encoded concurrently and joined again without encoding, with the
+        audio and metadata of the original video.
+        """
+        import tempfile
+
+        chunk_seconds = self.settings.chunk_seconds
+        duration = self.get_duration(input_path)
+        assert chunk_seconds is not None and duration is not None
+        # chunks are next to the output, on a filesystem with room for it
+        with tempfile.TemporaryDirectory(
+            prefix=".classify-chunks-", dir=os.path.dirname(output_path)
+        ) as chunk_dir:
+            self.run_chunk_step(
+                [
+                    self.settings.ffmpeg_path,
+                    "-v",
+                    "error",
+                    "-i",
+                    os.path.abspath(input_path),
+                    "-map",
+                    "0:v:0",
+                    "-c",
+                    "copy",
+                    "-f",
+                    "segment",
+                    # unlike matroska, mov keeps the display matrix, so
+                    # chunks of portrait videos are rotated when encoded
+                    "-segment_format",
+                    "mov",
+                    # each chunk starts at the first keyframe after its time
+                    "-segment_times",
+                    ",".join(
+                        str(round(chunk_seconds * idx, 3))
+                        for idx in range(1, math.ceil(duration / chunk_seconds))
+                    ),
+                    "-reset_timestamps",
+                    "1",
+                    os.path.join(chunk_dir, "source-%04d.chunk"),
+                ]
+            )
+            sources = sorted(
+                name for name in os.listdir(chunk_dir) if name.startswith("source-")
+            )
+            _LOGGER.debug("Encode %s in %d chunks", input_path, len(sources))
+            # the progress of the video adds up the progress of its chunks
+            chunks_progress = [
+                {"out_time_us": 0.0, "fps": 0.0, "speed": 0.0} for _ in sources
+            ]
+
+            def on_line(idx: int, line: str) -> None:
+                key, _, value = line.partition("=")
+                chunk_progress = chunks_progress[idx]
+                if key == "progress" and value == "end":
+                    chunk_progress.update(fps=0.0, speed=0.0)
+                elif key in chunk_progress:
+                    try:
+                        chunk_progress[key] = max(float(value.rstrip("x")), 0)
+                    except ValueError:
+                        # ffmpeg reports N/A until the first frames are encoded
+                        return
+                    total = sum(progress[key] for progress in chunks_progress)
+                    line = f"{key}={round(total) if key == 'out_time_us' else total}"
+                elif key != "progress":
+                    return
+                self.progress.update(input_path, line)
+
+            futures = [
+                self.runner.submit(
+                    [
+                        self.settings.ffmpeg_path,
+                        "-y",
+                        "-i",
+                        os.path.join(chunk_dir, name),
+                        *self.get_codec_args(min(CHUNK_THREADS, self.get_threads())),
+                        "-an",
+                        *self.get_output_args(),
+                        "-f",
+                        "matroska",
+                        os.path.join(chunk_dir, name.replace("source-", "encoded-")),
+                        *shlex.split(self.settings.ffmpeg_output_extra_args),
+                    ],
+                    KIND_CHUNK,
+                    on_line=functools.partial(on_line, idx),
+                )
+                for idx, name in enumerate(sources)
+            ]
+            try:
+                results = [future.result() for future in futures]
+            finally:
+                # a failed chunk fails the video, the other chunks are useless
+                for future in futures:
+                    future.cancel()
+            if any(result.returncode != 0 for result in results):
+                raise ClassifyEncodingException(
+                    "".join(
+                        result.stderr.decode(errors="replace") for result in results
+                    )
+                )
+
+            concat_list = os.path.join(chunk_dir, "chunks.txt")
+            with open(concat_list, "w", encoding="utf-8") as file:
+                for name in sources:
+                    path = os.path.join(chunk_dir, name.replace("source-", "encoded-"))
+                    # quotes are closed, escaped and reopened in concat lists
+                    escaped = path.replace("'", r"'\''")
+                    file.write(f"file '{escaped}'\n")
+            self.run_chunk_step(
+                [
+                    self.settings.ffmpeg_path,
+                    "-y",
+                    "-v",
+                    "error",
+                    "-f",
+                    "concat",
+                    "-safe",
+                    "0",
+                    "-i",
+                    concat_list,
+                    "-i",
+                    os.path.abspath(input_path),
+                    "-map",
+                    "0:v:0",
+                    "-map",
+                    "1:a?",
+                    "-map_metadata",
+                    "1",
+                    "-c:v",
+                    "copy",
+                    "-acodec",
+                    "copy",
+                    *self.get_metadata_args(recorded_date),
+                    "-f",
+                    "mp4",
+                    os.path.abspath(output_path),
+                ]
+            )
+
+    def run_chunk_step(self, command: list[str]) -> None:
+        """Run a split or join of a chunked encode."""
+        _LOGGER.debug(shlex.join(command))
+        process = self.runner.run(command, KIND_CHUNK)
+        if process.returncode != 0:
+            raise ClassifyEncodingException(process.stderr.decode(errors="replace"))
+
+    @timed("verify")
+    def test(self, path: str, source_path: str | None = None) -> bool:
+        """Test if a file is a correct video, as set by the verify mode."""
         if self.settings.dry_run:
             return True
-        with subprocess.Popen(
-            args=f'{self.settings.ffmpeg_path} -v error -i "{path}" -f null -',
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            shell=True,
-        ) as check_process:
-            _, stderr = check_process.communicate()
-            if check_process.returncode != 0 or stderr:
-                _LOGGER.error("Error while checking video: %s", stderr)
-                return False
+        if self.settings.verify == "fused":
+            # decoding errors were already checked while encoding
+            return self.test_container(path, source_path)
+        if self.settings.verify == "sampled":
+            return self.test_container(path, source_path) and self.test_samples(path)
+        return self.test_decode(path)
+
+    def test_decode(self, path: str, input_args: list[str] | None = None) -> bool:
+        """Test if a video decodes without error."""
+        try:
+            check_process = self.runner.run(
+                [
+                    self.settings.ffmpeg_path,
+                    "-v",
+                    "error",
+                    *(input_args or []),
+                    "-i",
+                    path,
+                    "-f",
+                    "null",
+                    "-",
+                ],
+                KIND_ENCODE,
+            )
+        except CancelledError:
+            return False
+        if check_process.returncode != 0 or check_process.stderr:
+            _LOGGER.error("Error while checking video: %s", check_process.stderr)
+            return False
+        return True
+
+    def test_samples(self, path: str) -> bool:
+        """Test if short samples spread over a video decode without error."""
+        duration = self.probe(path).duration
+        if not duration or duration <= VERIFY_SAMPLES * VERIFY_SAMPLE_SECONDS:
+            return self.test_decode(path)
+        return all(
+            self.test_decode(
+                path,
+                input_args=[
+                    "-ss",
+                    str(round(duration * idx / VERIFY_SAMPLES, 3)),
+                    "-t",
+                    str(VERIFY_SAMPLE_SECONDS),
+                ],
+            )
+            for idx in range(VERIFY_SAMPLES)
+        )
+
+    def test_container(self, path: str, source_path: str | None = None) -> bool:
+        """Test if a video container is readable and as long as its source."""
+        video_probe = self.probe(path)
+        if not video_probe.codec or not video_probe.duration:
+            _LOGGER.error("Error while checking video: no readable video stream")
+            return False
+        if (
+            source_path is not None
+            and (source_duration := self.get_duration(source_path))
+            and abs(video_probe.duration - source_duration)
+            > max(1, source_duration * VERIFY_DURATION_TOLERANCE)
+        ):
+            _LOGGER.error(
+                "Error while checking video: duration %ss instead of %ss",
+                video_probe.duration,
+                source_duration,
+            )
+            return False
         return True
 
     def process(self, path: str) -> None:
         """Process a video."""
+        try:
+            self._process(path)
+        finally:
+            self.progress.dequeue(path)
+
+    def _process(self, path: str) -> None:
+        """Process a video, once it is out of the encode queue."""
+
+        if (planned := self.fp.planned.get(path)) is not None:
+            assert planned.target is not None and planned.date is not None
+            if os.path.exists(planned.target):
+                _LOGGER.error(
+                    "Cannot encode %s, %s already exists", path, planned.target
+                )
+                return
+            if not self.fits_time_budget(path):
+                return
+            self.reencode(path, planned.target, datetime.fromisoformat(planned.date))
+            return
+        if self.fp.is_done(path):
+            return
+        if os.path.abspath(path) in self._resumed:
+            _LOGGER.debug("Video %s finished by the interrupted run", path)
+            return
 
         # check if video has already been encoded
         if self.is_already_reencoded(path):
             _LOGGER.debug("Video already encoded")
+            self.fp.add_to_plan(ACTION_SKIP, path)
+            self.fp.record(path, decision=DECISION_SKIP)
+            return
+        if not self.fits_time_budget(path):
             return
 
         # get date taken from video
@@ -321,45 +934,115 @@ class VideoProcessor:
         dest_file_path = os.path.join(dest_dir_path, encoded_file_name)
 
         # Ensure unique filename
-        counter = 0
-        name_without_ext, ext = os.path.splitext(dest_file_path)
+        name_without_ext, ext = os.path.splitext(encoded_file_name)
         MAX_RETRIES = 99
-        while True:
-            if counter == 0:
-                candidate_path = f"{name_without_ext}{ext}"
-            else:
-                candidate_path = f"{name_without_ext}-{counter}{ext}"
-            _LOGGER.debug("Trying %s", candidate_path)
-            if not os.path.exists(candidate_path):
-                dest_file_path = candidate_path
-                break
-            if counter >= MAX_RETRIES:
-                _LOGGER.error(
-                    "Exceeded maximum attempts (%d) to generate a unique filename for %s",
-                    MAX_RETRIES,
-                    candidate_path,
+        try:
+            dest_file_path = self.fp.reserve_filepath(
+                dest_dir_path,
+                (
+                    f"{name_without_ext}{f'-{counter}' if counter else ''}{ext}"
+                    for counter in range(MAX_RETRIES + 1)
+                ),
+            )
+        except ClassifyException:
+            _LOGGER.error(
+                "Exceeded maximum attempts (%d) to generate a unique filename for %s",
+                MAX_RETRIES,
+                dest_file_path,
+            )
+            raise
+
+        if self.fp.plan is not None:
+            estimate = self.estimate(path)
+            self.fp.add_to_plan(
+                ACTION_ENCODE,
+                path,
+                dest_file_path,
+                video_date_taken,
+                self.probe(path).duration,
+                pixels=EncodeEstimator.get_pixels(self.probe(path)),
+                saved_bytes=estimate.saved_bytes if estimate is not None else None,
+            )
+            return
+        self.reencode(path, dest_file_path, video_date_taken)
+
+    def reencode(
+        self, path: str, dest_file_path: str, video_date_taken: datetime
+    ) -> None:
+        """Encode a video to its reserved destination, then keep the best file.
+
+        A failed encode or verification raises ClassifyEncodingException,
+        once its partial output is removed and its destination name released.
+        """
+        predicted_ratio = None
+        if (
+            self.settings.trial_encode
+            and not self.settings.keep_original
+            and not self.settings.dry_run
+        ):
+            predicted_ratio = self.predict_size_ratio(path)
+            if predicted_ratio is not None:
+                _LOGGER.info(
+                    "Trial encode predicts a %s%% space reduction",
+                    round((1 - predicted_ratio) * 100),
+                )
+            if predicted_ratio is not None and predicted_ratio > VIDEO_SIZE_RATIO_LIMIT:
+                _LOGGER.warning(
+                    "Skip encoding %s, space too close from original file.", path
                 )
-                raise RuntimeError(
-                    f"Could not generate a unique filename after {MAX_RETRIES} attempts for {candidate_path}"
+                with self._lock:
+                    self._predicted_skips += 1
+                self.fp.copier.move(path, dest_file_path)
+                self.fp.names.release(path)
+                _LOGGER.info(
+                    "Original file %s renamed to %s.",
+                    os.path.basename(path),
+                    os.path.basename(dest_file_path),
                 )
-            counter += 1
+                self.fp.record(dest_file_path, decision=DECISION_SKIP)
+                return
 
+        # encoded under a temporary name until verified and committed
+        temp_file_path = dest_file_path + PARTIAL_SUFFIX
+        self.write_journal(
+            STATE_STARTED, path, target=dest_file_path, temp=temp_file_path
+        )
         _LOGGER.info("Encoding video %s to %s", path, dest_file_path)
         try:
             self.encode(
                 input_path=path,
-                output_path=dest_file_path,
+                output_path=temp_file_path,
                 recorded_date=video_date_taken,
             )
-        except ClassifyEncodingException as e:
-            _LOGGER.error("Error while encoding video: %s", e)
-            return
+        except ClassifyEncodingException:
+            self.remove_partial(temp_file_path)
+            self.fp.names.release(dest_file_path)
+            raise
 
-        if not self.test(dest_file_path):
-            return
+        if not self.test(temp_file_path, source_path=path):
+            self.remove_partial(temp_file_path)
+            self.fp.names.release(dest_file_path)
+            raise ClassifyEncodingException(
+                f"Encoded video {temp_file_path} failed verification"
+            )
+        self.write_journal(
+            STATE_ENCODED, path, target=dest_file_path, temp=temp_file_path
+        )
 
-        if not self.settings.keep_original:
-            self.choose_between_original_and_reencoded(
-                video_path=path,
-                encoded_file_path=dest_file_path,
+        if predicted_ratio is not None and os.path.exists(temp_file_path):
+            actual_ratio = os.path.getsize(temp_file_path) / os.path.getsize(path)
+            _LOGGER.debug(
+                "Trial encode predicted a size ratio of %.2f, actual is %.2f",
+                predicted_ratio,
+                actual_ratio,
             )
+            with self._lock:
+                self._predictions.append((predicted_ratio, actual_ratio))
+
+        self.commit(path, temp_file_path, dest_file_path)
+
+    def remove_partial(self, temp_file_path: str) -> None:
+        """Remove the output of a failed encode."""
+        if os.path.exists(temp_file_path):
+            _LOGGER.debug("Remove partial encode %s", temp_file_path)
+            os.remove(temp_file_path)
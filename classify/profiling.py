@@ -0,0 +1,174 @@
+"""Per-stage timing of a Classify run."""
+
+import functools
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Generator, Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any
+
+_LOGGER = logging.getLogger("classify")
+
+
+@dataclass
+class StageStats:
+    """Count and exclusive wall and CPU time of a stage."""
+
+    count: int = 0
+    wall: float = 0.0
+    cpu: float = 0.0
+
+
+@dataclass
+class _Frame:
+    """Running stage of a thread."""
+
+    name: str
+    wall: float
+    cpu: float
+    child_wall: float = 0.0
+    child_cpu: float = 0.0
+
+
+class StageTimer:
+    """Collect counts and wall/CPU time of processing stages from all threads.
+
+    Stages may nest, each one is only charged the time not spent in its inner
+    stages, so the times of all stages add up. CPU time is the one of the
+    calling thread: ffmpeg and ffprobe are reported apart as child CPU time.
+    """
+
+    def __init__(self) -> None:
+        """Init."""
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self, trace: bool = False) -> None:
+        """Forget collected timings, keep a per-file trace if asked to."""
+        with self._lock:
+            self._stats: dict[str, StageStats] = {}
+            self._trace: list[tuple[float, str, str, str, float, float]] | None = (
+                [] if trace else None
+            )
+            self._started = time.perf_counter()
+            self._children_cpu = _children_cpu()
+
+    @contextmanager
+    def stage(self, name: str, path: str | None = None) -> Generator[None]:
+        """Time a stage."""
+        stack: list[_Frame] = self._local.__dict__.setdefault("stack", [])
+        frame = _Frame(name, time.perf_counter(), time.thread_time())
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            stack.pop()
+            wall = time.perf_counter() - frame.wall
+            cpu = time.thread_time() - frame.cpu
+            if stack:
+                stack[-1].child_wall += wall
+                stack[-1].child_cpu += cpu
+            self._add(frame, wall, cpu, path)
+
+    def _add(self, frame: _Frame, wall: float, cpu: float, path: str | None) -> None:
+        """Add the exclusive time of a finished stage."""
+        with self._lock:
+            stats = self._stats.setdefault(frame.name, StageStats())
+            stats.count += 1
+            stats.wall += wall - frame.child_wall
+            stats.cpu += cpu - frame.child_cpu
+            if self._trace is not None and path is not None:
+                self._trace.append(
+                    (
+                        frame.wall - self._started,
+                        threading.current_thread().name,
+                        frame.name,
+                        path,
+                        wall,
+                        cpu,
+                    )
+                )
+
+    def timed(self, name: str) -> Callable[[Callable], Callable]:
+        """Decorate a method as a stage, traced with its path argument."""
+
+        def decorator(method: Callable) -> Callable:
+            @functools.wraps(method)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                path = next(
+                    (
+                        arg
+                        for arg in (*args[1:2], *kwargs.values())
+                        if isinstance(arg, str)
+                    ),
+                    None,
+                )
+                with self.stage(name, path):
+                    return method(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def iterate(self, name: str, iterable: Iterable[str]) -> Iterator[str]:
+        """Time each step of an iterable, e.g. a directory scan."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def summary(self) -> list[str]:
+        """Return the summary table of the stages, slowest first."""
+        with self._lock:
+            stats = sorted(
+                self._stats.items(), key=lambda item: item[1].wall, reverse=True
+            )
+            elapsed = time.perf_counter() - self._started
+        lines = [f"{'Stage':<12}{'Count':>8}{'Wall (s)':>12}{'CPU (s)':>12}"]
+        lines.extend(
+            f"{name:<12}{stage.count:>8}{stage.wall:>12.3f}{stage.cpu:>12.3f}"
+            for name, stage in stats
+        )
+        lines.append(f"{'Elapsed':<12}{'':>8}{elapsed:>12.3f}")
+        lines.append(
+            f"{'Tools CPU':<12}{'':>8}{'':>12}"
+            f"{_children_cpu() - self._children_cpu:>12.3f}"
+        )
+        return lines
+
+    def log_summary(self) -> None:
+        """Log the summary table."""
+        for line in self.summary():
+            _LOGGER.info(line)
+
+    def write_trace(self, path: str) -> None:
+        """Write the per-file trace as CSV."""
+        import csv
+
+        with self._lock:
+            trace = list(self._trace or [])
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["start", "thread", "stage", "path", "wall", "cpu"])
+            writer.writerows(
+                (f"{start:.6f}", thread, stage, path, f"{wall:.6f}", f"{cpu:.6f}")
+                for start, thread, stage, path, wall, cpu in sorted(trace)
+            )
+
+
+def _children_cpu() -> float:
+    """Return the CPU time of the waited child processes."""
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+TIMER = StageTimer()
+timed = TIMER.timed
@@ -0,0 +1,182 @@
+"""Subprocess runner for ffprobe and ffmpeg."""
+
+import asyncio
+import logging
+import threading
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+from .const import KIND_CHUNK, KIND_ENCODE, KIND_PROBE
+
+_LOGGER = logging.getLogger("classify")
+
+# stderr lines kept from a streamed command
+STDERR_TAIL_LINES = 200
+
+
+@dataclass(frozen=True)
+class ProcessResult:
+    """Result of an external tool run."""
+
+    returncode: int
+    stdout: bytes
+    stderr: bytes
+
+
+class ProcessRunner:
+    """Run external tools without a shell on a dedicated asyncio loop.
+
+    Probes, encodes and chunks of chunked encodes have their own concurrency
+    limit, so probing the next videos overlaps with running encodes. Callers
+    from any thread get a blocking `run` or a future from `submit`.
+    """
+
+    def __init__(
+        self, probe_limit: int, encode_limit: int, chunk_limit: int = 1
+    ) -> None:
+        """Init."""
+        self._limits = {
+            KIND_PROBE: probe_limit,
+            KIND_ENCODE: encode_limit,
+            KIND_CHUNK: chunk_limit,
+        }
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._tasks: set[asyncio.Task[ProcessResult]] = set()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """Get the runner loop, starting its thread on first use."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._semaphores = {
+                    kind: asyncio.Semaphore(limit)
+                    for kind, limit in self._limits.items()
+                }
+                threading.Thread(
+                    target=self._loop.run_forever, name="runner", daemon=True
+                ).start()
+            return self._loop
+
+    async def _run(
+        self,
+        args: list[str],
+        kind: str,
+        on_line: Callable[[str], None] | None = None,
+    ) -> ProcessResult:
+        """Run a command once a slot of its kind is free.
+
+        With `on_line`, stdout is streamed line by line to the callback and
+        only the last lines of stderr are kept, so memory use does not grow
+        with the command run time.
+        """
+        async with self._semaphores[kind]:
+            _LOGGER.debug("Run %s", " ".join(args))
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                if on_line is None:
+                    stdout, stderr = await process.communicate()
+                else:
+                    stdout = b""
+                    _, stderr = await asyncio.gather(
+                        self._read_lines(process.stdout, on_line),
+                        self._read_tail(process.stderr),
+                    )
+                    await process.wait()
+            except asyncio.CancelledError:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                raise
+            return ProcessResult(process.returncode or 0, stdout, stderr)
+
+    @staticmethod
+    async def _read_lines(
+        stream: asyncio.StreamReader | None, on_line: Callable[[str], None]
+    ) -> None:
+        """Pass each line of a stream to a callback."""
+        if stream is None:
+            return
+        async for line in stream:
+            on_line(line.decode(errors="replace").rstrip())
+
+    @staticmethod
+    async def _read_tail(stream: asyncio.StreamReader | None) -> bytes:
+        """Read a stream, keeping its last lines only."""
+        if stream is None:
+            return b""
+        tail: deque[bytes] = deque(maxlen=STDERR_TAIL_LINES)
+        async for line in stream:
+            tail.append(line)
+        return b"".join(tail)
+
+    async def _track(
+        self,
+        args: list[str],
+        kind: str,
+        on_line: Callable[[str], None] | None = None,
+    ) -> ProcessResult:
+        """Run a command as a task that `cancel_all` can cancel."""
+        task = asyncio.ensure_future(self._run(args, kind, on_line))
+        self._tasks.add(task)
+        try:
+            return await task
+        finally:
+            self._tasks.discard(task)
+
+    def submit(
+        self,
+        args: list[str],
+        kind: str = KIND_PROBE,
+        on_line: Callable[[str], None] | None = None,
+    ) -> Future[ProcessResult]:
+        """Start a command and return a future of its result."""
+        return asyncio.run_coroutine_threadsafe(
+            self._track(args, kind, on_line), self._get_loop()
+        )
+
+    def run(
+        self,
+        args: list[str],
+        kind: str = KIND_PROBE,
+        on_line: Callable[[str], None] | None = None,
+    ) -> ProcessResult:
+        """Run a command and wait for its result."""
+        return self.submit(args, kind, on_line).result()
+
+    def cancel_all(self) -> None:
+        """Cancel queued commands and kill running ones."""
+        if self._loop is None:
+            return
+
+        def cancel() -> None:
+            for task in list(self._tasks):
+                task.cancel()
+
+        self._loop.call_soon_threadsafe(cancel)
+
+    @staticmethod
+    async def _shutdown() -> None:
+        """Cancel all tasks and wait for them, so no caller waits forever."""
+        tasks = [
+            task for task in asyncio.all_tasks() if task is not asyncio.current_task()
+        ]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self) -> None:
+        """Kill running commands and stop the runner loop."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
@@ -0,0 +1,328 @@
+"""Job schedulers for Classify."""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import queue
+import sys
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+from .const import DEFAULT_VIDEO_ORDER, WORKER_POLL_SECONDS
+from .logger import print_progress_bar
+from .processors.files import FileProcessor
+from .processors.image import ImageProcessor
+from .processors.video import VideoProcessor
+from .settings import ClassifySettings
+
+if TYPE_CHECKING:
+    from .workqueue import WorkQueue
+
+_LOGGER = logging.getLogger("classify")
+
+
+class Scheduler:
+    """Run jobs on a bounded pool of worker threads."""
+
+    name: str = "files"
+    item: str = "file"
+    workers: int = 1
+    # jobs waiting for a worker, per worker
+    backlog: int = 2
+    show_progress: bool = True
+    _executor: ThreadPoolExecutor | None = None
+    _cancelled: bool = False
+
+    def process(self, path: str) -> None:
+        """Process a file."""
+        raise NotImplementedError
+
+    def prepare(self, path: str) -> None:
+        """Prepare a file while it waits for a worker."""
+
+    def interrupt(self) -> None:
+        """Stop running jobs after a keyboard interrupt."""
+
+    def cancel(self) -> None:
+        """Drop waiting jobs and stop running ones, from any thread."""
+        self._cancelled = True
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self.interrupt()
+
+    def _process(self, path: str) -> None:
+        """Process a file, logging errors instead of raising them."""
+        try:
+            self.process(path)
+        except Exception as exc:  # pylint: disable=broad-except
+            _LOGGER.error("Error processing %s %s: %s", self.item, path, exc)
+
+    def print_progress(self, done: int, total: int, scanning: bool) -> None:
+        """Print the progress bar, total keeps growing while scanning."""
+        if not self.show_progress or (scanning and done == total):
+            # a full bar ends the line, wait for the end of the scan
+            return
+        print_progress_bar(
+            done,
+            total,
+            prefix="Processed ",
+            suffix=f"of total {self.name} ({total}{'+' if scanning else ''})",
+            length=50,
+        )
+
+    def run(self, paths: Iterable[str]) -> int:
+        """Process files with up to `workers` jobs at once, return their count.
+
+        Files are submitted as the iterable yields them, with a bounded number
+        of jobs waiting for a worker.
+        """
+        executor = self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix=self.name
+        )
+        pending: set[Future[None]] = set()
+        done = total = 0
+        try:
+            for path in paths:
+                if self._cancelled:
+                    break
+                self.prepare(path)
+                try:
+                    pending.add(executor.submit(self._process, path))
+                except RuntimeError:
+                    # cancelled from another thread
+                    break
+                total += 1
+                if len(pending) >= self.workers * self.backlog:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    done += len(finished)
+                    self.print_progress(done, total, scanning=True)
+            if total:
+                self.print_progress(done, total, scanning=False)
+            for _ in as_completed(pending):
+                done += 1
+                self.print_progress(done, total, scanning=False)
+        except KeyboardInterrupt:
+            _LOGGER.warning("Interrupted, stopping running %s jobs", self.name)
+            self.cancel()
+            sys.exit(1)
+        executor.shutdown()
+        return total
+
+
+class PictureScheduler(Scheduler):
+    """Read and rename pictures concurrently."""
+
+    name = "pictures"
+    item = "picture"
+
+    def __init__(
+        self, settings: ClassifySettings, image_processor: ImageProcessor
+    ) -> None:
+        """Initialize the class"""
+        self.settings = settings
+        self.ip = image_processor
+        self.workers = settings.picture_workers
+
+    def process(self, path: str) -> None:
+        """Process a picture."""
+        _LOGGER.debug("Process picture %s", path)
+        self.ip.process(path)
+
+
+class VideoScheduler(Scheduler):
+    """Run video encodes concurrently."""
+
+    name = "videos"
+    item = "video"
+
+    def __init__(
+        self, settings: ClassifySettings, video_processor: VideoProcessor
+    ) -> None:
+        """Initialize the class"""
+        self.settings = settings
+        self.vp = video_processor
+        self.workers = settings.jobs
+        self.video_order = settings.video_order
+
+    def order(self, paths: Iterable[str]) -> Iterable[str]:
+        """Order videos by their estimated encode, once all are found.
+
+        Videos without an estimate keep their scan order, after the others.
+        """
+        if self.video_order == DEFAULT_VIDEO_ORDER:
+            return paths
+        paths = list(paths)
+        if not paths:
+            return paths
+        for path in paths:
+            # probes run concurrently
+            self.vp.prefetch(path)
+        estimates = {path: self.vp.estimate(path) for path in paths}
+
+        def key(path: str) -> float:
+            if (estimate := estimates[path]) is None:
+                return math.inf
+            if self.video_order == "savings":
+                return -estimate.savings_rate
+            return estimate.seconds
+
+        ordered = sorted(paths, key=key)
+        known = [estimate for estimate in estimates.values() if estimate]
+        _LOGGER.info(
+            "Ordered %d videos by %s, estimated encodes of %s saving %s GB",
+            len(paths),
+            self.video_order,
+            timedelta(seconds=round(sum(estimate.seconds for estimate in known))),
+            round(sum(estimate.saved_bytes for estimate in known) / 1e9, 3),
+        )
+        return ordered
+
+    def process(self, path: str) -> None:
+        """Process a video."""
+        _LOGGER.debug(
+            "Process video %s (%s GB)",
+            path,
+            round(os.path.getsize(path) / 1e9, 3),
+        )
+        self.vp.process(path)
+
+    def prepare(self, path: str) -> None:
+        """Probe a video while previous videos are encoded."""
+        self.vp.prefetch(path)
+
+    def interrupt(self) -> None:
+        """Kill running encodes."""
+        self.vp.kill_running()
+
+
+class WorkerScheduler(VideoScheduler):
+    """Encode videos leased from a queue shared with other workers."""
+
+    # a leased video waiting here could be encoded by an idle worker
+    backlog = 1
+
+    def __init__(
+        self,
+        settings: ClassifySettings,
+        video_processor: VideoProcessor,
+        work_queue: WorkQueue,
+    ) -> None:
+        """Initialize the class"""
+        super().__init__(settings, video_processor)
+        self.queue = work_queue
+
+    def process(self, path: str) -> None:
+        """Process a video and mark its job done or failed."""
+        try:
+            super().process(path)
+        except Exception as exc:
+            self.queue.finish(path, error=str(exc) or type(exc).__name__)
+            raise
+        if path in self.vp.over_budget:
+            # another worker or a later run may have the time
+            self.queue.release(path)
+        else:
+            self.queue.finish(path)
+
+    def leased(self) -> Iterator[str]:
+        """Yield leased videos until no job is left or may come back, or time is up."""
+        while not self.vp.over_budget:
+            if (job := self.queue.lease()) is not None:
+                path, temp = job
+                if temp and os.path.exists(temp):
+                    _LOGGER.info("Remove partial encode %s of a stopped worker", temp)
+                    os.remove(temp)
+                yield path
+            elif self.queue.others_running():
+                time.sleep(WORKER_POLL_SECONDS)
+            else:
+                return
+
+    def work(self) -> int:
+        """Process leased videos, renewing the leases while they run."""
+        stopped = threading.Event()
+
+        def heartbeat() -> None:
+            while not stopped.wait(self.queue.lease_seconds / 3):
+                self.queue.renew()
+
+        threading.Thread(target=heartbeat, name="heartbeat", daemon=True).start()
+        try:
+            return self.run(self.leased())
+        finally:
+            stopped.set()
+
+
+class Pipeline:
+    """Run the picture and video schedulers at the same time.
+
+    Pictures are mostly disk reads and renames while videos keep the CPUs
+    busy, so each stage runs on its own pool as soon as the scan finds its
+    files, instead of videos waiting for the last picture.
+    """
+
+    def __init__(
+        self,
+        settings: ClassifySettings,
+        file_processor: FileProcessor,
+        image_processor: ImageProcessor,
+        video_processor: VideoProcessor,
+        max_queued_videos: int = 0,
+    ) -> None:
+        """Initialize the class"""
+        self.fp = file_processor
+        # videos found but not submitted yet, 0 for no limit
+        self.max_queued_videos = max_queued_videos
+        self.pictures = PictureScheduler(settings, image_processor)
+        self.videos = VideoScheduler(settings, video_processor)
+        # a single progress bar, the one of the videos
+        self.pictures.show_progress = False
+
+    def run(self, paths: Iterable[str]) -> tuple[int, int]:
+        """Process pictures and videos, return their counts."""
+        videos: queue.Queue[str | None] = queue.Queue(self.max_queued_videos)
+        videos_count: list[int] = []
+        videos_thread = threading.Thread(
+            target=lambda: videos_count.append(
+                self.videos.run(self.videos.order(iter(videos.get, None)))
+            ),
+            name="videos",
+        )
+
+        def split() -> Iterator[str]:
+            for path in paths:
+                if self.fp.is_picture(path):
+                    yield path
+                else:
+                    # stop before any video if ffmpeg cannot encode them
+                    self.videos.vp.tools.check()
+                    videos.put(path)
+
+        videos_thread.start()
+        try:
+            try:
+                pictures_count = self.pictures.run(split())
+            finally:
+                videos.put(None)
+            _LOGGER.info("Processed %d pictures", pictures_count)
+            videos_thread.join()
+        except KeyboardInterrupt:
+            _LOGGER.warning("Interrupted, stopping running videos jobs")
+            self.videos.cancel()
+            sys.exit(1)
+        except SystemExit:
+            self.videos.cancel()
+            raise
+        return pictures_count, videos_count[0] if videos_count else 0
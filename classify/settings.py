@@ -2,19 +2,30 @@
 
 import argparse
 import datetime
-import importlib.metadata
 import logging
 
-from pytz import UnknownTimeZoneError
-from pytz import timezone as pytz_timezone
-
 from .const import (
+    COPY_MODES,
+    DEFAULT_COPY_MODE,
+    DEFAULT_DUPLICATES_MODE,
     DEFAULT_FFMPEG_INPUT_EXTRA_ARGS,
     DEFAULT_FFMPEG_OUTPUT_EXTRA_ARGS,
     DEFAULT_FFMPEG_PATH,
     DEFAULT_FFPROBE_PATH,
     DEFAULT_NAME_FORMAT,
+    DEFAULT_ORGANIZE_DISTANCE_KM,
+    DEFAULT_ORGANIZE_GAP_HOURS,
+    DEFAULT_PICTURE_WORKERS,
+    DEFAULT_VERIFY_MODE,
     DEFAULT_VIDEO_BITRATE_MBPS_LIMIT,
+    DEFAULT_VIDEO_JOBS,
+    DEFAULT_VIDEO_ORDER,
+    DEFAULT_WATCH_SETTLE_SECONDS,
+    DEFAULT_WORKER_LEASE_SECONDS,
+    DHASH_SIZE,
+    DUPLICATES_MODES,
+    VERIFY_MODES,
+    VIDEO_ORDERS,
 )
 from .exception import ClassifyException
 
@@ -31,6 +42,27 @@ class ClassifySettings:
     verbose: bool
     name_format: str
     video_bitrate_limit: int
+    jobs: int = DEFAULT_VIDEO_JOBS
+    video_order: str = DEFAULT_VIDEO_ORDER
+    chunk_seconds: float | None = None
+    time_budget: float | None = None
+    trial_encode: bool = False
+    verify: str = DEFAULT_VERIFY_MODE
+    picture_workers: int = DEFAULT_PICTURE_WORKERS
+    copy_mode: str = DEFAULT_COPY_MODE
+    duplicates: str = DEFAULT_DUPLICATES_MODE
+    similar: int | None = None
+    similar_report: str | None = None
+    resume: bool = False
+    plan: str | None = None
+    worker: str | None = None
+    worker_lease: float = DEFAULT_WORKER_LEASE_SECONDS
+    apply: str | None = None
+    watch: bool = False
+    watch_settle: float = DEFAULT_WATCH_SETTLE_SECONDS
+    organize: bool = False
+    organize_gap: float = DEFAULT_ORGANIZE_GAP_HOURS
+    organize_distance: float = DEFAULT_ORGANIZE_DISTANCE_KM
     ffmpeg_lib: str = "libx265"
     ffmpeg_crf: int = 28
     ffmpeg_input_extra_args: str
@@ -39,6 +71,9 @@ class ClassifySettings:
     ffprobe_path: str
     user_timezone: datetime.tzinfo
     exclude: list[str] = []
+    index_path: str | None = None
+    index_command: str | None = None
+    profile: str | None = None
     comment_message: str = "Processed by memories-classify"
 
     def __init__(
@@ -55,12 +90,78 @@ class ClassifySettings:
             self.verbose = args.verbose
             self.name_format = args.name_format
             self.video_bitrate_limit = args.video_bitrate_limit
+            self.jobs = args.jobs
+            if self.jobs < 1:
+                raise ClassifyException(f"Invalid number of jobs: {self.jobs}")
+            self.video_order = args.video_order
+            self.chunk_seconds = args.chunk_seconds
+            if self.chunk_seconds is not None and self.chunk_seconds <= 0:
+                raise ClassifyException(f"Invalid chunk duration: {self.chunk_seconds}")
+            self.time_budget = args.time_budget
+            if self.time_budget is not None and self.time_budget <= 0:
+                raise ClassifyException(f"Invalid time budget: {self.time_budget}")
+            self.trial_encode = args.trial_encode
+            self.verify = args.verify
+            self.picture_workers = args.picture_workers
+            if self.picture_workers < 1:
+                raise ClassifyException(
+                    f"Invalid number of picture workers: {self.picture_workers}"
+                )
+            self.copy_mode = args.copy_mode
+            self.duplicates = args.duplicates
+            self.similar = args.similar
+            if self.similar is not None and not 0 <= self.similar <= DHASH_SIZE**2:
+                raise ClassifyException(
+                    f"Invalid similar picture distance: {self.similar}"
+                )
+            self.similar_report = args.similar_report
+            self.resume = args.resume
+            self.plan = args.plan
+            self.apply = args.apply
+            if self.plan and self.apply:
+                raise ClassifyException("--plan and --apply cannot be used together")
+            if self.plan:
+                # planning only reads files, actions run when the plan is applied
+                self.dry_run = True
+            self.worker = args.worker
+            self.worker_lease = args.worker_lease
+            if self.worker and (self.plan or self.apply):
+                raise ClassifyException("--worker cannot be used with a plan")
+            if self.worker_lease <= 0:
+                raise ClassifyException(
+                    f"Invalid worker lease duration: {self.worker_lease}"
+                )
+            self.watch = args.watch
+            self.watch_settle = args.watch_settle
+            if self.watch and (self.plan or self.apply or self.worker):
+                raise ClassifyException(
+                    "--watch cannot be used with a plan or as a worker"
+                )
+            if self.watch_settle < 0:
+                raise ClassifyException(
+                    f"Invalid watch settle duration: {self.watch_settle}"
+                )
+            self.organize = args.organize
+            self.organize_gap = args.organize_gap
+            self.organize_distance = args.organize_distance
+            if self.organize and self.keep_original and self.output == self.directory:
+                raise ClassifyException(
+                    "--organize with --keep-original requires an --output directory"
+                )
             self.ffmpeg_input_extra_args = args.ffmpeg_input_extra_args
             self.ffmpeg_output_extra_args = args.ffmpeg_output_extra_args
             self.ffmpeg_path = args.ffmpeg_path
             self.ffprobe_path = args.ffprobe_path
+            self.index_path = args.index
+            self.index_command = args.index_command
+            if self.index_command and not self.index_path:
+                raise ClassifyException("--index-command requires --index")
+            self.profile = args.profile
 
             if args.timezone:
+                from pytz import UnknownTimeZoneError
+                from pytz import timezone as pytz_timezone
+
                 try:
                     self.user_timezone = pytz_timezone(args.timezone)
                     _LOGGER.info("User timezone set to: %s", args.timezone)
@@ -81,13 +182,40 @@ class ClassifySettings:
                     _LOGGER.info("Timezone found: %s", str(self.user_timezone))
                 except ClassifyException as exc:
                     # Fallback to UTC if system timezone cannot be determined
-                    self.user_timezone = pytz_timezone("UTC")
+                    self.user_timezone = datetime.UTC
                     _LOGGER.warning(
                         "No valid timezone found, falling back to UTC because %s",
                         str(exc),
                     )
 
 
+class VersionAction(argparse.Action):
+    """Print the version, looked up in the package metadata only when asked."""
+
+    def __init__(self, option_strings: list[str], dest: str, **kwargs) -> None:
+        """Init."""
+        super().__init__(
+            option_strings,
+            dest,
+            nargs=0,
+            default=argparse.SUPPRESS,
+            help="show program's version number and exit",
+        )
+
+    def __call__(
+        self,
+        parser: argparse.ArgumentParser,
+        namespace: argparse.Namespace,
+        values: object,
+        option_string: str | None = None,
+    ) -> None:
+        """Print the version and exit."""
+        import importlib.metadata
+
+        version = importlib.metadata.version("memories-classify")
+        parser.exit(message=f"{parser.prog} {version}\n")
+
+
 def parse_args(arg_list: list[str] | None) -> argparse.Namespace:
     """Return the parser for the classify script"""
     parser = argparse.ArgumentParser(
@@ -135,6 +263,181 @@ def parse_args(arg_list: list[str] | None) -> argparse.Namespace:
         help="Video bitrate limit in Mbps",
         default=DEFAULT_VIDEO_BITRATE_MBPS_LIMIT,
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="Number of videos to encode at the same time, sharing CPU cores",
+        default=DEFAULT_VIDEO_JOBS,
+    )
+    parser.add_argument(
+        "--chunk-seconds",
+        type=float,
+        metavar="SECONDS",
+        help=(
+            "Split videos longer than twice this duration at keyframes into "
+            "chunks of about this duration, encoded in parallel"
+        ),
+        default=None,
+    )
+    parser.add_argument(
+        "--video-order",
+        choices=VIDEO_ORDERS,
+        help=(
+            "Order of the video encodes: as found (default), most space saved "
+            "per encode second first (savings), or shortest encode first"
+        ),
+        default=DEFAULT_VIDEO_ORDER,
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        metavar="MINUTES",
+        help=(
+            "Duration of the run, videos whose estimated encode would end "
+            "after it are left for a later run"
+        ),
+        default=None,
+    )
+    parser.add_argument(
+        "--trial-encode",
+        action="store_true",
+        help=(
+            "Encode a few short samples first and skip videos predicted not to "
+            "shrink enough (only when originals are not kept)"
+        ),
+    )
+    parser.add_argument(
+        "--verify",
+        choices=VERIFY_MODES,
+        help=(
+            "How encoded videos are checked: full decode (default), errors "
+            "detected while encoding plus a container check (fused), or "
+            "decode of a few samples (sampled)"
+        ),
+        default=DEFAULT_VERIFY_MODE,
+    )
+    parser.add_argument(
+        "--picture-workers",
+        type=int,
+        help="Number of pictures to read and rename at the same time",
+        default=DEFAULT_PICTURE_WORKERS,
+    )
+    parser.add_argument(
+        "--copy-mode",
+        choices=COPY_MODES,
+        help=(
+            "How files are copied with --keep-original or moved to another "
+            "filesystem: cheapest method available (auto, default), reflink "
+            "clone, hard link, or plain copy"
+        ),
+        default=DEFAULT_COPY_MODE,
+    )
+    parser.add_argument(
+        "--duplicates",
+        choices=DUPLICATES_MODES,
+        help=(
+            "What to do with files of the same content, the first one found is "
+            "kept: process them all (ignore, default), list them (report), "
+            "leave copies untouched (skip) or delete copies (remove)"
+        ),
+        default=DEFAULT_DUPLICATES_MODE,
+    )
+    parser.add_argument(
+        "--similar",
+        type=int,
+        metavar="DISTANCE",
+        help=(
+            "Report pictures whose perceptual hashes differ by at most this "
+            f"number of bits out of {DHASH_SIZE**2} (e.g. 6 for burst shots)"
+        ),
+        default=None,
+    )
+    parser.add_argument(
+        "--similar-report",
+        type=str,
+        help="JSON file where to write the groups of similar pictures",
+        default=None,
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=(
+            "Continue an interrupted run from its journal, keeping the videos "
+            "it already encoded"
+        ),
+    )
+    parser.add_argument(
+        "--plan",
+        type=str,
+        metavar="FILE",
+        help=(
+            "Read dates and metadata without changing any file, and write the "
+            "resulting actions to a plan file"
+        ),
+        default=None,
+    )
+    parser.add_argument(
+        "--apply",
+        type=str,
+        metavar="FILE",
+        help=(
+            "Execute the actions of a plan file, files changed since the plan "
+            "was made are left untouched"
+        ),
+        default=None,
+    )
+    parser.add_argument(
+        "--worker",
+        type=str,
+        metavar="QUEUE",
+        help=(
+            "Encode videos taken from a queue file shared by several "
+            "processes or hosts, pictures are left untouched"
+        ),
+        default=None,
+    )
+    parser.add_argument(
+        "--worker-lease",
+        type=float,
+        metavar="SECONDS",
+        help="Time after which the job of a worker that stopped is taken again",
+        default=DEFAULT_WORKER_LEASE_SECONDS,
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help=(
+            "Keep running after processing the directory, and process new "
+            "files as they arrive (Linux only)"
+        ),
+    )
+    parser.add_argument(
+        "--watch-settle",
+        type=float,
+        metavar="SECONDS",
+        help="Time a new file must stay unchanged before it is processed",
+        default=DEFAULT_WATCH_SETTLE_SECONDS,
+    )
+    parser.add_argument(
+        "--organize",
+        action="store_true",
+        help="Move processed files of the output directory into event folders",
+    )
+    parser.add_argument(
+        "--organize-gap",
+        type=float,
+        metavar="HOURS",
+        help="Time without pictures or videos that starts a new event",
+        default=DEFAULT_ORGANIZE_GAP_HOURS,
+    )
+    parser.add_argument(
+        "--organize-distance",
+        type=float,
+        metavar="KM",
+        help="Distance from the previous GPS position that starts a new event",
+        default=DEFAULT_ORGANIZE_DISTANCE_KM,
+    )
     parser.add_argument(
         "--ffmpeg-path",
         type=str,
@@ -169,17 +472,34 @@ def parse_args(arg_list: list[str] | None) -> argparse.Namespace:
         help="Comment to add to the metadata",
         default="Processed by memories-classify",
     )
+    parser.add_argument(
+        "--index",
+        type=str,
+        help="State index file, files unchanged since a previous run are skipped",
+        default=None,
+    )
+    parser.add_argument(
+        "--index-command",
+        choices=["inspect", "rebuild", "prune"],
+        help="Show the state index, clear it before the run or drop stale entries",
+        default=None,
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        help=(
+            "Directory where to write cProfile stats and a per-file timing "
+            "trace of the run"
+        ),
+        default=None,
+    )
     parser.add_argument(
         "--dry-run",
         help="Do not perform any action, only show what would be done",
         action="store_true",
     )
     parser.add_argument("-v", "--verbose", action="store_true")
-    parser.add_argument(
-        "--version",
-        action="version",
-        version="%(prog)s " + importlib.metadata.version("memories-classify"),
-    )
+    parser.add_argument("--version", action=VersionAction)
 
     args = parser.parse_args(arg_list)
 
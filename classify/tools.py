@@ -0,0 +1,127 @@
+"""Checks of the ffmpeg and ffprobe tools, cached between runs."""
+
+import json
+import logging
+import os
+import shutil
+import threading
+from dataclasses import asdict, dataclass
+
+from .const import TOOLS_CACHE_FILE_NAME, TOOLS_CACHE_VERSION
+from .exception import ClassifyException
+from .settings import ClassifySettings
+
+_LOGGER = logging.getLogger("classify")
+
+
+@dataclass(frozen=True)
+class ToolsCapabilities:
+    """Versions of ffmpeg and ffprobe, and the encoders of ffmpeg."""
+
+    ffmpeg_version: str
+    ffprobe_version: str
+    encoders: list[str]
+
+
+def get_cache_path() -> str:
+    """Get the path of the cache file, in the user cache directory."""
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_dir, "memories-classify", TOOLS_CACHE_FILE_NAME)
+
+
+def find_tool(path: str, option: str) -> str:
+    """Get the absolute path of a tool, from its path or name."""
+    if (found := shutil.which(path)) is None:
+        raise ClassifyException(
+            f"{path} not found (install ffmpeg or set path with {option})"
+        )
+    return os.path.realpath(found)
+
+
+def run_tool(args: list[str]) -> str:
+    """Run a tool and return its output."""
+    import subprocess
+
+    try:
+        return subprocess.run(
+            args, capture_output=True, check=True, text=True, errors="replace"
+        ).stdout
+    except (OSError, subprocess.CalledProcessError) as exc:
+        raise ClassifyException(f"Cannot run {args[0]}: {exc}") from exc
+
+
+def parse_encoders(output: str) -> list[str]:
+    """Get the encoder names of the `ffmpeg -encoders` output."""
+    encoders = []
+    listing = False
+    for line in output.splitlines():
+        if line.strip().startswith("------"):
+            # the legend of the flags ends here
+            listing = True
+        elif listing and len(fields := line.split()) >= 2:
+            encoders.append(fields[1])
+    return encoders
+
+
+class ToolsChecker:
+    """Check the tools once per run, and once per binary across runs.
+
+    Capabilities are cached in the user cache directory under the path and
+    modification time of each binary, so an upgraded ffmpeg is probed again.
+    """
+
+    def __init__(self, settings: ClassifySettings) -> None:
+        """Init."""
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._capabilities: ToolsCapabilities | None = None
+
+    def check(self) -> ToolsCapabilities:
+        """Check ffmpeg and ffprobe run and ffmpeg has the encoder in use."""
+        with self._lock:
+            if self._capabilities is None:
+                self._capabilities = self._load()
+                if self.settings.ffmpeg_lib not in self._capabilities.encoders:
+                    raise ClassifyException(
+                        f"ffmpeg has no {self.settings.ffmpeg_lib} encoder "
+                        "(install an ffmpeg built with it or set --ffmpeg-path)"
+                    )
+            return self._capabilities
+
+    def _load(self) -> ToolsCapabilities:
+        """Get the capabilities from the cache, or by running the tools."""
+        ffmpeg = find_tool(self.settings.ffmpeg_path, "--ffmpeg-path")
+        ffprobe = find_tool(self.settings.ffprobe_path, "--ffprobe-path")
+        key = "|".join(
+            f"{path}:{os.stat(path).st_mtime_ns}" for path in (ffmpeg, ffprobe)
+        )
+        cache_path = get_cache_path()
+        try:
+            with open(cache_path, encoding="utf-8") as file:
+                cache = json.load(file)
+            if cache.get("version") != TOOLS_CACHE_VERSION:
+                cache = {}
+        except (OSError, ValueError):
+            cache = {}
+        tools = cache.setdefault("tools", {})
+        if (cached := tools.get(key)) is not None:
+            _LOGGER.debug("Tools capabilities from cache: %s", cached)
+            return ToolsCapabilities(**cached)
+
+        capabilities = ToolsCapabilities(
+            ffmpeg_version=run_tool([ffmpeg, "-version"]).partition("\n")[0],
+            ffprobe_version=run_tool([ffprobe, "-version"]).partition("\n")[0],
+            encoders=parse_encoders(run_tool([ffmpeg, "-hide_banner", "-encoders"])),
+        )
+        _LOGGER.debug("Tools capabilities: %s", capabilities)
+        tools[key] = asdict(capabilities)
+        cache["version"] = TOOLS_CACHE_VERSION
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            temp_path = f"{cache_path}.{os.getpid()}"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(cache, file)
+            os.replace(temp_path, cache_path)
+        except OSError as exc:
+            _LOGGER.debug("Cannot write tools cache %s: %s", cache_path, exc)
+        return capabilities
@@ -0,0 +1,184 @@
+"""Watch a directory with inotify for new pictures and videos."""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+from collections.abc import Iterator
+
+from .const import PICTURE_EXTENSIONS, VIDEO_EXTENSIONS
+from .exception import ClassifyException
+from .processors.files import FileProcessor
+from .settings import ClassifySettings
+
+_LOGGER = logging.getLogger("classify")
+
+# from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (
+    IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+EVENT_HEADER = struct.Struct("iIII")
+EVENTS_BUFFER_SIZE = 64 * 1024
+
+
+class Watcher:
+    """Yield new pictures and videos once they stopped changing.
+
+    Every directory of the tree gets an inotify watch. A file is yielded once
+    its size and modification time stayed the same for `watch_settle`
+    seconds, so files still being synced, like Android `.pending` uploads,
+    are left alone until they are complete.
+    """
+
+    def __init__(
+        self, settings: ClassifySettings, file_processor: FileProcessor
+    ) -> None:
+        """Watch the directory tree."""
+        if not sys.platform.startswith("linux"):
+            raise ClassifyException("--watch requires Linux inotify")
+        self.settings = settings
+        self.fp = file_processor
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise ClassifyException(
+                f"Cannot start inotify: {os.strerror(ctypes.get_errno())}"
+            )
+        self._watches: dict[int, str] = {}
+        # path of changing files, with their size and mtime and when it changed
+        self._pending: dict[str, tuple[tuple[int, int], float]] = {}
+        self._output = os.path.abspath(settings.output)
+        self._add_tree(settings.directory, track_files=False)
+        _LOGGER.info("Watching %d directories", len(self._watches))
+
+    def _is_watched(self, path: str, is_dir: bool) -> bool:
+        """Check if a path is part of the processed files.
+
+        Files the run renames, copies or encodes are written under names it
+        reserved, and are not processed again.
+        """
+        if (
+            os.path.abspath(path)
+            == self._output
+            != os.path.abspath(self.settings.directory)
+        ):
+            return False
+        relpath = os.path.relpath(path, self.settings.directory)
+        if is_dir:
+            return not self.fp.is_excluded(relpath + os.sep)
+        extension = os.path.splitext(path)[1].lower()
+        return (
+            extension in PICTURE_EXTENSIONS + VIDEO_EXTENSIONS
+            and not self.fp.is_excluded(relpath)
+            and not self.fp.names.is_reserved(path)
+        )
+
+    def _add_tree(self, root: str, track_files: bool) -> None:
+        """Watch a directory and its subdirectories, tracking their files."""
+        for directory, subdirectories, files in os.walk(root):
+            subdirectories[:] = [
+                name
+                for name in subdirectories
+                if self._is_watched(os.path.join(directory, name), is_dir=True)
+            ]
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(directory), WATCH_MASK
+            )
+            if wd < 0:
+                _LOGGER.error(
+                    "Cannot watch %s: %s",
+                    directory,
+                    os.strerror(ctypes.get_errno()),
+                )
+                continue
+            self._watches[wd] = directory
+            if track_files:
+                for name in files:
+                    self._track(os.path.join(directory, name))
+
+    def _track(self, path: str) -> None:
+        """Start or restart waiting for a file to stop changing."""
+        if not self._is_watched(path, is_dir=False):
+            return
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._pending.pop(path, None)
+            return
+        self._pending[path] = ((stat.st_size, stat.st_mtime_ns), time.monotonic())
+
+    def _read_events(self, timeout: float | None) -> None:
+        """Wait for inotify events and handle them."""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return
+        try:
+            buffer = os.read(self._fd, EVENTS_BUFFER_SIZE)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            name = buffer[
+                offset + EVENT_HEADER.size : offset + EVENT_HEADER.size + length
+            ]
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                _LOGGER.warning("Too many changes at once, scan all files again")
+                self._add_tree(self.settings.directory, track_files=True)
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            if wd not in self._watches:
+                continue
+            path = os.path.join(self._watches[wd], os.fsdecode(name.rstrip(b"\0")))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and self._is_watched(
+                    path, is_dir=True
+                ):
+                    # files may be created before the watch is added
+                    self._add_tree(path, track_files=True)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._pending.pop(path, None)
+            else:
+                self._track(path)
+
+    def _settled(self) -> Iterator[str]:
+        """Yield the tracked files that stopped changing."""
+        now = time.monotonic()
+        for path, (state, changed_at) in list(self._pending.items()):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                del self._pending[path]
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != state:
+                self._pending[path] = ((stat.st_size, stat.st_mtime_ns), now)
+            elif now - changed_at >= self.settings.watch_settle:
+                del self._pending[path]
+                _LOGGER.debug("New file %s", path)
+                yield path
+
+    def watch(self) -> Iterator[str]:
+        """Yield new files as they settle, forever."""
+        while True:
+            self._read_events(self.settings.watch_settle / 2 if self._pending else None)
+            yield from self._settled()
+
+    def close(self) -> None:
+        """Stop watching."""
+        os.close(self._fd)
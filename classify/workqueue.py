@@ -0,0 +1,229 @@
+"""Shared queue of video jobs for several worker processes."""
+
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from .const import WORKER_MAX_ATTEMPTS
+
+_LOGGER = logging.getLogger("classify")
+
+JOB_QUEUED = "queued"
+JOB_LEASED = "leased"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class WorkQueue:
+    """SQLite queue of video jobs leased by worker processes.
+
+    A worker leases a job for `lease_seconds` and renews its leases while it
+    runs. A job whose lease expired, e.g. after its worker crashed, is leased
+    again by another worker, up to WORKER_MAX_ATTEMPTS times. Workers may run
+    on several hosts when the queue and the files are on a shared mount with
+    working locks, under the same paths.
+
+    The queue also records the encode steps of jobs like the journal of a
+    single run does, and the output names claimed by all workers. The name
+    claimed for the target of a job is released when the job fails or is
+    given back, so it does not push the names of later jobs aside.
+    """
+
+    def __init__(self, path: str, lease_seconds: float) -> None:
+        """Open or create the queue."""
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+        self._closed = False
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # autocommit, transactions are explicit
+        self._connection = sqlite3.connect(
+            path, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                path TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                step TEXT,
+                target TEXT,
+                temp TEXT,
+                error TEXT
+            );
+            CREATE TABLE IF NOT EXISTS names (path TEXT PRIMARY KEY);
+            """
+        )
+
+    def _execute(self, sql: str, *parameters: Any) -> sqlite3.Cursor:
+        """Run a statement on the queue."""
+        with self._lock:
+            return self._connection.execute(sql, parameters)
+
+    def _unclaim(self, condition: str, *parameters: Any) -> None:
+        """Release the names claimed for the targets of the matching jobs."""
+        self._connection.execute(
+            "DELETE FROM names WHERE path IN "
+            f"(SELECT target FROM jobs WHERE target IS NOT NULL AND {condition})",
+            parameters,
+        )
+
+    def add(self, paths: list[str]) -> int:
+        """Queue videos not queued yet, return how many were added."""
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            added = sum(
+                self._connection.execute(
+                    "INSERT OR IGNORE INTO jobs (path, state) VALUES (?, ?)",
+                    (os.path.abspath(path), JOB_QUEUED),
+                ).rowcount
+                for path in paths
+            )
+            self._connection.execute("COMMIT")
+        return added
+
+    def lease(self) -> tuple[str, str | None] | None:
+        """Lease the next available job, return its path and leftover temp file."""
+        now = time.time()
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                # expired leases are given up, so are the names of their targets
+                self._unclaim("state = ? AND lease_until < ?", JOB_LEASED, now)
+                self._connection.execute(
+                    "UPDATE jobs SET state = ?, error = ? WHERE state = ? "
+                    "AND lease_until < ? AND attempts >= ?",
+                    (
+                        JOB_FAILED,
+                        "Worker lost too many times",
+                        JOB_LEASED,
+                        now,
+                        WORKER_MAX_ATTEMPTS,
+                    ),
+                )
+                row = self._connection.execute(
+                    "SELECT path, temp FROM jobs WHERE state = ? OR "
+                    "(state = ? AND lease_until < ?) ORDER BY rowid LIMIT 1",
+                    (JOB_QUEUED, JOB_LEASED, now),
+                ).fetchone()
+                if row is not None:
+                    self._connection.execute(
+                        "UPDATE jobs SET state = ?, worker = ?, lease_until = ?, "
+                        "attempts = attempts + 1 WHERE path = ?",
+                        (JOB_LEASED, self.worker, now + self.lease_seconds, row[0]),
+                    )
+            finally:
+                self._connection.execute("COMMIT")
+        return row
+
+    def renew(self) -> None:
+        """Extend the leases of this worker."""
+        self._execute(
+            "UPDATE jobs SET lease_until = ? WHERE state = ? AND worker = ?",
+            time.time() + self.lease_seconds,
+            JOB_LEASED,
+            self.worker,
+        )
+
+    def others_running(self) -> bool:
+        """Check if other workers hold leases, jobs that may still come back."""
+        row = self._execute(
+            "SELECT 1 FROM jobs WHERE state = ? AND worker != ? LIMIT 1",
+            JOB_LEASED,
+            self.worker,
+        ).fetchone()
+        return row is not None
+
+    def finish(self, path: str, error: str | None = None) -> None:
+        """Mark a leased job done, or failed with an error."""
+        path = os.path.abspath(path)
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                if error:
+                    self._unclaim("path = ? AND worker = ?", path, self.worker)
+                self._connection.execute(
+                    "UPDATE jobs SET state = ?, error = ? "
+                    "WHERE path = ? AND worker = ?",
+                    (JOB_FAILED if error else JOB_DONE, error, path, self.worker),
+                )
+            finally:
+                self._connection.execute("COMMIT")
+
+    def release(self, path: str) -> None:
+        """Give back a leased job without counting the attempt."""
+        path = os.path.abspath(path)
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._unclaim("path = ? AND worker = ?", path, self.worker)
+                self._connection.execute(
+                    "UPDATE jobs SET state = ?, worker = NULL, "
+                    "attempts = attempts - 1 WHERE path = ? AND worker = ?",
+                    (JOB_QUEUED, path, self.worker),
+                )
+            finally:
+                self._connection.execute("COMMIT")
+
+    def summary(self) -> dict[str, int]:
+        """Count jobs by state."""
+        return dict(
+            self._execute(
+                "SELECT state, COUNT(*) FROM jobs GROUP BY state ORDER BY state"
+            ).fetchall()
+        )
+
+    def claim_name(self, path: str) -> bool:
+        """Claim an output path for this worker, False if another one has it."""
+        return bool(
+            self._execute(
+                "INSERT OR IGNORE INTO names VALUES (?)", os.path.abspath(path)
+            ).rowcount
+        )
+
+    def write(self, state: str, source: str, **fields: str) -> None:
+        """Record the encode step of a job, like `Journal.write`."""
+        # targets are compared with the claimed names
+        target = fields.get("target")
+        self._execute(
+            "UPDATE jobs SET step = ?, target = COALESCE(?, target), "
+            "temp = COALESCE(?, temp) WHERE path = ?",
+            state,
+            os.path.abspath(target) if target else None,
+            fields.get("temp"),
+            source,
+        )
+
+    def read(self) -> dict[str, dict[str, Any]]:
+        """Return no operation to recover, leases take care of crashed jobs."""
+        return {}
+
+    def reset(self) -> None:
+        """Keep the queue, other workers may still use it."""
+
+    def reset_if_settled(self) -> None:
+        """Keep the queue, other workers may still use it."""
+
+    def close(self) -> None:
+        """Give back the jobs still leased, and close the queue."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._unclaim("state = ? AND worker = ?", JOB_LEASED, self.worker)
+            self._connection.execute(
+                "UPDATE jobs SET state = ?, worker = NULL, "
+                "attempts = attempts - 1 WHERE state = ? AND worker = ?",
+                (JOB_QUEUED, JOB_LEASED, self.worker),
+            )
+            self._connection.execute("COMMIT")
+            self._connection.close()
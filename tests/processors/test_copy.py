@@ -0,0 +1,52 @@
+"""Test processor/copy.py module."""
+
+import os
+import tempfile
+
+import pytest
+
+from classify.processors.copy import METHOD_HARDLINK, FileCopier
+from classify.settings import ClassifySettings, parse_args
+
+
+def get_copier(tmp_path, copy_mode: str) -> FileCopier:
+    """Return a copier with a copy mode."""
+    args = parse_args(
+        ["--directory", str(tmp_path), "--copy-mode", copy_mode, "--timezone", "UTC"]
+    )
+    return FileCopier(ClassifySettings(args=args))
+
+
+def test_copy(tmp_path) -> None:
+    """Test each mode copies the content and counts the copies."""
+    content = os.urandom(300_000)
+    (tmp_path / "source.jpg").write_bytes(content)
+
+    copier = get_copier(tmp_path, "auto")
+    copier.copy(str(tmp_path / "source.jpg"), str(tmp_path / "auto.jpg"))
+    copier.copy(str(tmp_path / "source.jpg"), str(tmp_path / "again.jpg"))
+    assert (tmp_path / "auto.jpg").read_bytes() == content
+    assert sum(copier.methods.values()) == 2
+    assert copier.bytes_copied == 2 * len(content)
+
+    copier = get_copier(tmp_path, "hardlink")
+    method = copier.copy(str(tmp_path / "source.jpg"), str(tmp_path / "link.jpg"))
+    assert method == METHOD_HARDLINK
+    assert os.path.samefile(tmp_path / "source.jpg", tmp_path / "link.jpg")
+
+
+def test_move_across_filesystems(tmp_path) -> None:
+    """Test a move to another filesystem copies then removes the source."""
+    if not os.path.isdir("/dev/shm"):
+        pytest.skip("no tmpfs to move to")
+    with tempfile.TemporaryDirectory(dir="/dev/shm") as other_filesystem:
+        if os.stat(other_filesystem).st_dev == os.stat(tmp_path).st_dev:
+            pytest.skip("no other filesystem to move to")
+        (tmp_path / "source.mp4").write_bytes(b"video")
+        dest = os.path.join(other_filesystem, "dest.mp4")
+
+        get_copier(tmp_path, "auto").move(str(tmp_path / "source.mp4"), dest)
+
+        assert not (tmp_path / "source.mp4").exists()
+        with open(dest, "rb") as file:
+            assert file.read() == b"video"
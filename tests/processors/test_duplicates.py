@@ -0,0 +1,69 @@
+"""Test processor/duplicates.py module."""
+
+import os
+import shutil
+
+from classify.classify import Classify
+from classify.const import DUPLICATE_PARTIAL_HASH_SIZE
+from classify.processors.duplicates import DuplicateProcessor
+from classify.processors.files import FileProcessor
+from classify.settings import ClassifySettings, parse_args
+
+
+def test_find_duplicates(tmp_path) -> None:
+    """Test only files of the same content are grouped, in the given order."""
+    large = os.urandom(3 * DUPLICATE_PARTIAL_HASH_SIZE)
+    middle_changed = bytearray(large)
+    middle_changed[len(large) // 2] ^= 0xFF
+    files = {
+        "a/small.jpg": b"picture",
+        "b/small.jpg": b"picture",
+        "c/other.jpg": b"PICTURE",
+        "a/video.mp4": large,
+        "b/video.mp4": bytes(middle_changed),
+        "c/video.mp4": large,
+        "c/empty.jpg": b"",
+        "d/empty.jpg": b"",
+    }
+    for name, content in files.items():
+        os.makedirs(tmp_path / os.path.dirname(name), exist_ok=True)
+        (tmp_path / name).write_bytes(content)
+
+    args = parse_args(
+        ["--directory", str(tmp_path), "--duplicates", "remove", "--timezone", "UTC"]
+    )
+    settings = ClassifySettings(args=args)
+    dp = DuplicateProcessor(settings, FileProcessor(settings))
+    paths = [str(tmp_path / name) for name in files]
+
+    assert dp.find_duplicates(paths) == [
+        [str(tmp_path / "a/small.jpg"), str(tmp_path / "b/small.jpg")],
+        [str(tmp_path / "a/video.mp4"), str(tmp_path / "c/video.mp4")],
+    ]
+    # the changed copy is only told apart by the full hash
+    assert dp.bytes_read == 3 * 7 + 3 * 2 * len(large) // 3 + 3 * len(large)
+
+    remaining = dp.process(paths)
+    assert str(tmp_path / "b/small.jpg") not in remaining
+    assert str(tmp_path / "c/video.mp4") not in remaining
+    assert len(remaining) == len(files) - 2
+    assert not os.path.exists(tmp_path / "c/video.mp4")
+    assert os.path.exists(tmp_path / "b/video.mp4")
+
+
+def test_trashed_copy_is_not_kept(tmp_path) -> None:
+    """Test a trashed copy sorted first does not get the picture removed."""
+    shutil.copy("tests/photos/dir1/IMG_1001.jpg", tmp_path / "IMG_1001.jpg")
+    trashed = tmp_path / ".trashed-1700000000-IMG_1001.jpg"
+    shutil.copy("tests/photos/dir1/IMG_1001.jpg", trashed)
+    args = parse_args(
+        ["--directory", str(tmp_path), "--duplicates", "remove", "--timezone", "UTC"]
+    )
+    settings = ClassifySettings(args=args)
+    dp = DuplicateProcessor(settings, FileProcessor(settings))
+    assert dp.find_duplicates([str(trashed), str(tmp_path / "IMG_1001.jpg")]) == []
+
+    classify = Classify(settings=settings)
+    classify.run()
+    assert not os.path.exists(trashed)
+    assert os.listdir(tmp_path) == ["2017-11-11-15h18m17.jpg"]
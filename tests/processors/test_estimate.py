@@ -0,0 +1,53 @@
+"""Test processor/estimate.py module."""
+
+import dataclasses
+import time
+
+from classify.classify import Classify
+from classify.processors.estimate import EncodeEstimator
+from classify.processors.probe import VideoProbe
+
+PROBE_1080P = VideoProbe(
+    codec="h264",
+    bitrate=16_000_000,
+    duration=60,
+    width=1920,
+    height=1080,
+    frame_rate=30,
+)
+
+
+def test_estimate() -> None:
+    """Test estimates follow the pixels to encode and the measured rate."""
+    estimator = EncodeEstimator(threads=2)
+    size = 120_000_000
+    estimate = estimator.estimate(PROBE_1080P, size)
+    assert estimate is not None
+    assert round(estimate.seconds) == 373
+    assert estimate.saved_bytes == 120_000_000 - 18_662_400
+    assert estimator.estimate(VideoProbe(codec="h264"), size) is None
+
+    # a video already in the target codec barely shrinks
+    hevc = estimator.estimate(dataclasses.replace(PROBE_1080P, codec="hevc"), size)
+    assert hevc is not None and hevc.saved_bytes == 12_000_000
+    assert hevc.savings_rate < estimate.savings_rate
+
+    # encodes twice as fast as guessed halve the estimates
+    estimator.observe(PROBE_1080P, estimate.seconds / 2)
+    faster = estimator.estimate(PROBE_1080P, size)
+    assert faster is not None
+    assert round(faster.seconds) == round(estimate.seconds / 2)
+
+
+def test_fits_time_budget(test_classify_dry_run: Classify) -> None:
+    """Test videos are left for later once the time budget is spent."""
+    vp = test_classify_dry_run.vp
+    path = "tests/photos/dir1/video.mp4"
+    assert vp.fits_time_budget(path)
+
+    vp.deadline = time.monotonic() + 3600
+    assert vp.fits_time_budget(path)
+    vp.deadline = time.monotonic()
+    assert not vp.fits_time_budget(path)
+    assert vp.over_budget == {path}
+    vp.close()
@@ -0,0 +1,52 @@
+"""Test processor/exif.py module."""
+
+import glob
+
+import pytest
+from PIL import Image
+
+from classify.classify import Classify
+from classify.exception import ClassifyExifException
+from classify.processors.exif import read_date_taken, read_location
+
+
+def test_read_date_taken(test_classify_dry_run: Classify) -> None:
+    """Test header-only reader matches Pillow on every test picture."""
+    for path in glob.glob("tests/photos/**/*.jpg", recursive=True):
+        assert read_date_taken(path) == test_classify_dry_run.ip.get_pillow_date_taken(
+            path
+        )
+
+
+def test_read_date_taken_unsupported(tmp_path) -> None:
+    """Test unsupported formats are left to Pillow."""
+    png_path = str(tmp_path / "picture.png")
+    Image.new("RGB", (8, 8)).save(png_path)
+
+    with pytest.raises(ClassifyExifException):
+        read_date_taken(png_path)
+
+
+def test_read_date_taken_without_exif(tmp_path) -> None:
+    """Test a JPEG without EXIF has no date."""
+    jpeg_path = str(tmp_path / "picture.jpg")
+    Image.new("RGB", (8, 8)).save(jpeg_path)
+
+    assert read_date_taken(jpeg_path) is None
+
+
+def test_read_location(tmp_path) -> None:
+    """Test GPS position is read from the GPS IFD."""
+    jpeg_path = str(tmp_path / "picture.jpg")
+    exif = Image.Exif()
+    exif.get_ifd(0x8825).update(
+        {1: "S", 2: (33.0, 51.0, 54.0), 3: "E", 4: (151.0, 12.0, 36.0)}
+    )
+    Image.new("RGB", (8, 8)).save(jpeg_path, exif=exif)
+
+    location = read_location(jpeg_path)
+    assert location is not None
+    latitude, longitude = location
+    assert round(latitude, 4) == -33.865
+    assert round(longitude, 4) == 151.21
+    assert read_location("tests/photos/dir1/IMG_1001.jpg") is None
@@ -0,0 +1,61 @@
+"""Test processor/files.py module."""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from classify.classify import Classify
+
+
+def test_get_available_filepath_from_date(test_classify_dry_run: Classify) -> None:
+    """Test concurrent callers never get the same file path."""
+    fp = test_classify_dry_run.fp
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        paths = list(
+            executor.map(
+                lambda _: fp.get_available_filepath_from_date(
+                    source_file="tests/photos/dir1/IMG_1001.jpg",
+                    dest_dir="tests/output/dir1",
+                    date_taken=datetime(2017, 11, 11, 15, 18, 17),
+                ),
+                range(8),
+            )
+        )
+
+    assert len(set(paths)) == 8
+    assert "tests/output/dir1/2017-11-11-15h18m17.jpg" in paths
+    assert "tests/output/dir1/2017-11-11-15h18m17g.jpg" in paths
+
+
+def test_scan(test_classify_dry_run: Classify) -> None:
+    """Test scan yields files in order and prunes excluded directories."""
+    fp = test_classify_dry_run.fp
+
+    assert list(fp.scan()) == [
+        "tests/photos/dir1/IMG_1001.jpg",
+        "tests/photos/dir1/IMG_1002.jpg",
+        "tests/photos/dir1/video.mp4",
+        "tests/photos/dir2/IMG_2201.jpg",
+    ]
+    assert fp.videos == ["tests/photos/dir1/video.mp4"]
+
+
+def test_reserve_filepath(test_classify_dry_run: Classify) -> None:
+    """Test names are handed out from memory and released."""
+    fp = test_classify_dry_run.fp
+
+    path = fp.reserve_filepath("tests/photos/dir1", ["IMG_1001.jpg", "new.jpg"])
+    assert path == "tests/photos/dir1/new.jpg"
+    assert (
+        fp.reserve_filepath(
+            "tests/photos/dir1",
+            ["IMG_1001.jpg"],
+            source_file="tests/photos/dir1/IMG_1001.jpg",
+        )
+        == "tests/photos/dir1/IMG_1001.jpg"
+    )
+
+    fp.names.release("tests/photos/dir1/IMG_1002.jpg")
+    assert fp.reserve_filepath("tests/photos/dir1", ["IMG_1002.jpg"]) == (
+        "tests/photos/dir1/IMG_1002.jpg"
+    )
@@ -0,0 +1,36 @@
+"""Test processor/organizer.py module."""
+
+from datetime import datetime, timedelta
+
+from classify.processors.organizer import MediaItem, get_distance_km, split_events
+
+PARIS = (48.8566, 2.3522)
+VERSAILLES = (48.8049, 2.1204)
+LYON = (45.7640, 4.8357)
+
+
+def test_get_distance_km() -> None:
+    """Test the great-circle distance."""
+    assert round(get_distance_km(PARIS, LYON)) == 391
+    assert get_distance_km(PARIS, PARIS) == 0
+
+
+def test_split_events() -> None:
+    """Test events are split by time gaps, then by distance."""
+    start = datetime(2024, 7, 1, 10)
+    items = [
+        MediaItem("evening.jpg", start + timedelta(hours=9)),
+        MediaItem("paris.jpg", start, PARIS),
+        MediaItem("no_gps.jpg", start + timedelta(hours=1)),
+        MediaItem("versailles.jpg", start + timedelta(hours=2), VERSAILLES),
+        MediaItem("lyon.mp4", start + timedelta(hours=4), LYON),
+        MediaItem("next_day.jpg", start + timedelta(days=1)),
+    ]
+
+    events = split_events(items, timedelta(hours=3), 50)
+    assert [[item.path for item in event] for event in events] == [
+        ["paris.jpg", "no_gps.jpg", "versailles.jpg"],
+        ["lyon.mp4"],
+        ["evening.jpg"],
+        ["next_day.jpg"],
+    ]
@@ -0,0 +1,51 @@
+"""Test processor/similar.py module."""
+
+import random
+
+from PIL import Image
+
+from classify.processors.files import FileProcessor
+from classify.processors.similar import HashIndex, SimilarProcessor, get_dhash
+from classify.settings import ClassifySettings, parse_args
+
+
+def test_hash_index() -> None:
+    """Test the index finds the same matches as comparing every hash."""
+    rand = random.Random(0)
+    hashes = [rand.getrandbits(64) for _ in range(2000)]
+    # close hashes, with flipped bits spread over all blocks
+    hashes.extend(hashes[42] ^ (0b11 << shift) for shift in range(0, 62, 9))
+    index = HashIndex(max_distance=7)
+    for idx, value in enumerate(hashes):
+        index.add(value, str(idx))
+
+    query = hashes[42] ^ (1 << 63 | 1 << 20 | 1)
+    expected = {
+        str(idx) for idx, value in enumerate(hashes) if (value ^ query).bit_count() <= 7
+    }
+    assert {path for _, path in index.search(query)} == expected
+    assert len(expected) == 8
+
+
+def test_find_similar(tmp_path) -> None:
+    """Test re-saved and resized copies of a picture are grouped."""
+    picture = Image.radial_gradient("L").convert("RGB").resize((640, 480))
+    picture.save(tmp_path / "original.jpg", quality=95)
+    picture.save(tmp_path / "resaved.jpg", quality=40)
+    picture.resize((320, 240)).save(tmp_path / "small.jpg")
+    Image.linear_gradient("L").convert("RGB").save(tmp_path / "other.jpg")
+    (tmp_path / "broken.jpg").write_bytes(b"not a picture")
+
+    paths = [
+        str(tmp_path / name)
+        for name in ["original.jpg", "other.jpg", "resaved.jpg", "small.jpg"]
+    ]
+    assert get_dhash(str(tmp_path / "broken.jpg")) is None
+
+    settings = ClassifySettings(
+        args=parse_args(["--directory", str(tmp_path), "--timezone", "UTC"])
+    )
+    sp = SimilarProcessor(settings, FileProcessor(settings))
+    assert sp.find_similar([*paths, str(tmp_path / "broken.jpg")], 4) == [
+        [paths[0], paths[2], paths[3]]
+    ]
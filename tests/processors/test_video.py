@@ -1,6 +1,7 @@
 """Test processor/video.py module."""
 
 import logging
+import os
 from datetime import datetime, timezone
 
 from classify.classify import Classify
@@ -25,3 +26,109 @@ def test_get_date_taken(test_classify_dry_run: Classify) -> None:
     """Test get_date_taken method."""
     date_taken = test_classify_dry_run.vp.get_date_taken("tests/photos/dir1/video.mp4")
     assert date_taken == datetime(2015, 8, 7, 9, 13, 2, tzinfo=timezone.utc)
+
+
+def test_probe(test_classify_dry_run: Classify) -> None:
+    """Test probe method is memoized and feeds the getters."""
+    video_probe = test_classify_dry_run.vp.probe("tests/photos/dir1/video.mp4")
+
+    assert video_probe is test_classify_dry_run.vp.probe("tests/photos/dir1/video.mp4")
+    assert video_probe.codec == test_classify_dry_run.vp.get_codec(
+        "tests/photos/dir1/video.mp4"
+    )
+    assert video_probe.duration is not None and video_probe.duration > 0
+    assert video_probe.tags["creation_time"] == "2015-08-07T09:13:02.000000Z"
+
+
+def test_test_verify_modes(test_classify: Classify) -> None:
+    """Test each verify mode accepts a correct video."""
+    for verify_mode in ("full", "fused", "sampled"):
+        test_classify.settings.verify = verify_mode
+        assert test_classify.vp.test(
+            "tests/photos/dir1/video.mp4", source_path="tests/photos/dir1/video.mp4"
+        )
+
+
+def test_encode_chunks(test_classify: Classify, tmp_path) -> None:
+    """Test a video encoded in chunks keeps its frames, audio and metadata."""
+    vp = test_classify.vp
+    test_classify.settings.chunk_seconds = 10
+    # faster than libx265 for the test
+    test_classify.settings.ffmpeg_lib = "libx264"
+    source = "tests/photos/dir1/video.mp4"
+    output = str(tmp_path / "video.mp4")
+    assert vp.is_chunked(source)
+
+    vp.encode(source, output, datetime(2015, 8, 7, 9, 13, 2))
+
+    assert not [name for name in os.listdir(tmp_path) if name != "video.mp4"]
+    assert vp.test(output, source_path=source)
+    assert vp.get_metadata(output, "comment") == test_classify.settings.comment_message
+    assert vp.get_metadata(output, "creation_time") == "2015-08-07 09:13:02"
+    streams = (
+        vp.runner.run(
+            [
+                vp.settings.ffprobe_path,
+                "-v",
+                "error",
+                "-show_entries",
+                "stream=codec_type",
+                "-of",
+                "csv=p=0",
+                output,
+            ]
+        )
+        .stdout.decode()
+        .split()
+    )
+    assert streams == ["video", "audio"]
+
+    # portrait videos of phones are landscape frames with a rotation
+    rotated = str(tmp_path / "rotated.mp4")
+    vp.runner.run(
+        [
+            vp.settings.ffmpeg_path,
+            "-v",
+            "error",
+            "-f",
+            "lavfi",
+            "-i",
+            "testsrc=size=320x240:rate=25:duration=4",
+            "-c:v",
+            "libx264",
+            "-g",
+            "25",
+            str(tmp_path / "landscape.mp4"),
+        ]
+    )
+    vp.runner.run(
+        [
+            vp.settings.ffmpeg_path,
+            "-v",
+            "error",
+            "-display_rotation",
+            "90",
+            "-i",
+            str(tmp_path / "landscape.mp4"),
+            "-c",
+            "copy",
+            rotated,
+        ]
+    )
+    test_classify.settings.chunk_seconds = 1
+    assert vp.is_chunked(rotated)
+    vp.encode(rotated, output, datetime(2015, 8, 7, 9, 13, 2))
+    size = vp.runner.run(
+        [
+            vp.settings.ffprobe_path,
+            "-v",
+            "error",
+            "-show_entries",
+            "stream=width,height",
+            "-of",
+            "csv=p=0",
+            output,
+        ]
+    )
+    assert size.stdout.decode().strip() == "240,320"
+    vp.close()
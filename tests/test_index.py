@@ -0,0 +1,92 @@
+"""Test index module."""
+
+import os
+import shutil
+
+from classify.classify import Classify
+from classify.index import DECISION_COPY, DECISION_SKIP, StateIndex
+from classify.settings import ClassifySettings, parse_args
+
+
+def test_state_index(tmp_path) -> None:
+    """Test entries are dropped when the file changes."""
+    file_path = tmp_path / "picture.jpg"
+    file_path.write_bytes(b"picture")
+
+    with StateIndex(str(tmp_path / "index.sqlite")) as index:
+        index.record(str(file_path), date_taken="2017-11-11T15:18:17")
+        index.record(str(file_path), decision=DECISION_SKIP)
+
+        entry = index.get(str(file_path))
+        assert entry is not None
+        assert entry.date_taken == "2017-11-11T15:18:17"
+        assert entry.is_done()
+
+        file_path.write_bytes(b"changed picture")
+        assert index.get(str(file_path)) is None
+        assert index.prune() == 1
+        assert index.summary() == {}
+
+
+def test_run_with_index(tmp_path) -> None:
+    """Test a second run skips pictures already copied."""
+    input_dir = tmp_path / "input"
+    os.makedirs(input_dir)
+    shutil.copy("tests/photos/dir1/IMG_1001.jpg", input_dir)
+    shutil.copy("tests/photos/dir2/IMG_2201.jpg", input_dir)
+    index_path = str(tmp_path / "index.sqlite")
+    args = parse_args(
+        [
+            "--directory",
+            str(input_dir),
+            "--output",
+            str(tmp_path / "output"),
+            "--keep-original",
+            "--index",
+            index_path,
+            "--timezone",
+            "UTC",
+        ]
+    )
+
+    Classify(settings=ClassifySettings(args=args)).run()
+    Classify(settings=ClassifySettings(args=args)).run()
+
+    assert sorted(os.listdir(tmp_path / "output")) == [
+        "2017-11-11-15h18m17.jpg",
+        "2020-02-24-12h29m52.jpg",
+    ]
+    with StateIndex(index_path) as index:
+        assert index.summary() == {DECISION_COPY: 2, DECISION_SKIP: 2}
+
+
+def test_encode_with_index(tmp_path) -> None:
+    """Test an encode is recorded under its final name, with its probe."""
+    shutil.copy("tests/photos/dir1/video.mp4", tmp_path)
+    index_path = str(tmp_path / "index.sqlite")
+    args = parse_args(
+        [
+            "--directory",
+            str(tmp_path),
+            "--output",
+            str(tmp_path / "output"),
+            "--keep-original",
+            "--verify",
+            "fused",
+            "--index",
+            index_path,
+            "--timezone",
+            "UTC",
+        ]
+    )
+    settings = ClassifySettings(args=args)
+    # faster than libx265 for the test
+    settings.ffmpeg_lib = "libx264"
+    Classify(settings=settings).run()
+
+    with StateIndex(index_path) as index:
+        # no entry is left for the temporary output of the encode
+        assert index.prune() == 0
+        entry = index.get(str(tmp_path / "output" / "2015-08-07-09h13m02.mp4"))
+        assert entry is not None and entry.probe is not None
+        assert entry.probe.codec == "h264"
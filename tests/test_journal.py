@@ -0,0 +1,35 @@
+"""Test journal module."""
+
+from classify.journal import STATE_DONE, STATE_ENCODED, STATE_STARTED, Journal
+
+
+def test_journal(tmp_path) -> None:
+    """Test the last state of each operation wins and cut lines are skipped."""
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    journal.write(STATE_STARTED, "a.mp4", target="b.mp4", temp="b.mp4.partial")
+    journal.write(STATE_ENCODED, "a.mp4", target="b.mp4", temp="b.mp4.partial")
+    journal.write(STATE_STARTED, "c.mp4", target="d.mp4", temp="d.mp4.partial")
+    journal.write(STATE_DONE, "c.mp4")
+    journal.close()
+    with open(journal.path, "a", encoding="utf-8") as file:
+        file.write('{"state": "done", "sou')
+
+    operations = journal.read()
+    assert operations["a.mp4"]["state"] == STATE_ENCODED
+    assert operations["a.mp4"]["temp"] == "b.mp4.partial"
+    assert operations["c.mp4"]["state"] == STATE_DONE
+
+    journal.reset()
+    assert journal.read() == {}
+
+
+def test_reset_if_settled(tmp_path) -> None:
+    """Test the journal is only kept while an operation is not done."""
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    journal.write(STATE_STARTED, "a.mp4", target="b.mp4", temp="b.mp4.partial")
+    journal.reset_if_settled()
+    assert journal.read()["a.mp4"]["state"] == STATE_STARTED
+
+    journal.write(STATE_DONE, "a.mp4")
+    journal.reset_if_settled()
+    assert journal.read() == {}
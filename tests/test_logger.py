@@ -0,0 +1,29 @@
+"""Test logger."""
+
+from classify.logger import EncodeProgress
+
+
+def test_encode_progress() -> None:
+    """Test ffmpeg progress parsing and duration weighted ETA."""
+    progress = EncodeProgress()
+    progress.queue("a.mp4", 100)
+    progress.queue("b.mp4", 300)
+    progress.start("a.mp4", 100)
+    assert progress._started is not None
+    progress._started -= 10
+
+    for line in ["fps=N/A", "speed=N/A", "out_time_us=N/A", "progress=continue"]:
+        progress.update("a.mp4", line)
+    assert progress.eta() is None
+
+    for line in ["fps=59.94", "out_time_us=50000000", "speed=5.01x"]:
+        progress.update("a.mp4", line)
+    assert "a.mp4 50% 60fps 5.01x" in progress.render()
+    # 50s encoded in 10s, 350s left
+    eta = progress.eta()
+    assert eta is not None
+    assert round(eta) == 70
+
+    progress.finish("a.mp4")
+    progress.dequeue("b.mp4")
+    assert progress.eta() == 0
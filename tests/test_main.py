@@ -1,6 +1,8 @@
 """Test main module."""
 
 import os
+import subprocess
+import sys
 
 from classify.classify import Classify
 from classify.const import DEFAULT_NAME_FORMAT
@@ -41,3 +43,19 @@ def test_run(test_classify: Classify) -> None:
     assert test_classify.vp.is_already_reencoded(
         "tests/output/dir1/2015-08-07-09h13m02.mp4"
     )
+
+
+def test_import_is_light() -> None:
+    """Test modules of videos and options are not loaded on startup."""
+    modules = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, classify.main; print(' '.join(sys.modules))",
+        ],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout.split()
+    for module in ("asyncio", "sqlite3", "ctypes", "hashlib", "cProfile"):
+        assert module not in modules
@@ -0,0 +1,58 @@
+"""Test plan module."""
+
+import os
+
+from classify.classify import Classify
+from classify.plan import ACTION_COPY, ACTION_ENCODE, Plan
+from classify.settings import ClassifySettings, parse_args
+
+from .conftest import INPUT_DIR, OUTPUT_DIR
+
+
+def test_plan_and_apply(test_classify: Classify, tmp_path) -> None:
+    """Test a plan changes no file, then is applied without probing again."""
+    plan_path = str(tmp_path / "plan.jsonl")
+    arguments = [
+        "--directory",
+        INPUT_DIR,
+        "--exclude",
+        "custom/",
+        "--output",
+        OUTPUT_DIR,
+        "--keep-original",
+        "--timezone",
+        "UTC",
+    ]
+    Classify(ClassifySettings(parse_args([*arguments, "--plan", plan_path]))).run()
+
+    assert not os.listdir(OUTPUT_DIR)
+    actions = {os.path.relpath(entry.source): entry for entry in Plan.read(plan_path)}
+    assert actions["tests/photos/dir1/IMG_1001.jpg"].action == ACTION_COPY
+    assert actions["tests/photos/dir1/video.mp4"].action == ACTION_ENCODE
+    assert actions["tests/photos/dir1/video.mp4"].duration
+
+    assert actions["tests/photos/dir1/video.mp4"].pixels
+
+    # encodes are estimated from the plan to be ordered and fit the budget
+    classify = Classify(
+        ClassifySettings(
+            parse_args(
+                [
+                    *arguments,
+                    "--apply",
+                    plan_path,
+                    "--video-order",
+                    "savings",
+                    "--time-budget",
+                    "600",
+                ]
+            )
+        )
+    )
+    classify.run()
+
+    assert os.path.exists("tests/output/dir1/2017-11-11-15h18m17.jpg")
+    assert os.path.exists("tests/output/dir2/2020-02-24-12h29m52.jpg")
+    assert os.path.exists("tests/output/dir1/2015-08-07-09h13m02.mp4")
+    # the source video is not probed again
+    assert not classify.vp._probes.get(os.path.abspath("tests/photos/dir1/video.mp4"))
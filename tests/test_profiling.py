@@ -0,0 +1,41 @@
+"""Test profiling module."""
+
+import csv
+import time
+
+from classify.profiling import StageTimer
+
+
+def test_stage_timer(tmp_path) -> None:
+    """Test nested stages are only charged their own time."""
+    timer = StageTimer()
+    timer.reset(trace=True)
+
+    class Processor:
+        @timer.timed("outer")
+        def process(self, path: str) -> None:
+            time.sleep(0.02)
+            with timer.stage("inner", path):
+                time.sleep(0.05)
+
+    Processor().process("video.mp4")
+    Processor().process("picture.jpg")
+
+    assert list(timer.iterate("scan", ["a", "b"])) == ["a", "b"]
+    stats = timer._stats
+    assert stats["outer"].count == 2
+    assert stats["scan"].count == 3
+    assert 0.04 <= stats["outer"].wall < 0.09
+    assert stats["inner"].wall >= 0.1
+    assert timer.summary()[1].startswith("inner")
+
+    trace_path = tmp_path / "trace.csv"
+    timer.write_trace(str(trace_path))
+    with open(trace_path, encoding="utf-8") as file:
+        rows = list(csv.DictReader(file))
+    assert [(row["stage"], row["path"]) for row in rows] == [
+        ("outer", "video.mp4"),
+        ("inner", "video.mp4"),
+        ("outer", "picture.jpg"),
+        ("inner", "picture.jpg"),
+    ]
@@ -0,0 +1,47 @@
+"""Test scheduler module."""
+
+import os
+import shutil
+
+from classify.classify import Classify
+from classify.exception import ClassifyEncodingException
+from classify.scheduler import Pipeline
+from classify.settings import ClassifySettings, parse_args
+from classify.workqueue import JOB_FAILED, WorkQueue
+
+
+def test_pipeline(test_classify_dry_run: Classify) -> None:
+    """Test pictures and videos are dispatched to their own scheduler."""
+    classify = test_classify_dry_run
+    pipeline = Pipeline(
+        settings=classify.settings,
+        file_processor=classify.fp,
+        image_processor=classify.ip,
+        video_processor=classify.vp,
+    )
+
+    assert pipeline.run(classify.fp.scan()) == (3, 1)
+    classify.vp.close()
+
+
+def test_worker_failed_encode(tmp_path, monkeypatch) -> None:
+    """Test the job of a video that failed to encode is marked failed."""
+    shutil.copy("tests/photos/dir1/video.mp4", tmp_path / "video.mp4")
+    queue_path = str(tmp_path / "queue.db")
+    args = parse_args(
+        ["--directory", str(tmp_path), "--worker", queue_path, "--timezone", "UTC"]
+    )
+    classify = Classify(settings=ClassifySettings(args=args))
+
+    def encode(input_path: str, output_path: str, recorded_date) -> None:
+        with open(output_path, "wb") as file:
+            file.write(b"partial")
+        raise ClassifyEncodingException("Conversion failed!")
+
+    monkeypatch.setattr(classify.vp, "encode", encode)
+    classify.run()
+
+    work_queue = WorkQueue(queue_path, lease_seconds=60)
+    assert work_queue.summary() == {JOB_FAILED: 1}
+    work_queue.close()
+    assert sorted(os.listdir(tmp_path)) == ["queue.db", "video.mp4"]
@@ -0,0 +1,45 @@
+"""Test tools module."""
+
+import pytest
+
+from classify import tools
+from classify.exception import ClassifyException
+from classify.settings import ClassifySettings, parse_args
+from classify.tools import ToolsChecker, parse_encoders
+
+ENCODERS_OUTPUT = """Encoders:
+ V..... = Video
+ A..... = Audio
+ ------
+ V....D libx264              libx264 H.264 / AVC / MPEG-4 AVC (codec h264)
+ V....D libx265              libx265 H.265 / HEVC (codec hevc)
+ A....D aac                  AAC (Advanced Audio Coding)
+"""
+
+
+def test_parse_encoders() -> None:
+    """Test encoder names are read after the legend."""
+    assert parse_encoders(ENCODERS_OUTPUT) == ["libx264", "libx265", "aac"]
+
+
+def test_tools_checker(tmp_path, monkeypatch) -> None:
+    """Test capabilities are cached per binary and a missing encoder fails."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    settings = ClassifySettings(args=parse_args(["--directory", str(tmp_path)]))
+    capabilities = ToolsChecker(settings).check()
+    assert capabilities.ffmpeg_version.startswith("ffmpeg version")
+    assert settings.ffmpeg_lib in capabilities.encoders
+
+    def fail(args: list[str]) -> str:
+        raise AssertionError(f"{args} run again")
+
+    monkeypatch.setattr(tools, "run_tool", fail)
+    assert ToolsChecker(settings).check() == capabilities
+
+    settings.ffmpeg_lib = "libmissing"
+    with pytest.raises(ClassifyException, match="no libmissing encoder"):
+        ToolsChecker(settings).check()
+
+    settings.ffmpeg_path = str(tmp_path / "ffmpeg")
+    with pytest.raises(ClassifyException, match="not found"):
+        ToolsChecker(settings).check()
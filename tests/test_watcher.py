@@ -0,0 +1,103 @@
+"""Test watcher module."""
+
+import os
+import shutil
+import time
+from collections.abc import Iterator
+
+import pytest
+
+from classify.classify import Classify
+from classify.journal import STATE_DONE
+from classify.processors.files import FileProcessor
+from classify.settings import ClassifySettings, parse_args
+from classify.watcher import Watcher
+
+
+def test_watcher(tmp_path) -> None:
+    """Test new files are yielded once they stopped changing."""
+    args = parse_args(
+        ["--directory", str(tmp_path), "--watch", "--watch-settle", "0.2"]
+    )
+    settings = ClassifySettings(args=args)
+    file_processor = FileProcessor(settings=settings)
+    watcher = Watcher(settings, file_processor)
+    new_files = watcher.watch()
+
+    (tmp_path / "notes.txt").write_text("not a picture")
+    os.makedirs(tmp_path / "DCIM")
+    pending = tmp_path / "DCIM" / ".pending-1700000000-IMG_1.jpg"
+    pending.write_bytes(b"first part")
+    assert next(new_files) == str(pending)
+
+    # an upload growing slower than the settle time is not yielded before it ends
+    picture = tmp_path / "DCIM" / "IMG_2.jpg"
+    picture.write_bytes(b"first part")
+    watcher._read_events(0.1)
+    assert list(watcher._settled()) == []
+    with open(picture, "ab") as file:
+        file.write(b" and the rest")
+    assert next(new_files) == str(picture)
+    assert os.path.getsize(picture) == 23
+
+    watcher.close()
+    file_processor.close()
+
+
+def test_watch(tmp_path, monkeypatch) -> None:
+    """Test new trash files are deleted and renamed files not processed again."""
+    shutil.copy("tests/photos/dir1/IMG_1001.jpg", tmp_path / "IMG_1001.jpg")
+    args = parse_args(
+        [
+            "--directory",
+            str(tmp_path),
+            "--watch",
+            "--watch-settle",
+            "0.2",
+            "--timezone",
+            "UTC",
+        ]
+    )
+    classify = Classify(settings=ClassifySettings(args=args))
+    trashed = tmp_path / ".trashed-1700000000-IMG_1002.jpg"
+    new_files: list[str] = []
+
+    def watch(watcher: Watcher) -> Iterator[str]:
+        # files arrive once the directory was processed, for a while only
+        shutil.copy("tests/photos/dir1/IMG_1001.jpg", trashed)
+        shutil.copy("tests/photos/dir1/IMG_1001.jpg", tmp_path / "IMG_1003.jpg")
+        stop_at = time.monotonic() + 2
+        while time.monotonic() < stop_at:
+            watcher._read_events(0.1)
+            for path in watcher._settled():
+                new_files.append(path)
+                yield path
+
+    monkeypatch.setattr(Watcher, "watch", watch)
+    classify._watch()
+    classify.fp.close()
+
+    assert sorted(new_files) == [str(trashed), str(tmp_path / "IMG_1003.jpg")]
+    assert sorted(os.listdir(tmp_path)) == [
+        "2017-11-11-15h18m17.jpg",
+        "2017-11-11-15h18m17a.jpg",
+    ]
+
+
+def test_watch_interrupted(tmp_path, monkeypatch) -> None:
+    """Test stopping the watch leaves no journal when no encode was cut."""
+    args = parse_args(["--directory", str(tmp_path), "--watch"])
+    classify = Classify(settings=ClassifySettings(args=args))
+
+    def watch(_watcher: Watcher) -> Iterator[str]:
+        classify.vp.journal.write(STATE_DONE, str(tmp_path / "a.mp4"))
+        raise KeyboardInterrupt
+        yield  # pylint: disable=unreachable
+
+    monkeypatch.setattr(Watcher, "watch", watch)
+    with pytest.raises(SystemExit):
+        classify._watch()
+    classify.vp.close()
+    classify.fp.close()
+
+    assert classify.vp.journal.read() == {}
@@ -0,0 +1,95 @@
+"""Test workqueue module."""
+
+import time
+
+from classify.workqueue import JOB_DONE, JOB_QUEUED, WorkQueue
+
+
+def test_work_queue(tmp_path) -> None:
+    """Test jobs are leased once, and again when their worker stops."""
+    path = str(tmp_path / "queue.db")
+    first = WorkQueue(path, lease_seconds=0.2)
+    second = WorkQueue(path, lease_seconds=60)
+    second.worker = "other"
+
+    assert first.add(["/videos/a.mp4", "/videos/b.mp4"]) == 2
+    assert second.add(["/videos/a.mp4"]) == 0
+
+    assert first.lease() == ("/videos/a.mp4", None)
+    assert second.lease() == ("/videos/b.mp4", None)
+    assert second.lease() is None
+    assert first.others_running()
+
+    # the lease of the first worker expires, its partial encode is handed over
+    first.write("started", "/videos/a.mp4", temp="/out/a.mp4.partial")
+    time.sleep(0.3)
+    assert second.lease() == ("/videos/a.mp4", "/out/a.mp4.partial")
+    second.finish("/videos/a.mp4")
+    second.finish("/videos/b.mp4", error="Encoding failed")
+
+    assert first.claim_name("/out/a.mp4")
+    assert not second.claim_name("/out/a.mp4")
+    assert first.summary() == {"done": 1, "failed": 1}
+    first.close()
+    second.close()
+
+
+def test_close_gives_back_leases(tmp_path) -> None:
+    """Test a worker leaving gives its jobs back to the queue."""
+    path = str(tmp_path / "queue.db")
+    work_queue = WorkQueue(path, lease_seconds=60)
+    work_queue.add(["/videos/a.mp4"])
+    work_queue.lease()
+    work_queue.close()
+    work_queue.close()
+
+    work_queue = WorkQueue(path, lease_seconds=60)
+    assert work_queue.summary() == {JOB_QUEUED: 1}
+    assert work_queue.lease() == ("/videos/a.mp4", None)
+    work_queue.finish("/videos/a.mp4")
+    assert work_queue.summary() == {JOB_DONE: 1}
+    work_queue.close()
+
+
+def test_release(tmp_path) -> None:
+    """Test a job given back without time to encode it is leased again."""
+    work_queue = WorkQueue(str(tmp_path / "queue.db"), lease_seconds=60)
+    work_queue.add(["/videos/a.mp4"])
+    assert work_queue.lease() == ("/videos/a.mp4", None)
+    work_queue.release("/videos/a.mp4")
+    assert work_queue.summary() == {JOB_QUEUED: 1}
+    assert work_queue.lease() == ("/videos/a.mp4", None)
+    work_queue.close()
+
+
+def test_names_released(tmp_path) -> None:
+    """Test the names of failed, given back and lost jobs are claimed again."""
+    path = str(tmp_path / "queue.db")
+    first = WorkQueue(path, lease_seconds=0.2)
+    second = WorkQueue(path, lease_seconds=60)
+    second.worker = "other"
+    first.add(["/videos/a.mp4", "/videos/b.mp4", "/videos/c.mp4"])
+
+    # a failed job releases its name, a done one keeps it
+    for name in ("a", "b"):
+        assert second.lease() == (f"/videos/{name}.mp4", None)
+        assert second.claim_name(f"/out/{name}.mp4")
+        second.write("started", f"/videos/{name}.mp4", target=f"/out/{name}.mp4")
+    second.finish("/videos/a.mp4", error="Encoding failed")
+    second.finish("/videos/b.mp4")
+    assert first.claim_name("/out/a.mp4")
+    assert not first.claim_name("/out/b.mp4")
+
+    # a lost job releases its name when leased again
+    assert first.lease() == ("/videos/c.mp4", None)
+    assert first.claim_name("/out/c.mp4")
+    first.write("started", "/videos/c.mp4", target="/out/c.mp4")
+    time.sleep(0.3)
+    assert second.lease() == ("/videos/c.mp4", None)
+    assert second.claim_name("/out/c.mp4")
+
+    # a job given back releases its name
+    second.release("/videos/c.mp4")
+    assert first.claim_name("/out/c.mp4")
+    first.close()
+    second.close()